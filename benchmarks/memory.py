@@ -0,0 +1,214 @@
+"""
+Memory retrieval scaling benchmark: populates synthetic command histories of growing size and measures the insert
+throughput, open time, query p50/p99, on-disk size and recall@k of the HNSW index against brute force.
+The index parameters are passed through the [general] configuration, as Termax does.
+
+    python -m benchmarks.memory --sizes 100 1000 10000 100000 --search-ef 10 50
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
+import configparser
+
+from .mock_server import fake_embedding
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOOLS = [
+    ('ls -la', 'list the files'), ('du -sh', 'show the disk usage of'), ('git log --oneline', 'show the commits of'),
+    ('docker ps -a', 'list the containers of'), ('find . -name', 'find the files named'),
+    ('grep -rn', 'search the text in'), ('tar -czf', 'compress'), ('ssh deploy@', 'connect to'),
+    ('kubectl get pods -n', 'list the pods in'), ('python -m pytest', 'run the tests of')
+]
+WORDS = ['api', 'web', 'db', 'cache', 'logs', 'build', 'docs', 'src', 'data', 'infra', 'auth', 'billing', 'search']
+
+OPEN = """
+import sys, time
+start = time.perf_counter()
+from termax.prompt import Memory
+imported = time.perf_counter()
+memory = Memory()
+memory.embedding_function = __import__('benchmarks.memory', fromlist=['LocalEmbedding']).LocalEmbedding()
+memory.collections = {}
+memory.collection().query(query_embeddings=[[0.0] * 64], n_results=1)
+print(imported - start, time.perf_counter() - imported)
+"""
+
+
+class LocalEmbedding:
+    """
+    An in-process embedding function, so the benchmark measures the index and not the embedding model.
+    """
+
+    def __call__(self, input):
+        return [fake_embedding(text) for text in input]
+
+
+def synthetic(i: int, rng: random.Random):
+    """
+    synthetic: the i-th synthetic (query, command) pair.
+    """
+    command, intent = TOOLS[i % len(TOOLS)]
+    target = f"{rng.choice(WORDS)}-{rng.choice(WORDS)}-{i}"
+    return {'query': f"{intent} {target}", 'response': f"{command} {target}"}
+
+
+def percentile(values: list, q: float):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def disk_size(path: str):
+    return sum(os.path.getsize(os.path.join(base, name)) for base, _, names in os.walk(path) for name in names)
+
+
+def recall_at_k(collection, queries: list, k: int, space: str):
+    """
+    recall_at_k: the share of the exact (brute force) top-k neighbours returned by the HNSW index. The synthetic
+    embeddings have many ties, so a returned record counts as a hit when it is at least as close as the k-th exact one.
+    """
+    import numpy as np
+
+    records = collection.get(include=['embeddings'])
+    ids = records['ids']
+    matrix = np.array(records['embeddings'], dtype=np.float32)
+    vectors = np.array([fake_embedding(text) for text in queries], dtype=np.float32)
+    if space == 'l2':
+        distances = ((vectors[:, None, :] - matrix[None, :, :]) ** 2).sum(axis=-1)
+    elif space == 'cosine':
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(vectors, axis=1)[:, None]
+        distances = 1 - (vectors @ matrix.T) / np.maximum(norms, 1e-12)
+    else:
+        distances = 1 - vectors @ matrix.T
+
+    k = min(k, len(ids))
+    position = {record: i for i, record in enumerate(ids)}
+    approximate = collection.query(query_embeddings=vectors.tolist(), n_results=k, include=[])['ids']
+    hits = 0
+    for row, found in zip(distances, approximate):
+        kth = np.partition(row, k - 1)[k - 1]
+        hits += sum(row[position[record]] <= kth + 1e-6 for record in found)
+    return hits / (k * len(queries))
+
+
+def write_config(home: str, args):
+    config = configparser.ConfigParser()
+    config['general'] = {
+        'platform': 'openai', 'storage_size': str(max(args.sizes) + 1), 'retrieval': 'vector',
+        'scope_by_project': 'False', 'hnsw_space': args.space, 'hnsw_construction_ef': str(args.construction_ef),
+        'hnsw_search_ef': str(args.search_ef), 'hnsw_m': str(args.m)
+    }
+    os.makedirs(os.path.join(home, '.termax'), exist_ok=True)
+    with open(os.path.join(home, '.termax', 'config'), 'w') as file:
+        config.write(file)
+
+
+def run(args, home: str):
+    """
+    run: the benchmark itself, executed with HOME pointing at a temporary Termax home.
+    """
+    from termax.prompt import Memory
+    from termax.utils import CONFIG_HOME
+
+    rng = random.Random(args.seed)
+    memory = Memory()
+    memory.embedding_function = LocalEmbedding()
+    memory.collections = {}
+    env = dict(
+        os.environ, HOME=home, USERPROFILE=home, ANONYMIZED_TELEMETRY='False',
+        PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')]))
+    )
+
+    results = []
+    inserted = 0
+    for size in sorted(args.sizes):
+        start = time.perf_counter()
+        for batch in range(inserted, size, args.batch):
+            memory.add_query([synthetic(i, rng) for i in range(batch, min(batch + args.batch, size))])
+        insert_seconds = time.perf_counter() - start
+        added, inserted = size - inserted, size
+
+        queries = [synthetic(rng.randrange(size), rng)['query'] for _ in range(args.queries)]
+        latencies = {'vector': [], 'hybrid': [], 'lexical': []}
+        for mode in latencies:
+            for text in queries:
+                start = time.perf_counter()
+                memory.search([text], n_results=args.k, mode=mode)
+                latencies[mode].append(time.perf_counter() - start)
+
+        opened = subprocess.run(
+            [sys.executable, '-c', OPEN], env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+            check=True
+        ).stdout.split()
+
+        row = {
+            'size': size,
+            'insert_per_second': added / insert_seconds if insert_seconds else 0.0,
+            'import_seconds': float(opened[0]),
+            'open_seconds': float(opened[1]),
+            'disk_bytes': disk_size(CONFIG_HOME),
+            'recall_at_k': recall_at_k(memory.collection(), queries, args.k, args.space)
+        }
+        for mode, values in latencies.items():
+            row[f"{mode}_p50_ms"] = percentile(values, 50) * 1000
+            row[f"{mode}_p99_ms"] = percentile(values, 99) * 1000
+        results.append(row)
+
+        print(
+            f"{size:>8} records | insert {row['insert_per_second']:>8.0f}/s | open {row['open_seconds'] * 1000:>7.1f}ms"
+            f" | vector p50/p99 {row['vector_p50_ms']:>6.1f}/{row['vector_p99_ms']:>6.1f}ms"
+            f" | hybrid p50/p99 {row['hybrid_p50_ms']:>6.1f}/{row['hybrid_p99_ms']:>6.1f}ms"
+            f" | lexical p50 {row['lexical_p50_ms']:>6.1f}ms | recall@{args.k} {row['recall_at_k']:.3f}"
+            f" | disk {row['disk_bytes'] / 2 ** 20:>7.1f}MiB"
+        )
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Termax memory retrieval scaling benchmark.")
+    parser.add_argument('--sizes', nargs='+', type=int, default=[100, 1000, 10000, 100000])
+    parser.add_argument('--queries', type=int, default=100, help="Queries per size.")
+    parser.add_argument('--k', type=int, default=5, help="The k of recall@k and of the queries.")
+    parser.add_argument('--batch', type=int, default=1000, help="Records per add_query call.")
+    parser.add_argument('--space', default='l2', choices=['l2', 'cosine', 'ip'], help="hnsw:space")
+    parser.add_argument('--construction-ef', type=int, default=100, help="hnsw:construction_ef")
+    parser.add_argument('--search-ef', type=int, default=10, help="hnsw:search_ef")
+    parser.add_argument('--m', type=int, default=16, help="hnsw:M")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_memory.json', help="Where to write the results.")
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # 基准测试在子进程中运行，使 Termax 在导入时读取临时 HOME 下的配置
+    if args.child:
+        print(json.dumps(run(args, args.child)))
+        return
+
+    home = tempfile.mkdtemp(prefix='termax-memory-bench-')
+    try:
+        write_config(home, args)
+        env = dict(
+            os.environ, HOME=home, USERPROFILE=home, ANONYMIZED_TELEMETRY='False',
+            PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')]))
+        )
+        result = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.memory', *sys.argv[1:], '--child', home],
+            env=env, cwd=ROOT, stdout=subprocess.PIPE, text=True, check=True
+        )
+        lines = result.stdout.rstrip().splitlines()
+        print("\n".join(lines[:-1]))
+        with open(args.output, 'w') as file:
+            json.dump({'parameters': vars(args), 'results': json.loads(lines[-1])}, file, indent=2)
+        print(f"\nResults written to {args.output}")
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+"""
+A local mock server speaking the OpenAI chat-completions/embeddings protocol and the Ollama chat API,
+so the benchmarks can point `base_url`/`host_url` at it and run without network or API keys.
+With a certificate it serves HTTPS, and `--connect-delay` simulates the network round trips of a new connection.
+
+    python -m benchmarks.mock_server --port 8000 --latency 0.2
+    python -m benchmarks.mock_server --port 8443 --tls-cert cert.pem --tls-key key.pem --connect-delay 0.05
+"""
+import sys
+import ssl
+import json
+import time
+import zlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EMBEDDING_DIM = 64
+
+
+def fake_embedding(text: str):
+    """
+    fake_embedding: a deterministic bag-of-words embedding, similar texts get similar vectors.
+    """
+    vector = [0.0] * EMBEDDING_DIM
+    for word in text.lower().split():
+        vector[zlib.crc32(word.encode('utf-8')) % EMBEDDING_DIM] += 1.0
+    norm = sum(value * value for value in vector) ** 0.5 or 1.0
+    return [value / norm for value in vector]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        """
+        A new connection: wait for the simulated handshake round trips, then the TLS handshake itself.
+        """
+        server = self.server
+        if server.connect_delay:
+            time.sleep(server.connect_delay)
+        if server.context is not None:
+            self.request = server.context.wrap_socket(self.request, server_side=True)
+        server.connections += 1
+        super().setup()
+
+    def send_json(self, payload, status=200):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_stream(self, chunks, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for chunk in chunks:
+            data = chunk.encode('utf-8')
+            self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self):
+        if self.path.rstrip('/') in ('/api/tags', '/v1/models'):
+            self.send_json({'models': [], 'data': []})
+        else:
+            self.send_json({'error': f'unknown path {self.path}'}, status=404)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        server = self.server
+        server.requests.append({'path': self.path, 'body': body})
+        time.sleep(server.latency)
+
+        path = self.path.rstrip('/')
+        if path.endswith('/embeddings'):
+            texts = body['input'] if isinstance(body['input'], list) else [body['input']]
+            self.send_json({
+                'object': 'list',
+                'model': body.get('model'),
+                'data': [
+                    {'object': 'embedding', 'index': i, 'embedding': fake_embedding(text)} for i, text in enumerate(texts)
+                ],
+                'usage': {'prompt_tokens': 0, 'total_tokens': 0}
+            })
+        elif path.endswith('/chat/completions'):
+            self.chat_completions(body)
+        elif path in ('/api/chat', '/api/generate'):
+            self.ollama(body, chat=path == '/api/chat')
+        else:
+            self.send_json({'error': f'unknown path {self.path}'}, status=404)
+
+    def chat_completions(self, body):
+        server = self.server
+        prompt_tokens = sum(len(str(message.get('content', ''))) for message in body.get('messages', [])) // 4
+        if body.get('stream'):
+            chunks = []
+            for piece in server.pieces():
+                chunks.append("data: " + json.dumps({
+                    'id': 'mock', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                    'model': body.get('model'),
+                    'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]
+                }) + "\n\n")
+            chunks.append("data: [DONE]\n\n")
+            self.send_stream(chunks, 'text/event-stream')
+            return
+
+        self.send_json({
+            'id': 'mock',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model'),
+            'choices': [
+                {
+                    'index': i,
+                    'finish_reason': 'stop',
+                    'message': {'role': 'assistant', 'content': server.response}
+                } for i in range(body.get('n', 1))
+            ],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': len(server.response) // 4,
+                'total_tokens': prompt_tokens + len(server.response) // 4
+            }
+        })
+
+    def ollama(self, body, chat: bool):
+        server = self.server
+        created = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        prompt_tokens = sum(len(str(message.get('content', ''))) for message in body.get('messages', [])) // 4
+
+        def message(content, done):
+            payload = {'model': body.get('model'), 'created_at': created, 'done': done}
+            if chat:
+                payload['message'] = {'role': 'assistant', 'content': content}
+            else:
+                payload['response'] = content
+            if done:
+                payload.update({'prompt_eval_count': prompt_tokens, 'eval_count': len(server.response) // 4})
+            return payload
+
+        if body.get('stream', True):
+            chunks = [json.dumps(message(piece, False)) + "\n" for piece in server.pieces()]
+            chunks.append(json.dumps(message('', True)) + "\n")
+            self.send_stream(chunks, 'application/x-ndjson')
+        else:
+            self.send_json(message(server.response if chat else '', True))
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, response: str = 'Command: ls -la',
+                 latency: float = 0.0, tls_cert: str = None, tls_key: str = None, connect_delay: float = 0.0):
+        """
+        The mock LLM server.
+        Args:
+            host: the host to bind.
+            port: the port to bind, 0 picks a free port.
+            response: the completion returned for every chat request.
+            latency: the simulated latency of every request, in seconds.
+            tls_cert: the certificate to serve HTTPS with.
+            tls_key: the private key of the certificate.
+            connect_delay: the simulated round trips of every new connection (TCP and TLS handshakes), in seconds.
+        """
+        super().__init__((host, port), MockHandler)
+        self.response = response
+        self.latency = latency
+        self.connect_delay = connect_delay
+        self.context = None
+        if tls_cert:
+            self.context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            self.context.load_cert_chain(tls_cert, tls_key)
+        self.connections = 0
+        self.requests = []
+        self.thread = None
+
+    def handle_error(self, request, client_address):
+        """
+        Ignore the clients closing a stream early (e.g. once the command is complete).
+        """
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"{'https' if self.context is not None else 'http'}://{host}:{port}"
+
+    def pieces(self, size: int = 4):
+        """
+        pieces: the response split into the chunks of a streamed completion.
+        """
+        return [self.response[i:i + size] for i in range(0, len(self.response), size)]
+
+    def start(self):
+        """
+        start: serve in a background thread.
+        """
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """
+        stop: stop serving and close the socket.
+        """
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI/Ollama server for the Termax benchmarks.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0, help="Simulated latency per request, in seconds.")
+    parser.add_argument('--response', default='Command: ls -la', help="The completion returned for every request.")
+    parser.add_argument('--tls-cert', default=None, help="Serve HTTPS with this certificate.")
+    parser.add_argument('--tls-key', default=None, help="The private key of the certificate.")
+    parser.add_argument('--connect-delay', type=float, default=0.0, help="Simulated handshake time per connection.")
+    args = parser.parse_args()
+
+    server = MockServer(
+        args.host, args.port, args.response, args.latency, args.tls_cert, args.tls_key, args.connect_delay
+    )
+    print(f"Mock server listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Regression test of `extract_shell_commands` on recorded provider outputs: replays the command completions of one or
+more cassettes through the parser, measures its latency and compares the commands with a stored snapshot.
+
+    python -m benchmarks.parse ~/.termax/cassette.jsonl --update   # store the snapshot
+    python -m benchmarks.parse ~/.termax/cassette.jsonl            # compare against it
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+from termax.prompt import extract_shell_commands
+from termax.utils import iter_jsonl, percentile, read_json, write_json
+
+
+def outputs(paths: list):
+    """
+    outputs: the (key, text) of every recorded command completion.
+    """
+    for path in paths:
+        for entry in iter_jsonl(path):
+            text = (entry.get('response') or {}).get('text')
+            if entry.get('kind') in ('command', 'suggestion') and text:
+                yield f"{entry['key']}:{entry['time']}", text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded completions through extract_shell_commands.")
+    parser.add_argument('cassettes', nargs='+', help="The cassette files (JSONL).")
+    parser.add_argument('--snapshot', default=None, help="The expected commands, default <first cassette>.parsed.json")
+    parser.add_argument('--repeat', type=int, default=5, help="Parses per output, for the latency.")
+    parser.add_argument('--update', action='store_true', help="Store the parsed commands as the new snapshot.")
+    args = parser.parse_args()
+
+    snapshot_path = os.path.abspath(args.snapshot or f"{args.cassettes[0]}.parsed.json")
+    parsed, latencies = {}, []
+    for key, text in outputs(args.cassettes):
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            parsed[key] = extract_shell_commands(text)
+            latencies.append(time.perf_counter() - start)
+
+    if not parsed:
+        print("No recorded command completions found.")
+        return
+
+    print(
+        f"{len(parsed)} outputs | p50 {percentile(latencies, 50) * 1e6:.1f}us | p99 {percentile(latencies, 99) * 1e6:.1f}us"
+        f" | {len(latencies) / sum(latencies):.0f} parses/s"
+    )
+
+    if args.update:
+        write_json(snapshot_path, parsed)
+        print(f"Snapshot updated: {snapshot_path}")
+        return
+
+    expected = read_json(snapshot_path, {})
+    changed = [key for key, command in parsed.items() if key in expected and expected[key] != command]
+    for key in changed:
+        print(f"[changed] {key}\n  expected: {json.dumps(expected[key])}\n  parsed:   {json.dumps(parsed[key])}")
+    print(f"{len(changed)} changed, {len(set(parsed) - set(expected))} new against {snapshot_path}")
+    if changed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
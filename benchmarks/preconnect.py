@@ -0,0 +1,90 @@
+"""
+Pre-connect benchmark: the latency of a command request to a remote (HTTPS) provider, with and without the connection
+opened in the background while the prompt is being assembled. The provider is the local mock server over TLS, with a
+self-signed certificate and the handshake round trips simulated by --connect-delay.
+
+    python -m benchmarks.preconnect --connect-delay 0.05 --assemble 0.1 --runs 20
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+from .mock_server import MockServer
+
+
+def certificate(directory: str):
+    """
+    certificate: a self-signed certificate for 127.0.0.1, made with the openssl command line.
+    """
+    cert, key = os.path.join(directory, 'cert.pem'), os.path.join(directory, 'key.pem')
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=localhost',
+         '-addext', 'subjectAltName=IP:127.0.0.1,DNS:localhost', '-keyout', key, '-out', cert],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True
+    )
+    return cert, key
+
+
+def request(url: str, preconnect: bool, assemble: float):
+    """
+    request: one invocation, a fresh process state (no pooled connection), the prompt assembly simulated by a sleep.
+    Returns the total time and the time spent after the prompt was ready.
+    """
+    from termax.agent import OpenAIModel
+    from termax.utils import httpclient
+
+    httpclient._pools.clear()
+    start = time.perf_counter()
+    model = OpenAIModel('sk-bench', 'gpt-bench', 0.0, url)
+    model.ledger = None
+    if preconnect:
+        model.preconnect()
+    time.sleep(assemble)
+    ready = time.perf_counter()
+    model.to_command('You are a shell expert.', 'list the files')
+    end = time.perf_counter()
+    return end - start, end - ready
+
+
+def percentile(values: list, q: float):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Termax provider pre-connect benchmark.")
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--connect-delay', type=float, default=0.05, help="Simulated handshake time, in seconds.")
+    parser.add_argument('--latency', type=float, default=0.0, help="Simulated completion time, in seconds.")
+    parser.add_argument('--assemble', type=float, default=0.1, help="Simulated prompt assembly time, in seconds.")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='termax-preconnect-bench-')
+    try:
+        cert, key = certificate(directory)
+        os.environ['SSL_CERT_FILE'] = cert
+        server = MockServer(
+            latency=args.latency, tls_cert=cert, tls_key=key, connect_delay=args.connect_delay
+        ).start()
+        url = f"{server.url}/v1"
+        for preconnect in (False, True):
+            totals, requests = [], []
+            for _ in range(args.runs):
+                total, after = request(url, preconnect, args.assemble)
+                totals.append(total)
+                requests.append(after)
+            print(
+                f"preconnect={str(preconnect):<5} | total p50 {percentile(totals, 50) * 1000:>7.1f}ms"
+                f" p90 {percentile(totals, 90) * 1000:>7.1f}ms | after the prompt p50"
+                f" {percentile(requests, 50) * 1000:>7.1f}ms p90 {percentile(requests, 90) * 1000:>7.1f}ms"
+            )
+        server.stop()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+"""
+Offline benchmark suite for Termax: cold start, end-to-end `generate -p` and `termax-complete` latency, `guess`
+latency and prompt size across synthetic directories and memory sizes, against the local mock server or a recorded
+cassette.
+
+    python -m benchmarks.run --output bench_results.json --baseline benchmarks/baseline.json
+    python -m benchmarks.run --update-baseline
+    python -m benchmarks.run --platforms openai --cassette ~/.termax/cassette.jsonl
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import importlib.util
+import configparser
+
+from .mock_server import MockServer
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEXT = "list the five largest files in this directory"
+CLI = "import sys; from termax.cli.cli import cli; sys.argv[0] = 't'; cli()"
+FAST = "import sys; from termax.fast import main; sys.exit(main())"
+# the modules the fast path must not import, the interactive command line and the memory before it is opened
+FAST_EXCLUDED = ['click', 'rich', 'inquirer', 'pyperclip', 'termax.plugin', 'chromadb']
+FAST_IMPORTS = "import sys, json, termax.fast; print(json.dumps([n for n in sys.argv[1:] if n in sys.modules]))"
+
+POPULATE = """
+import sys
+from termax.prompt import Memory
+memory, target = Memory(), int(sys.argv[1])
+current = memory.count()
+tools = ['ls -la', 'du -sh *', 'git status', 'docker ps', 'find . -name', 'grep -rn', 'tar -czf', 'ssh deploy@host']
+for start in range(current, target, 500):
+    memory.add_query(queries=[
+        {'query': f'task {i} using {tools[i % len(tools)].split()[0]} on item{i}', 'response': f'{tools[i % len(tools)]} item{i}'}
+        for i in range(start, min(start + 500, target))
+    ])
+"""
+
+PROBE = """
+import sys, json, time
+from termax.prompt import Prompt, Memory
+from termax.cli.utils import load_model
+text, repeat = sys.argv[1], int(sys.argv[2])
+prompt = Prompt(Memory())
+model, plat = load_model()
+command_prompt = prompt.gen_commands(text, plat)
+guess = []
+for _ in range(repeat):
+    start = time.perf_counter()
+    suggestion_prompt = prompt.gen_suggestions('shell', plat)
+    model.to_command(prompt=suggestion_prompt, text=text, kind='suggestion')
+    guess.append(time.perf_counter() - start)
+print(json.dumps({'prompt_chars': len(command_prompt), 'suggestion_chars': len(suggestion_prompt), 'guess': guess}))
+"""
+
+
+def stats(samples: list):
+    """
+    stats: summarize the latency samples (seconds).
+    """
+    ordered = sorted(samples)
+    return {
+        'median': ordered[len(ordered) // 2],
+        'p95': ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))],
+        'min': ordered[0],
+        'samples': len(ordered)
+    }
+
+
+def write_config(home: str, plat: str, url: str):
+    """
+    write_config: a Termax configuration pointing every provider at the mock server. The [openai] section is always
+    present so the memory computes its embeddings through the mock server as well.
+    """
+    config = configparser.ConfigParser()
+    config['general'] = {
+        'platform': plat, 'auto_execute': 'False', 'show_command': 'True', 'storage_size': '1000000'
+    }
+    config['openai'] = {
+        'model': 'gpt-3.5-turbo', 'api_key': 'sk-bench', 'temperature': '0.7', 'base_url': f"{url}/v1"
+    }
+    config['ollama'] = {'model': 'llama2', 'host_url': url}
+    os.makedirs(os.path.join(home, '.termax'), exist_ok=True)
+    with open(os.path.join(home, '.termax', 'config'), 'w') as file:
+        config.write(file)
+
+
+def make_workdir(root: str, files: int):
+    """
+    make_workdir: a synthetic working directory with the given number of files.
+    """
+    workdir = os.path.join(root, f"files_{files}")
+    os.makedirs(os.path.join(workdir, 'src'), exist_ok=True)
+    os.makedirs(os.path.join(workdir, '.cache'), exist_ok=True)
+    for i in range(files):
+        with open(os.path.join(workdir, f"file_{i:05d}.{('py', 'txt', 'log', 'json')[i % 4]}"), 'w') as file:
+            file.write('x' * (i % 97))
+    return workdir
+
+
+def python(code: str, args: list, env: dict, cwd: str):
+    """
+    python: run the code in a fresh interpreter, return (seconds, stdout).
+    """
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-c', code, *args], env=env, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        text=True
+    )
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"benchmark step failed:\n{result.stderr[-2000:]}")
+    return elapsed, result.stdout
+
+
+def run(args):
+    """
+    run: run the benchmarks, return the results.
+    """
+    server = MockServer(latency=args.latency).start()
+    results = {
+        'meta': {
+            'time': time.time(),
+            'python': platform.python_version(),
+            'system': f"{platform.system()} {platform.machine()}",
+            'latency': args.latency,
+            'repeat': args.repeat
+        },
+        'metrics': {}
+    }
+    metrics = results['metrics']
+    root = tempfile.mkdtemp(prefix='termax-bench-')
+    try:
+        for plat in args.platforms:
+            if importlib.util.find_spec(plat) is None:
+                print(f"[skip] {plat}: the client package is not installed.")
+                continue
+
+            home = os.path.join(root, f"home_{plat}")
+            write_config(home, plat, server.url)
+            env = dict(
+                os.environ, HOME=home, USERPROFILE=home, ANONYMIZED_TELEMETRY='False',
+                PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')]))
+            )
+            if args.cassette:
+                env.update(
+                    TERMAX_CASSETTE=os.path.abspath(args.cassette), TERMAX_CASSETTE_MODE='replay',
+                    TERMAX_CASSETTE_LATENCY=args.cassette_latency
+                )
+
+            cold = [python("import termax.cli.cli", [], env, root)[0] for _ in range(args.repeat)]
+            metrics[f"cold_start.import[{plat}]"] = stats(cold)
+            version = [python(CLI, ['--version'], env, root)[0] for _ in range(args.repeat)]
+            metrics[f"cold_start.version[{plat}]"] = stats(version)
+            leaked = json.loads(python(FAST_IMPORTS, FAST_EXCLUDED, env, root)[1])
+            if leaked:
+                raise RuntimeError(f"termax.fast imports {', '.join(leaked)}.")
+            fast = [python("import termax.fast", [], env, root)[0] for _ in range(args.repeat)]
+            metrics[f"cold_start.import_fast[{plat}]"] = stats(fast)
+
+            for files in args.files:
+                workdir = make_workdir(root, files)
+                for size in args.memory:
+                    python(POPULATE, [str(size)], env, root)
+                    key = f"{plat},files={files},memory={size}"
+
+                    generate = [python(CLI, ['termax', '-p', TEXT], env, workdir)[0] for _ in range(args.repeat)]
+                    metrics[f"generate_p[{key}]"] = stats(generate)
+                    complete = [python(FAST, [TEXT], env, workdir)[0] for _ in range(args.repeat)]
+                    metrics[f"complete[{key}]"] = stats(complete)
+
+                    probe = json.loads(python(PROBE, [TEXT, str(args.repeat)], env, workdir)[1].strip().splitlines()[-1])
+                    metrics[f"guess[{key}]"] = stats(probe['guess'])
+                    metrics[f"prompt_chars.command[{key}]"] = {'value': probe['prompt_chars']}
+                    metrics[f"prompt_chars.suggestion[{key}]"] = {'value': probe['suggestion_chars']}
+                    print(f"[done] {key}")
+    finally:
+        server.stop()
+        shutil.rmtree(root, ignore_errors=True)
+
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float):
+    """
+    compare: print the results against the baseline, return the names of the regressed metrics.
+    """
+    regressions = []
+    print(f"\n{'metric':<64}{'current':>12}{'baseline':>12}{'change':>10}")
+    for name, current in results['metrics'].items():
+        value = current.get('median', current.get('value'))
+        before = baseline.get('metrics', {}).get(name, {})
+        before = before.get('median', before.get('value'))
+        if before is None:
+            print(f"{name:<64}{value:>12.4g}{'-':>12}{'-':>10}")
+            continue
+
+        change = (value - before) / before if before else 0.0
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<64}{value:>12.4g}{before:>12.4g}{change:>+9.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Termax offline benchmarks.")
+    parser.add_argument('--platforms', nargs='+', default=['openai', 'ollama'])
+    parser.add_argument('--files', nargs='+', type=int, default=[10, 1000], help="Files in the synthetic directories.")
+    parser.add_argument('--memory', nargs='+', type=int, default=[0, 1000], help="Records in the command memory.")
+    parser.add_argument('--repeat', type=int, default=5, help="Samples per latency metric.")
+    parser.add_argument('--latency', type=float, default=0.0, help="Simulated provider latency, in seconds.")
+    parser.add_argument('--cassette', default=None, help="Serve the completions from a recorded cassette.")
+    parser.add_argument('--cassette-latency', default='recorded', help="Replay latency: recorded or seconds.")
+    parser.add_argument('--output', default='bench_results.json', help="Where to write the results.")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="The stored baseline to compare with.")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Relative slowdown reported as a regression.")
+    parser.add_argument('--update-baseline', action='store_true', help="Store the results as the new baseline.")
+    parser.add_argument('--fail-on-regression', action='store_true', help="Exit with 1 if any metric regressed.")
+    args = parser.parse_args()
+
+    results = run(args)
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+        return
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    regressions = compare(results, baseline, args.threshold)
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -35,11 +35,14 @@ setup(
     url='https://github.com/huangyz0918/termax',
     download_url='https://github.com/huangyz0918/termax/archive/refs/heads/main.zip',
     keywords=['LLM', 'deep learning', 'MLOps', 'shell', 'neural networks', 'command line', 'terminal', 'autocomplete'],
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks', 'benchmarks.*']),
     entry_points={
         "console_scripts": [
             "termax=termax.cli.cli:cli",
             "t=termax.cli.cli:cli",
+            "termax-complete=termax.fast:main",
+            "termax-prefetch=termax.prefetch:main",
+            "termax-startup=termax.startup:main",
         ]
     },
     include_package_data=True,
@@ -5,3 +5,4 @@ from ._claude import *
 from ._gemini import *
 from ._openai import *
 from ._ollama import *
+from ._router import *
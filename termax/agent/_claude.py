@@ -1,8 +1,9 @@
+import json
 import importlib.util
 
-from .types import Model
+from .types import Model, CommandResponse
 from termax.utils.const import *
-from termax.prompt import extract_shell_commands
+from termax.function import get_function_declarations
 
 
 class ClaudeModel(Model):
@@ -30,26 +31,49 @@ class ClaudeModel(Model):
         self.model_type = CONFIG_SEC_CLAUDE
         self.client = self.anthropic.Anthropic(api_key=api_key)
         self.generation_config = generation_config
+        self.parameters = generation_config
 
-    def to_command(self, prompt, text):
+    def _complete(self, messages, version, **params):
         """
-        Generate a command based on the prompt and text.
+        Request a message, the system messages are passed as the system prompt.
         Args:
-            prompt (str): The prompt.
-            text (str): The text.
+            messages (list): The chat messages.
+            version (str): The model version for the task.
+            params: The extra request parameters.
         """
+        system = "\n".join(message['content'] for message in messages if message['role'] == 'system')
+        if system:
+            params['system'] = system
+
         message = self.client.messages.create(
-            model=self.version,
-            system=prompt,
+            model=version,
             max_tokens=self.generation_config['max_tokens'],
             temperature=self.generation_config['temperature'],
             top_k=self.generation_config['top_k'],
             top_p=self.generation_config['top_p'],
             stop_sequences=self.generation_config['stop_sequences'],
-            messages=[{"role": "user", "content": text}]
+            messages=[message for message in messages if message['role'] != 'system'],
+            **params
         )
-        response = message.content[0].text
-        return extract_shell_commands(response)
+        self.track_message(message)
+        text = "".join(block.text for block in message.content if block.type == 'text')
+        tool = next((block for block in message.content if block.type == 'tool_use'), None)
+        return {
+            'text': text,
+            'function_call': {'name': tool.name, 'arguments': json.dumps(tool.input)} if tool else None
+        }
+
+    def to_command(self, prompt, text, kind='command'):
+        """
+        Generate a command based on the prompt and text.
+        Args:
+            prompt (str): The prompt.
+            text (str): The text.
+            kind (str): The task, command or suggestion.
+        """
+        chat_history = [{"role": "system", "content": prompt}, {"role": "user", "content": text}]
+        completion = self.complete(chat_history, kind=kind, **self.command_params())
+        return CommandResponse.from_completion(completion).command
 
     def to_description(self, prompt, command):
         """
@@ -58,14 +82,28 @@ class ClaudeModel(Model):
             prompt (str): The prompt.
             command (str): The command.
         """
-        message = self.client.messages.create(
-            model=self.version,
-            max_tokens=self.generation_config['max_tokens'],
-            temperature=self.generation_config['temperature'],
-            top_k=self.generation_config['top_k'],
-            top_p=self.generation_config['top_p'],
-            stop_sequences=self.generation_config['stop_sequences'],
-            messages=[{"role": "user", "content": f"{prompt} {command}"}]
+        completion = self.complete([{"role": "user", "content": f"{prompt} {command}"}], kind='description')
+        return completion['text']
+
+    def command_params(self, n=1):
+        """
+        Answer with one of the tools (the shell command, or a script).
+        """
+        if not self.structured:
+            return {}
+        tools = [
+            {'name': function['name'], 'description': function['description'], 'input_schema': function['parameters']}
+            for function in get_function_declarations()
+        ]
+        return {'tools': tools, 'tool_choice': {'type': 'any'}}
+
+    def track_message(self, message):
+        """
+        Keep the token usage of the message.
+        Args:
+            message: The message returned by the Anthropic client.
+        """
+        self.track(
+            message.usage.input_tokens, message.usage.output_tokens,
+            getattr(message.usage, 'cache_read_input_tokens', 0)
         )
-        response = message.content[0].text
-        return response
@@ -1,8 +1,9 @@
+import json
 import importlib.util
 
-from .types import Model
+from .types import Model, CommandResponse
 from termax.utils.const import *
-from termax.prompt import extract_shell_commands
+from termax.function import get_function_declarations
 
 
 class GeminiModel(Model):
@@ -31,30 +32,83 @@ class GeminiModel(Model):
         self.version = version
         self.model_type = CONFIG_SEC_GEMINI
         self.client = self.genai.configure(api_key=api_key)
-        self.generation_config = self.genai.GenerationConfig(
-            stop_sequences=generation_config['stop_sequences'],
-            temperature=generation_config['temperature'],
-            top_p=generation_config['top_p'],
-            top_k=generation_config['top_k'],
-            candidate_count=generation_config['candidate_count'],
-            max_output_tokens=generation_config['max_output_tokens'])
+        self.parameters = generation_config
+        self.multiple = True
+        self.generation_config = self.build_config(generation_config['candidate_count'])
 
-    def to_command(self, prompt, text):
+    def build_config(self, candidate_count):
+        """
+        The generation config of a request.
+        Args:
+            candidate_count (int): The number of candidates to return.
+        """
+        return self.genai.GenerationConfig(
+            stop_sequences=self.parameters['stop_sequences'],
+            temperature=self.parameters['temperature'],
+            top_p=self.parameters['top_p'],
+            top_k=self.parameters['top_k'],
+            candidate_count=candidate_count,
+            max_output_tokens=self.parameters['max_output_tokens'])
+
+    def _complete(self, messages, version, **params):
+        """
+        Send the last message to a chat started with the previous ones. A system message is given to Gemini as a user
+        message acknowledged by the model. Several candidates (`n`) are requested with `generate_content`, as the chat
+        only supports one.
+        Args:
+            messages (list): The chat messages.
+            version (str): The model version for the task.
+            params: The extra parameters of `send_message` (e.g. the tools), and the number of candidates `n`.
+        """
+        n = params.pop('n', None)
+        chat_history = []
+        for message in messages[:-1]:
+            if message['role'] == 'system':
+                chat_history.append(self.glm.Content(parts=[self.glm.Part(text=message['content'])], role="user"))
+                chat_history.append(self.glm.Content(parts=[self.glm.Part(text="understand")], role="model"))
+            else:
+                role = "model" if message['role'] == 'assistant' else "user"
+                chat_history.append(self.glm.Content(parts=[self.glm.Part(text=message['content'])], role=role))
+
+        model = self.genai.GenerativeModel(version)
+        if n and n > 1:
+            message = self.glm.Content(parts=[self.glm.Part(text=messages[-1]['content'])], role="user")
+            config = self.build_config(n)
+            response = model.generate_content(chat_history + [message], generation_config=config, **params)
+            self.track_response(response)
+            choices = [self.choice(candidate) for candidate in response.candidates]
+            return {**choices[0], 'choices': choices} if choices else {'text': '', 'function_call': None}
+
+        chat = model.start_chat(history=chat_history)
+        response = chat.send_message(messages[-1]['content'], generation_config=self.generation_config, **params)
+        self.track_response(response)
+        return self.choice(response.candidates[0])
+
+    @staticmethod
+    def choice(candidate):
+        """
+        The text and function call of a candidate.
+        """
+        text, function_call = '', None
+        for part in candidate.content.parts:
+            function = getattr(part, 'function_call', None)
+            if function and function.name:
+                function_call = {'name': function.name, 'arguments': json.dumps(dict(function.args))}
+            else:
+                text += getattr(part, 'text', '')
+        return {'text': text, 'function_call': function_call}
+
+    def to_command(self, prompt, text, kind='command'):
         """
         Generate a command based on the prompt and text.
         Args:
             prompt (str): The prompt.
             text (str): The text.
+            kind (str): The task, command or suggestion.
         """
-        chat_history = [
-            self.glm.Content(parts=[self.glm.Part(text=prompt)], role="user"),
-            self.glm.Content(parts=[self.glm.Part(text="understand")], role="model")
-        ]
-
-        model = self.genai.GenerativeModel(self.version)
-        chat = model.start_chat(history=chat_history)
-        response = chat.send_message(text, generation_config=self.generation_config).text
-        return extract_shell_commands(response)
+        chat_history = [{"role": "system", "content": prompt}, {"role": "user", "content": text}]
+        completion = self.complete(chat_history, kind=kind, **self.command_params())
+        return CommandResponse.from_completion(completion).command
 
     def to_description(self, prompt, command):
         """
@@ -64,7 +118,29 @@ class GeminiModel(Model):
             command (str): The command.
 
         """
-        model = self.genai.GenerativeModel(self.version)
-        chat = model.start_chat(history=[])
-        response = chat.send_message(f"{prompt} {command}", generation_config=self.generation_config).text
-        return response
+        completion = self.complete([{"role": "user", "content": f"{prompt} {command}"}], kind='description')
+        return completion['text']
+
+    def command_params(self, n=1):
+        """
+        Answer with one of the declared functions (the shell command, or a script), and ask for `n` candidates in the
+        same request.
+        """
+        params = {'n': n} if n > 1 else {}
+        if self.structured:
+            params['tools'] = [{'function_declarations': get_function_declarations()}]
+            params['tool_config'] = {'function_calling_config': {'mode': 'ANY'}}
+        return params
+
+    def track_response(self, response):
+        """
+        Keep the token usage of the response.
+        Args:
+            response: The response returned by the Gemini chat.
+        """
+        metadata = getattr(response, 'usage_metadata', None)
+        if metadata:
+            self.track(
+                metadata.prompt_token_count, metadata.candidates_token_count,
+                getattr(metadata, 'cached_content_token_count', 0)
+            )
@@ -1,8 +1,8 @@
 import importlib.util
 
 from termax.utils.const import *
-from termax.prompt import extract_shell_commands
-from .types import Model
+from termax.function import get_function_declarations
+from .types import Model, CommandResponse
 
 
 class MistralModel(Model):
@@ -32,26 +32,43 @@ class MistralModel(Model):
         self.model_type = CONFIG_SEC_MISTRAL
         self.client = self.MistralClient(api_key=api_key)
         self.generation_config = generation_config
+        self.parameters = generation_config
 
-    def to_command(self, prompt, text):
+    def _complete(self, messages, version, **params):
         """
-        Generate a command based on the prompt and text.
+        Request a chat completion.
         Args:
-            prompt (str): The prompt.
-            text (str): The text.
+            messages (list): The chat messages.
+            version (str): The model version for the task.
+            params: The extra request parameters, e.g. the tools.
         """
         chat_response = self.client.chat(
-            model=self.version,
-            messages=[
-                self.ChatMessage(role="system", content=prompt),
-                self.ChatMessage(role="user", content=text)
-            ],
+            model=version,
+            messages=[self.ChatMessage(role=message['role'], content=message['content']) for message in messages],
             temperature=self.generation_config['temperature'],
             top_p=self.generation_config['top_p'],
-            max_tokens=self.generation_config['max_tokens']
+            max_tokens=self.generation_config['max_tokens'],
+            **params
         )
-        response = chat_response.choices[0].message.content
-        return extract_shell_commands(response)
+        self.track_response(chat_response)
+        message = chat_response.choices[0].message
+        function = message.tool_calls[0].function if getattr(message, 'tool_calls', None) else None
+        return {
+            'text': message.content,
+            'function_call': {'name': function.name, 'arguments': function.arguments} if function else None
+        }
+
+    def to_command(self, prompt, text, kind='command'):
+        """
+        Generate a command based on the prompt and text.
+        Args:
+            prompt (str): The prompt.
+            text (str): The text.
+            kind (str): The task, command or suggestion.
+        """
+        chat_history = [{"role": "system", "content": prompt}, {"role": "user", "content": text}]
+        completion = self.complete(chat_history, kind=kind, **self.command_params())
+        return CommandResponse.from_completion(completion).command
 
     def to_description(self, prompt, command):
         """
@@ -60,11 +77,23 @@ class MistralModel(Model):
             prompt (str): The prompt.
             command (str): The command.
         """
-        chat_response = self.client.chat(
-            model=self.version,
-            messages=[self.ChatMessage(role="user", content=f"{prompt} {command}")],
-            temperature=self.generation_config['temperature'],
-            top_p=self.generation_config['top_p'],
-            max_tokens=self.generation_config['max_tokens']
-        )
-        return chat_response.choices[0].message.content
+        completion = self.complete([{"role": "user", "content": f"{prompt} {command}"}], kind='description')
+        return completion['text']
+
+    def command_params(self, n=1):
+        """
+        Answer with one of the functions (the shell command, or a script).
+        """
+        if not self.structured:
+            return {}
+        tools = [{'type': 'function', 'function': function} for function in get_function_declarations()]
+        return {'tools': tools, 'tool_choice': 'any'}
+
+    def track_response(self, chat_response):
+        """
+        Keep the token usage of the chat response.
+        Args:
+            chat_response: The chat response returned by the Mistral client.
+        """
+        if chat_response.usage:
+            self.track(chat_response.usage.prompt_tokens, chat_response.usage.completion_tokens)
@@ -1,16 +1,21 @@
+import json
 import importlib.util
 
-from .types import Model
-from termax.prompt import extract_shell_commands, is_url
+from .types import Model, CommandResponse
+from termax.utils.const import *
+from termax.prompt import is_url, CommandStream
 
 
 class OllamaModel(Model):
-    def __init__(self, host_url, version):
+    def __init__(self, host_url, version, keep_alive=None, options=None, stream=False):
         """
         Initialize the Ollama model.
         Args:
             host_url (str): The Ollama Host url.
             version (str): The model version.
+            keep_alive (str): How long Ollama keeps the model loaded after a request, e.g. 30m or -1 (forever).
+            options (dict): The model options, e.g. num_ctx, num_predict, temperature.
+            stream (bool): Stream the completions, and stop reading once the command is complete.
         """
         super().__init__()
 
@@ -28,17 +33,106 @@ class OllamaModel(Model):
             )
 
         self.version = version
+        self.model_type = CONFIG_SEC_OLLAMA
+        self.keep_alive = keep_alive
+        self.options = options or {}
+        self.stream = stream
+        self.parameters = {'keep_alive': keep_alive, 'options': self.options}
         if is_url(host_url):
             self.client = self.Client(host=host_url)
         else:
             self.client = self.Client()
 
-    def to_command(self, prompt, text):
+    def _complete(self, messages, version, **params):
+        """
+        Request a chat completion. In the JSON mode (`format='json'`), the answer format is added to the system prompt
+        and the shell command is read from the JSON object.
+        Args:
+            messages (list): The chat messages.
+            version (str): The model version for the task.
+            params: The extra request parameters, `extract` stops a streamed completion once the command is complete.
+        """
+        extract = params.pop('extract', False)
+        structured = params.get('format') == 'json'
+        if structured:
+            messages = [
+                {**message, 'content': f"{message['content']}\n\n{JSON_COMMAND_INSTRUCTION}"}
+                if message['role'] == 'system' else message for message in messages
+            ]
+            if not any(message['role'] == 'system' for message in messages):
+                messages = [{'role': 'system', 'content': JSON_COMMAND_INSTRUCTION}] + messages
+        if self.keep_alive is not None:
+            params['keep_alive'] = self.keep_alive
+        if self.options:
+            params['options'] = self.options
+
+        if not self.stream:
+            completion = self.client.chat(model=version, messages=messages, **params)
+            self.track(completion.get('prompt_eval_count', 0), completion.get('eval_count', 0))
+            text = completion['message']['content']
+        else:
+            text = self.stream_chat(version, messages, extract and not structured, **params)
+        return self.json_choice(text) if structured else {'text': text, 'function_call': None}
+
+    def stream_chat(self, version, messages, extract, **params):
+        """
+        Stream a chat completion.
+        Args:
+            version (str): The model version for the task.
+            messages (list): The chat messages.
+            extract (bool): Stop once the command is complete, and return the text up to its end.
+            params: The extra request parameters.
+        """
+        stream = CommandStream()
+        chunks = self.client.chat(model=version, messages=messages, stream=True, **params)
+        for count, chunk in enumerate(chunks, 1):
+            if chunk.get('done'):
+                self.track(chunk.get('prompt_eval_count', 0), chunk.get('eval_count', 0))
+            if stream.feed(chunk['message']['content']) and extract:
+                # 命令已完整，关闭连接，不再等待之后的解释；此时只能按片段数估计输出的 token
+                getattr(chunks, 'close', lambda: None)()
+                if not chunk.get('done'):
+                    self.track(0, count)
+                return stream.text[:stream.end()]
+        return stream.text
+
+    @staticmethod
+    def json_choice(text):
+        """
+        The shell command of a JSON answer as a function call, the text is kept for the parser if it is not one.
+        """
+        try:
+            answer = json.loads(text)
+        except ValueError:
+            answer = None
+        command = answer.get('shell_command') if isinstance(answer, dict) else None
+        if not isinstance(command, str):
+            return {'text': text, 'function_call': None}
+        function_call = {'name': SHELL_FUNCTION, 'arguments': json.dumps({'shell_command': command})}
+        return {'text': text, 'function_call': function_call}
+
+    def command_params(self, n=1):
+        """
+        Answer in JSON, or else stop the streamed command completions once the command is complete.
+        """
+        return {'format': 'json'} if self.structured else {'extract': True}
+
+    def warmup(self):
+        """
+        Preload the models of every task, so the next request does not pay the model load.
+        """
+        for version in {self.version, *self.tasks.values()}:
+            params = {'keep_alive': self.keep_alive} if self.keep_alive is not None else {}
+            self.client.generate(model=version, prompt='', **params)
+        return True
+
+    def to_command(self, prompt, text, kind='command'):
         """
         Generate a command based on the prompt and text.
         Args:
             prompt (str): The prompt.
             text (str): The text.
+            kind (str): The task, command or suggestion.
         """
         try:
             chat_history = [
@@ -46,13 +140,8 @@ class OllamaModel(Model):
                 {"role": "user", "content": text}
             ]
 
-            completion = self.client.chat(
-                model=self.version,
-                messages=chat_history,
-            )
-
-            response = completion['message']['content']
-            return extract_shell_commands(response)
+            completion = self.complete(chat_history, kind=kind, **self.command_params())
+            return CommandResponse.from_completion(completion).command
         except self.ResponseError as e:
             print(f"Ollama Error: {e.error}")
         except Exception as e:
@@ -71,13 +160,8 @@ class OllamaModel(Model):
                 {"role": "user", "content": f"{prompt} {command}"},
             ]
 
-            completion = self.client.chat(
-                model=self.version,
-                messages=chat_history,
-            )
-
-            response = completion['message']['content']
-            return response
+            completion = self.complete(chat_history, kind='description')
+            return completion['text']
         except self.ResponseError as e:
             print(f"Ollama Error: {e.error}")
         except Exception as e:
@@ -1,47 +1,155 @@
-import json
 import importlib.util
 
-from .types import Model
-from termax.prompt import extract_shell_commands, is_url
-from termax.function import get_all_function_schemas, get_all_functions
+from .types import Model, CommandResponse
+from termax.utils.const import *
+from termax.utils.httpclient import HTTPClient, RateLimitError
+from termax.prompt import is_url, CommandStream
+from termax.function import get_all_function_schemas
 
 
 class OpenAIModel(Model):
-    def __init__(self, api_key, version, temperature, base_url):
+    def __init__(self, api_key, version, temperature, base_url, client=OPENAI_CLIENT_BUILTIN, timeout=60.0,
+                 stream=False, platform=CONFIG_SEC_OPENAI):
         """
-        Initialize the OpenAI model.
+        Initialize the OpenAI model, for OpenAI or any OpenAI-compatible chat completions endpoint.
         Args:
             api_key (str): The OpenAI API key.
             version (str): The model version.
             temperature (float): The temperature value.
+            base_url (str): The endpoint, default is OpenAI's.
+            client (str): builtin, the standard library client with pooled keep-alive connections, or sdk, the
+                openai package.
+            timeout (float): The request timeout, in seconds.
+            stream (bool): Stream the completions, and stop the command completions once the command is complete.
+            platform (str): The platform name, openai or openai-compatible.
         """
         super().__init__()
 
-        dependency = "openai"
-        spec = importlib.util.find_spec(dependency)
-        if spec is not None:
-            self.OpenAI = importlib.import_module(dependency).OpenAI
-            self.RateLimitError = importlib.import_module(dependency).RateLimitError
-        else:
-            raise ImportError(
-                "It seems you didn't install openai. In order to enable the OpenAI client related features, "
-                "please make sure openai Python package has been installed. "
-                "More information, please refer to: https://openai.com/product"
-            )
+        if client == OPENAI_CLIENT_SDK:
+            dependency = "openai"
+            spec = importlib.util.find_spec(dependency)
+            if spec is not None:
+                self.OpenAI = importlib.import_module(dependency).OpenAI
+                self.RateLimitError = importlib.import_module(dependency).RateLimitError
+            else:
+                raise ImportError(
+                    "It seems you didn't install openai. In order to enable the OpenAI client related features, "
+                    "please make sure openai Python package has been installed, or use the builtin client. "
+                    "More information, please refer to: https://openai.com/product"
+                )
 
         self.version = version
+        self.model_type = platform
         self.temperature = temperature
-        if is_url(base_url):
-            self.client = self.OpenAI(api_key=api_key, base_url=base_url)
+        self.parameters = {'temperature': temperature}
+        self.multiple = True
+        self.stream = stream
+        base_url = base_url if is_url(base_url) else OPENAI_BASE_URL
+        if client == OPENAI_CLIENT_SDK:
+            self.http = None
+            self.client = self.OpenAI(api_key=api_key, base_url=base_url, timeout=timeout)
+        else:
+            self.RateLimitError = RateLimitError
+            self.http = HTTPClient(base_url, api_key=api_key, timeout=timeout)
+            self.client = None
+
+    def _complete(self, messages, version, **params):
+        """
+        Request a chat completion.
+        Args:
+            messages (list): The chat messages.
+            version (str): The model version for the task.
+            params: The extra request parameters, e.g. the functions or the number of choices `n`, `extract` stops a
+                streamed completion once the command is complete.
+        """
+        extract = params.pop('extract', False)
+        payload = {'model': version, 'messages': messages, 'temperature': self.temperature, **params}
+        if self.stream and params.get('n', 1) == 1:
+            return self.stream_chat(payload, extract)
+
+        if self.http is not None:
+            completion = self.http.post('/chat/completions', payload)
         else:
-            self.client = self.OpenAI(api_key=api_key)
+            completion = self.client.chat.completions.create(**payload).model_dump()
+        self.track_usage(completion.get('usage'))
 
-    def to_command(self, prompt, text):
+        choices = [self.choice(choice['message']) for choice in completion['choices']]
+        if len(choices) > 1:
+            return {**choices[0], 'choices': choices}
+        return choices[0]
+
+    def stream_chat(self, payload, extract):
+        """
+        Stream a chat completion (server-sent events), assembling the text and the function call.
+        Args:
+            payload (dict): The request.
+            extract (bool): Stop once the command is complete, and return the text up to its end.
+        """
+        payload = {**payload, 'stream': True}
+        if self.model_type == CONFIG_SEC_OPENAI:
+            payload['stream_options'] = {'include_usage': True}
+        if self.http is not None:
+            source = chunks = self.http.stream('/chat/completions', payload)
+        else:
+            source = self.client.chat.completions.create(**payload)
+            chunks = (chunk.model_dump() for chunk in source)
+
+        stream, name, arguments, tracked, count = CommandStream(), None, '', False, 0
+        try:
+            for count, chunk in enumerate(chunks, 1):
+                if chunk.get('usage'):
+                    self.track_usage(chunk['usage'])
+                    tracked = True
+                if not chunk.get('choices'):
+                    continue
+                delta = chunk['choices'][0].get('delta') or {}
+                function = delta.get('function_call')
+                if function:
+                    name = function.get('name') or name
+                    arguments += function.get('arguments') or ''
+                if stream.feed(delta.get('content')) and extract and name is None:
+                    # 命令已完整，关闭连接，不再等待之后的解释
+                    stream.text = stream.text[:stream.end()]
+                    break
+        finally:
+            getattr(source, 'close', lambda: None)()
+
+        if not tracked:
+            # 服务端没有返回用量时只能按片段数估计输出的 token
+            self.track(0, count)
+        return {
+            'text': stream.text,
+            'function_call': {'name': name, 'arguments': arguments} if name else None
+        }
+
+    def preconnect(self):
+        """
+        Open a connection to the endpoint in the background, it is handed to the first request from the built-in
+        client's pool. Nothing to do when the completions are replayed from a cassette.
+        """
+        if self.http is None or (self.cassette is not None and self.cassette.mode == CASSETTE_REPLAY):
+            return False
+        self.http.preconnect()
+        return True
+
+    @staticmethod
+    def choice(message):
+        """
+        The text and function call of a choice's message.
+        """
+        function = message.get('function_call')
+        return {
+            'text': message.get('content'),
+            'function_call': {'name': function['name'], 'arguments': function['arguments']} if function else None
+        }
+
+    def to_command(self, prompt, text, kind='command'):
         """
         Generate a command based on the prompt and text.
         Args:
             prompt (str): The prompt.
             text (str): The text.
+            kind (str): The task, command or suggestion.
         """
         try:
             chat_history = [
@@ -49,26 +157,13 @@ class OpenAIModel(Model):
                 {"role": "user", "content": text}
             ]
 
-            completion = self.client.chat.completions.create(
-                model=self.version,
-                messages=chat_history,
-                temperature=self.temperature,
-                functions=get_all_function_schemas()
-            )
-
-            function = completion.choices[0].message.function_call
-            if function:
-                for f in get_all_functions():
-                    if f.openai_schema["name"] == function.name:
-                        return f.execute(**json.loads(function.arguments))
-            else:
-                response = completion.choices[0].message.content
-                return extract_shell_commands(response)
+            completion = self.complete(chat_history, kind=kind, **self.command_params())
+            return CommandResponse.from_completion(completion).command
         except self.RateLimitError as e:
             print("Rate limit exceeded. Please try again later.")
             print(f"Error message: {e}")
         except Exception as e:
-            print("OpenAI error occurred.")
+            print(f"{self.model_type} error occurred.")
             print(f"Error message: {e}")
 
     def to_description(self, prompt, command):
@@ -78,15 +173,27 @@ class OpenAIModel(Model):
             prompt (str): The prompt.
             command (str): The command.
         """
-        completion = self.client.chat.completions.create(
-            model=self.version,
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"{prompt} {command}",
-                }
-            ],
-            temperature=self.temperature
-        )
-        response = completion.choices[0].message.content
-        return response
+        completion = self.complete([{"role": "user", "content": f"{prompt} {command}"}], kind='description')
+        return completion['text']
+
+    def command_params(self, n=1):
+        """
+        Offer the functions to the model, ask for `n` choices in the same request, and stop a streamed command
+        completion once the command is complete.
+        """
+        params = {'functions': get_all_function_schemas()} if self.structured else {}
+        if self.stream:
+            params['extract'] = True
+        if n > 1:
+            params['n'] = n
+        return params
+
+    def track_usage(self, usage):
+        """
+        Keep the token usage of the chat completion.
+        Args:
+            usage (dict): The usage of the chat completion.
+        """
+        if usage:
+            details = usage.get('prompt_tokens_details') or {}
+            self.track(usage.get('prompt_tokens'), usage.get('completion_tokens'), details.get('cached_tokens'))
@@ -1,8 +1,8 @@
 import importlib.util
 
-from .types import Model
+from .types import Model, CommandResponse
 from termax.utils.const import *
-from termax.prompt import extract_shell_commands
+from termax.function import get_function_declarations
 
 
 class QianFanModel(Model):
@@ -32,24 +32,47 @@ class QianFanModel(Model):
         self.client = self.qianfan.ChatCompletion(ak=api_key, sk=secret_key)
         self.version = version
         self.generation_config = generation_config
+        self.parameters = generation_config
 
-    def to_command(self, prompt, text):
+    def _complete(self, messages, version, **params):
         """
-        Generate a command based on the prompt and request.
+        Request a chat completion, the system messages are passed as the system prompt.
         Args:
-            prompt (str): The prompt.
-            text (str): The request text.
+            messages (list): The chat messages.
+            version (str): The model version for the task.
+            params: The extra request parameters, e.g. the functions.
         """
+        system = "\n".join(message['content'] for message in messages if message['role'] == 'system')
+        if system:
+            params['system'] = system
+
         message = self.client.do(
-            model=self.version,
-            messages=[{"role": "user", "content": text}],
-            system=prompt,
+            model=version,
+            messages=[message for message in messages if message['role'] != 'system'],
             temperature=self.generation_config['temperature'],
             top_p=self.generation_config['top_p'],
-            max_output_tokens=self.generation_config['max_output_tokens']
+            max_output_tokens=self.generation_config['max_output_tokens'],
+            **params
         )
-        response = message['body']['result']
-        return extract_shell_commands(response)
+        usage = message['body'].get('usage', {})
+        self.track(usage.get('prompt_tokens', 0), usage.get('completion_tokens', 0))
+        function = message['body'].get('function_call')
+        return {
+            'text': message['body'].get('result'),
+            'function_call': {'name': function['name'], 'arguments': function['arguments']} if function else None
+        }
+
+    def to_command(self, prompt, text, kind='command'):
+        """
+        Generate a command based on the prompt and request.
+        Args:
+            prompt (str): The prompt.
+            text (str): The request text.
+            kind (str): The task, command or suggestion.
+        """
+        chat_history = [{"role": "system", "content": prompt}, {"role": "user", "content": text}]
+        completion = self.complete(chat_history, kind=kind, **self.command_params())
+        return CommandResponse.from_completion(completion).command
 
     def to_description(self, prompt, command):
         """
@@ -58,12 +81,11 @@ class QianFanModel(Model):
             prompt (str): The prompt.
             command (str): The command.
         """
-        message = self.client.do(
-            model=self.version,
-            messages=[{"role": "user", "content": f"{prompt} {command}"}],
-            temperature=self.generation_config['temperature'],
-            top_p=self.generation_config['top_p'],
-            max_output_tokens=self.generation_config['max_output_tokens']
-        )
-        response = message['body']['result']
-        return response
+        completion = self.complete([{"role": "user", "content": f"{prompt} {command}"}], kind='description')
+        return completion['text']
+
+    def command_params(self, n=1):
+        """
+        Answer with one of the functions (the shell command, or a script).
+        """
+        return {'functions': get_function_declarations()} if self.structured else {}
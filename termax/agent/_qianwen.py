@@ -1,8 +1,8 @@
 import importlib.util
 
-from .types import Model
+from .types import Model, CommandResponse
 from termax.utils.const import *
-from termax.prompt import extract_shell_commands
+from termax.function import get_function_declarations
 
 
 class QianWenModel(Model):
@@ -33,30 +33,54 @@ class QianWenModel(Model):
         self.model_type = CONFIG_SEC_QIANWEN
         self.dashscope.api_key = api_key
         self.generation_config = generation_config
+        self.parameters = generation_config
 
-    def to_command(self, prompt, text):
+    def _complete(self, messages, version, **params):
         """
-        Generate a command based on the prompt and text.
+        Request a chat completion. With tools, the reply is in the message format (`output.choices`).
         Args:
-            prompt (str): The prompt.
-            text (str): The text.
+            messages (list): The chat messages.
+            version (str): The model version for the task.
+            params: The extra request parameters, e.g. the tools.
         """
-        chat_history = [
-            {'role': 'system', 'content': prompt},
-            {'role': 'user', 'content': text}
-        ]
-
         message = self.dashscope.Generation.call(
-            model=self.version,
-            messages=chat_history,
+            model=version,
+            messages=messages,
             max_tokens=self.generation_config['max_tokens'],
             temperature=self.generation_config['temperature'],
             top_k=self.generation_config['top_k'],
             top_p=self.generation_config['top_p'],
             stop=self.generation_config['stop'],
+            **params
         )
-        response = message['output'].text
-        return extract_shell_commands(response)
+        usage = message.get('usage') or {}
+        self.track(usage.get('input_tokens', 0), usage.get('output_tokens', 0))
+
+        output = message['output']
+        if not output.get('choices'):
+            return {'text': output.text, 'function_call': None}
+        reply = output['choices'][0]['message']
+        calls = reply.get('tool_calls') or []
+        function = calls[0]['function'] if calls else None
+        return {
+            'text': reply.get('content'),
+            'function_call': {'name': function['name'], 'arguments': function['arguments']} if function else None
+        }
+
+    def to_command(self, prompt, text, kind='command'):
+        """
+        Generate a command based on the prompt and text.
+        Args:
+            prompt (str): The prompt.
+            text (str): The text.
+            kind (str): The task, command or suggestion.
+        """
+        chat_history = [
+            {'role': 'system', 'content': prompt},
+            {'role': 'user', 'content': text}
+        ]
+        completion = self.complete(chat_history, kind=kind, **self.command_params())
+        return CommandResponse.from_completion(completion).command
 
     def to_description(self, prompt, command):
         """
@@ -65,14 +89,14 @@ class QianWenModel(Model):
             prompt (str): The prompt.
             command (str): The command.
         """
-        message = self.dashscope.Generation.call(
-            model=self.version,
-            messages=[{'role': 'user', 'content': f"{prompt} {command}"}],
-            max_tokens=self.generation_config['max_tokens'],
-            temperature=self.generation_config['temperature'],
-            top_k=self.generation_config['top_k'],
-            top_p=self.generation_config['top_p'],
-            stop=self.generation_config['stop'],
-        )
-        response = message['output'].text
-        return response
+        completion = self.complete([{'role': 'user', 'content': f"{prompt} {command}"}], kind='description')
+        return completion['text']
+
+    def command_params(self, n=1):
+        """
+        Answer with one of the tools (the shell command, or a script).
+        """
+        if not self.structured:
+            return {}
+        tools = [{'type': 'function', 'function': function} for function in get_function_declarations()]
+        return {'tools': tools, 'result_format': 'message'}
@@ -0,0 +1,274 @@
+import time
+import queue
+import atexit
+import threading
+
+from .types import Model
+from termax.utils.const import *
+from termax.utils.config import ROUTING_PATH
+from termax.utils.store import read_json, write_json
+from termax.utils.trace import percentile
+
+
+class ProviderStats:
+    """
+    The rolling latency and error rate of every provider/model, kept across runs in a small JSON file. The file is
+    read once per process, the outcomes observed by the process are merged into it once, when the process exits.
+    """
+
+    def __init__(self, path=ROUTING_PATH, window=ROUTER_WINDOW):
+        self.path = path
+        self.window = window
+        self.lock = threading.Lock()
+        self.stats = None
+        self.pending = {}
+
+    def load(self):
+        if self.stats is None:
+            self.stats = read_json(self.path, {})
+        return self.stats
+
+    def observe(self, key, latency, ok):
+        """
+        Append a call outcome to the provider's window.
+        Args:
+            key (str): The provider/model.
+            latency (float): The call latency, in seconds.
+            ok (bool): Whether the call succeeded.
+        """
+        sample = [round(latency, 4), ok, time.time()]
+        with self.lock:
+            stats = self.load()
+            stats[key] = (stats.get(key, []) + [sample])[-self.window:]
+            if not self.pending:
+                atexit.register(self.save)
+            self.pending.setdefault(key, []).append(sample)
+
+    def save(self):
+        """
+        Merge the outcomes observed by this process into the file, on top of what the other processes wrote since
+        it was read.
+        """
+        with self.lock:
+            if not self.pending:
+                return
+            stats = read_json(self.path, {})
+            for key, samples in self.pending.items():
+                stats[key] = (stats.get(key, []) + samples)[-self.window:]
+            write_json(self.path, stats)
+            self.pending = {}
+            atexit.unregister(self.save)
+
+    @staticmethod
+    def summary(samples):
+        """
+        The error rate, p50 and p90 (successful calls only) of a window.
+        """
+        latencies = [latency for latency, ok, _ in samples if ok]
+        errors = sum(1 for _, ok, _ in samples if not ok)
+        return {
+            'calls': len(samples),
+            'error_rate': errors / len(samples) if samples else 0.0,
+            'p50': percentile(latencies, 50) if latencies else None,
+            'p90': percentile(latencies, 90) if latencies else None,
+            'last_error': max((at for _, ok, at in samples if not ok), default=0.0)
+        }
+
+
+class RouterModel(Model):
+    def __init__(self, models, strategy=ROUTING_FASTEST, stats=None):
+        """
+        Route every request to the fastest healthy provider, failing over to the next ones on errors. With the hedge
+        strategy, the request is also sent to the second provider once the first has not answered by its p90 latency.
+        Args:
+            models (list): The provider models to route between.
+            strategy (str): fastest or hedge.
+            stats (ProviderStats): The rolling provider stats.
+        """
+        super().__init__()
+        if not models:
+            raise ValueError("The router needs at least one provider.")
+
+        self.models = models
+        self.strategy = strategy
+        self.stats = stats or ProviderStats()
+        self.model_type = 'router'
+        self.version = ','.join(self.key(model) for model in models)
+        self.ledger = None
+        self.multiple = all(model.multiple for model in models)
+        self.last = None
+
+    @staticmethod
+    def key(model):
+        return f"{model.model_type}/{model.version}"
+
+    def ranked(self):
+        """
+        The models ordered for the next request: the healthy ones by their p50 latency (untried ones first, so they
+        get measured), then the unhealthy ones by their error rate. An unhealthy provider is probed again after
+        the cool-down.
+        """
+        stats = self.stats.load()
+        healthy, unhealthy = [], []
+        for index, model in enumerate(self.models):
+            summary = self.stats.summary(stats.get(self.key(model), []))
+            failing = summary['calls'] >= ROUTER_MIN_CALLS and summary['error_rate'] > ROUTER_MAX_ERROR_RATE
+            if failing and time.time() - summary['last_error'] < ROUTER_COOLDOWN:
+                unhealthy.append((summary['error_rate'], index, model))
+            else:
+                healthy.append((summary['p50'] or 0.0, index, model))
+        return [model for *_, model in sorted(healthy)] + [model for *_, model in sorted(unhealthy)]
+
+    def call(self, model, method, *args, **kwargs):
+        """
+        Call the model and record the outcome, a missing result counts as an error (the backends print and swallow
+        their provider errors).
+        """
+        start = time.perf_counter()
+        try:
+            result = getattr(model, method)(*args, **kwargs)
+        except Exception:
+            self.stats.observe(self.key(model), time.perf_counter() - start, False)
+            raise
+        self.stats.observe(self.key(model), time.perf_counter() - start, result is not None)
+        if result is None:
+            raise RuntimeError(f"{self.key(model)} returned no result.")
+        return result
+
+    @property
+    def platform(self):
+        """
+        The platform of the provider that served the last request, or else of the one the next request goes to first.
+        """
+        return self.responder.model_type
+
+    @property
+    def backends(self):
+        """
+        The providers in the order the next request tries them.
+        """
+        return self.ranked()
+
+    @property
+    def responder(self):
+        """
+        The provider that served the last request, or else the one the next request goes to first.
+        """
+        return self.last or self.ranked()[0]
+
+    def route(self, method, *args, **kwargs):
+        """
+        Send the request down the ranked providers until one succeeds, `last` is the provider that answered.
+        """
+        candidates = self.ranked()
+        error = None
+        while candidates:
+            model = candidates.pop(0)
+            try:
+                if self.strategy == ROUTING_HEDGE and candidates:
+                    result, self.last = self.hedge(model, candidates.pop(0), method, *args, **kwargs)
+                    return result
+                result = self.call(model, method, *args, **kwargs)
+                self.last = model
+                return result
+            except Exception as e:
+                error = e
+        raise error
+
+    def answer(self, method, *args):
+        """
+        Route a request of the backends' `to_command` contract: when every provider failed, print the error and return
+        None, as the backends do.
+        """
+        try:
+            return self.route(method, *args)
+        except Exception as e:
+            print("Every provider failed.")
+            print(f"Error message: {e}")
+            return None
+
+    def hedge(self, first, second, method, *args, **kwargs):
+        """
+        Send the request to the first provider, and to the second one if the first has not answered by its p90.
+        Returns the first successful (result, model); the slower call finishes in the background.
+        """
+        results = queue.Queue()
+
+        def run(model):
+            try:
+                results.put((True, self.call(model, method, *args, **kwargs), model))
+            except Exception as e:
+                results.put((False, e, model))
+
+        summary = self.stats.summary(self.stats.load().get(self.key(first), []))
+        delay = summary['p90'] if summary['p90'] is not None else ROUTER_HEDGE_DELAY
+        threading.Thread(target=run, args=(first,), daemon=True).start()
+        try:
+            ok, value, model = results.get(timeout=delay)
+            if ok:
+                return value, model
+            pending, error = 0, value
+        except queue.Empty:
+            pending, error = 1, None
+
+        threading.Thread(target=run, args=(second,), daemon=True).start()
+        pending += 1
+        while pending:
+            ok, value, model = results.get()
+            pending -= 1
+            if ok:
+                return value, model
+            error = value
+        raise error
+
+    def complete(self, messages, kind='command', **params):
+        """
+        Send the chat messages to the fastest healthy provider.
+        """
+        return self.route('complete', messages, kind, **params)
+
+    def chat(self, messages, kind='command'):
+        """
+        Continue a conversation with the fastest healthy provider.
+        """
+        return self.route('chat', messages, kind)
+
+    def warmup(self):
+        """
+        Warm up every provider.
+        """
+        return any([model.warmup() for model in self.models])
+
+    def preconnect(self):
+        """
+        Pre-connect to every provider, any of them may answer.
+        """
+        return any([model.preconnect() for model in self.models])
+
+    def _complete(self, messages, version=None, **params):
+        return self.complete(messages, **params)
+
+    def to_command(self, prompt, text, kind='command'):
+        """
+        Generate a command with the fastest healthy provider.
+        Args:
+            prompt (str): The prompt.
+            text (str): The text.
+            kind (str): The task, command or suggestion.
+        """
+        return self.answer('to_command', prompt, text, kind)
+
+    def candidates(self, prompt, text, n=3, kind='command'):
+        """
+        Generate several candidate commands with the fastest healthy provider.
+        """
+        return self.route('candidates', prompt, text, n, kind)
+
+    def to_description(self, prompt, command):
+        """
+        Generate a description with the fastest healthy provider.
+        Args:
+            prompt (str): The prompt.
+            command (str): The command.
+        """
+        return self.route('to_description', prompt, command)
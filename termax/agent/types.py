@@ -1,15 +1,323 @@
+import json
+import time
+import threading
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+from termax.utils.config import USAGE_PATH
+from termax.utils.trace import span
+from termax.utils.usage import record_usage
+from termax.utils.const import SESSION_TOKEN_BUDGET, SHELL_FUNCTION
+from termax.prompt.utils import is_complex, extract_shell_commands
+from termax.function import get_all_functions
 
 
 class Model(ABC):
 
     def __init__(self):
         self.model_type = None
+        self.version = None
+        self.ledger = USAGE_PATH
+        self.usage = None
+        self.parameters = {}
+        self.cassette = None
+        self.tasks = {}
+        self.upgrade = False
+        self.active = None
+        self.budget = SESSION_TOKEN_BUDGET
+        self.multiple = False
+        self.structured = True
+        self.lock = threading.Lock()
+
+    def __init_subclass__(cls, **kwargs):
+        """
+        Trace every `to_command` and `to_description` implemented by the model backends, and record their token
+        usage into the local ledger.
+        """
+        super().__init_subclass__(**kwargs)
+        for name, kind in (('to_command', 'command'), ('to_description', 'description')):
+            if name in cls.__dict__:
+                setattr(cls, name, cls._traced(name, kind, cls.__dict__[name]))
+
+    @staticmethod
+    def _traced(name, kind, method):
+        def wrapper(self, *args, **kwargs):
+            self.usage, self.active = None, None
+            start = time.perf_counter()
+            with span(f"model.{name}", provider=self.model_type, model=self.version):
+                try:
+                    return method(self, *args, **kwargs)
+                finally:
+                    if self.ledger and self.usage is not None:
+                        prompt = kwargs.get('prompt', args[0] if args else None)
+                        if isinstance(prompt, list):
+                            # a conversation, its system message is the prompt
+                            prompt = prompt[0]['content'] if prompt else None
+                        record_usage(
+                            self.ledger, self.model_type, self.active or self.version, kind, prompt, self.usage,
+                            time.perf_counter() - start
+                        )
+
+        wrapper.__name__ = method.__name__
+        wrapper.__doc__ = method.__doc__
+        return wrapper
+
+    def track(self, input_tokens=0, output_tokens=0, cached_tokens=0):
+        """
+        Keep the token usage reported by the provider for the current call, the usage of the concurrent requests of
+        a call (see `candidates`) adds up.
+        Args:
+            input_tokens (int): The prompt tokens.
+            output_tokens (int): The completion tokens.
+            cached_tokens (int): The prompt tokens served from the provider cache.
+        """
+        usage = {'input': input_tokens or 0, 'output': output_tokens or 0, 'cached': cached_tokens or 0}
+        with self.lock:
+            if self.usage is not None:
+                usage = {key: value + self.usage.get(key, 0) for key, value in usage.items()}
+            self.usage = usage
+
+    @property
+    def platform(self):
+        """
+        The platform serving the requests, the prompts are formatted for it.
+        """
+        return self.model_type
+
+    @property
+    def backends(self):
+        """
+        The provider models that may serve the requests, in the order they are tried.
+        """
+        return [self]
+
+    @property
+    def responder(self):
+        """
+        The provider model that served the last request, or else the one the next request goes to.
+        """
+        return self
+
+    def task_version(self, kind, messages):
+        """
+        The model version for the task: the per-task model when one is configured, except for the requests the
+        complexity classifier finds hard, which are upgraded to the section's default model.
+        Args:
+            kind (str): The task, command, suggestion or description.
+            messages (list): The chat messages.
+        """
+        version = self.tasks.get(kind) or self.version
+        if self.upgrade and version != self.version and kind != 'description':
+            text = next((message['content'] for message in reversed(messages) if message['role'] == 'user'), '')
+            if is_complex(text):
+                return self.version
+        return version
+
+    def complete(self, messages, kind='command', **params):
+        """
+        Send the chat messages to the provider, through the cassette when one is set (record or replay).
+        Args:
+            messages (list): The chat messages, dicts with the `role` (system / user / assistant) and `content`.
+            kind (str): The task, command, suggestion or description.
+            params: The request parameters on top of the model's generation config.
+
+        Returns:
+            dict: The `text` of the completion and the `function_call` ({name, arguments}) if any.
+        """
+        version = self.active = self.task_version(kind, messages)
+        if self.cassette is None:
+            return self._complete(messages, version, **params)
+        return self.cassette.play(
+            self, kind, messages, params, lambda: self._complete(messages, version, **params), version
+        )
+
+    def chat(self, messages, kind='command'):
+        """
+        Complete a multi-turn conversation, see `Session`.
+        Args:
+            messages (list): The chat messages.
+            kind (str): The task, command, suggestion or description.
+
+        Returns:
+            str: The text of the reply.
+        """
+        return self.complete(messages, kind=kind)['text']
+
+    def candidates(self, prompt, text, n=3, kind='command'):
+        """
+        Generate several candidate commands in one round, to be ranked locally instead of retrying one by one: a single
+        request for `n` completions on the providers that support it (`multiple`), otherwise `n` concurrent requests.
+        Args:
+            prompt (str): The prompt.
+            text (str): The text.
+            n (int): The number of candidates.
+            kind (str): The task, command or suggestion.
+
+        Returns:
+            list: The candidate commands, or the result of the function other than the shell command called by the model
+                as the only candidate.
+        """
+        chat_history = [{"role": "system", "content": prompt}, {"role": "user", "content": text}]
+        if self.multiple or n <= 1:
+            completion = self.complete(chat_history, kind=kind, **self.command_params(n))
+            completions = completion.get('choices') or [completion]
+        else:
+            with ThreadPoolExecutor(max_workers=n) as pool:
+                completions = list(pool.map(
+                    lambda _: self.complete(chat_history, kind=kind, **self.command_params()), range(n)
+                ))
+
+        responses = [CommandResponse.from_completion(completion) for completion in completions]
+        for response in responses:
+            if response.function_call and response.function_call['name'] != SHELL_FUNCTION:
+                return [response.command]
+        return [response.command for response in responses]
+
+    def command_params(self, n=1):
+        """
+        The extra request parameters of a command generation, e.g. the provider's structured output (tools, function
+        declarations or JSON mode) when `structured` is set.
+        Args:
+            n (int): The number of completions, for the providers that return several in one request.
+        """
+        return {}
+
+    def session(self, prompt, kind='command', budget=None):
+        """
+        Start a conversation on the prompt, to revise the answers without re-sending the whole context as new.
+        Args:
+            prompt (str): The system prompt.
+            kind (str): The task, command or suggestion.
+            budget (int): The token budget of the history, default is the model's.
+        """
+        return Session(self, prompt, kind, budget or self.budget)
+
+    def warmup(self):
+        """
+        Prepare the model for the next requests, e.g. load it into memory. Returns whether there was anything to do.
+        """
+        return False
+
+    def preconnect(self):
+        """
+        Open the connection to the provider in the background (DNS, TCP and TLS), while the prompt is being assembled,
+        so the request does not pay the handshakes. Returns whether there was anything to do.
+        """
+        return False
 
     @abstractmethod
-    def to_command(self, prompt, text):
+    def _complete(self, messages, version, **params):
+        pass
+
+    @abstractmethod
+    def to_command(self, prompt, text, kind='command'):
         pass
 
     @abstractmethod
     def to_description(self, prompt, command):
         pass
+
+
+class CommandResponse:
+    """
+    The answer to a command request, normalized across the providers: the function called through the provider's
+    structured output, with the text parser (`extract_shell_commands`) kept as the fallback.
+    """
+
+    def __init__(self, text=None, function_call=None):
+        """
+        Args:
+            text (str): The text of the completion.
+            function_call (dict): The `name` and JSON `arguments` of the function called by the model, if any.
+        """
+        self.text = text
+        self.function_call = function_call
+
+    @classmethod
+    def from_completion(cls, completion):
+        return cls(completion.get('text'), completion.get('function_call'))
+
+    @property
+    def structured(self):
+        return self.function_call is not None
+
+    @property
+    def command(self):
+        """
+        The result of the called function (the shell command, or the script to run), or else the command parsed from
+        the text.
+        """
+        if self.function_call:
+            for function in get_all_functions():
+                if function.openai_schema['name'] == self.function_call['name']:
+                    try:
+                        return function.execute(**json.loads(self.function_call['arguments'] or '{}'))
+                    except (TypeError, ValueError):
+                        break
+        return extract_shell_commands(self.text or "")
+
+
+Model.chat = Model._traced('chat', 'command', Model.chat)
+Model.candidates = Model._traced('candidates', 'command', Model.candidates)
+
+
+class Session:
+    """
+    The message history of a conversation with a model. Every turn only appends the new request to the history, so
+    the previous answers stay in the context and the unchanged prefix can be served from the provider's prompt cache.
+    The oldest turns after the first one are dropped once the history exceeds the token budget; the system prompt is
+    not counted against the budget and the first request and answer are always kept, as the context of the revisions.
+    """
+
+    def __init__(self, model, prompt, kind='command', budget=SESSION_TOKEN_BUDGET):
+        self.model = model
+        self.kind = kind
+        self.budget = budget
+        self.messages = [{"role": "system", "content": prompt}]
+
+    @staticmethod
+    def tokens(message):
+        """
+        A rough token count of a message (4 characters per token, plus the message overhead).
+        """
+        return len(message['content']) // 4 + 4
+
+    def truncate(self):
+        """
+        Drop the oldest turns, keeping the system prompt, the first request and answer and the latest request, until
+        the history after the system prompt fits the budget.
+        """
+        while len(self.messages) > 4 and sum(self.tokens(message) for message in self.messages[1:]) > self.budget:
+            del self.messages[3:5]
+
+    def ask(self, text, prompt=None):
+        """
+        Send a request in the conversation.
+        Args:
+            text (str): The request.
+            prompt (str): A refreshed system prompt for this and the next turns, e.g. with the new context.
+
+        Returns:
+            str: The text of the reply.
+        """
+        if prompt is not None:
+            self.messages[0] = {"role": "system", "content": prompt}
+        self.messages.append({"role": "user", "content": text})
+        self.truncate()
+        try:
+            reply = self.model.chat(self.messages, kind=self.kind)
+        except BaseException:
+            # also on Ctrl+C, the unanswered request does not stay in the history
+            self.messages.pop()
+            raise
+        self.messages.append({"role": "assistant", "content": reply or ""})
+        return reply
+
+    def command(self, text, prompt=None):
+        """
+        Send a request in the conversation and extract the command from the reply.
+        Args:
+            text (str): The request.
+            prompt (str): A refreshed system prompt for this and the next turns.
+        """
+        return extract_shell_commands(self.ask(text, prompt) or "")
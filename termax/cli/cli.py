@@ -1,18 +1,39 @@
+import sys
+import json
 import click
 from rich.console import Console
+from rich.table import Table
 
 import termax
 from .utils import *
 from termax.utils.const import *
 from termax.prompt import Prompt, Memory
 from termax.plugin import install_plugin, uninstall_plugin
-from termax.utils import Config, CONFIG_PATH, qa_confirm, qa_action, qa_prompt, qa_revise
-
-memory = Memory()
+from termax.utils.trace import tracer, span, traced, summarize_traces
+from termax.utils.usage import summarize_usage
+from termax.agent import ProviderStats
+from termax.utils import Config, CONFIG_PATH, TRACE_PATH, USAGE_PATH, ROUTING_PATH, qa_confirm, qa_action, qa_prompt, \
+    qa_revise, validate_command, refresh_snapshot, read_prefetch, refresh_tools, history_usage
+
+tracer.mark('imports')
+# 命令历史（RAG 记忆）在第一次使用时才打开，不需要它的命令（如 context refresh、config、stats）不必加载 chromadb
+_memory = None
 # avoid the tokenizers parallelism issue
 os.environ['TOKENIZERS_PARALLELISM'] = 'false'
 
 
+# 打开（或复用已打开的）命令历史
+def get_memory():
+    """
+    get_memory: open the command memory on first use.
+    """
+    global _memory
+    if _memory is None:
+        with span('memory.init'):
+            _memory = Memory()
+    return _memory
+
+
 # 自定义 Click 命令组，允许为命令组设置默认命令
 class DefaultCommandGroup(click.Group):
     """允许为一个命令组设置默认命令"""
@@ -54,48 +75,81 @@ class DefaultCommandGroup(click.Group):
 
 @click.group(cls=DefaultCommandGroup)
 @click.version_option(version=termax.__version__)
+@click.option('--profile', is_flag=True, envvar='TERMAX_PROFILE', help="Print the time spent in each stage of the run.")
+@click.pass_context
 # Termax 主命令入口，初始化 CLI 工具
-def cli():
+def cli(ctx, profile: bool = False):
     """
     Termax: A CLI tool to generate and execute commands from natural language.
     """
-    pass
+
+    # 命令结束后输出阶段耗时瀑布图，并按配置写入追踪文件；配置在开始时读取一次，结束时不再读取
+    trace = Config().read().boolean(CONFIG_SEC_GENERAL, 'trace')
+
+    def report():
+        if profile:
+            click.echo(tracer.waterfall(), err=True)
+        if trace:
+            tracer.dump(TRACE_PATH, ctx.invoked_subcommand)
+
+    ctx.call_on_close(report)
 
 
 @cli.command()
 # 猜测用户意图并生成推荐命令，支持复制、解释、执行和修订
+@traced('cli.guess')
 def guess():
     """
     Guess the next command based on the information provided.
     """
     console = Console()
-    prompt = Prompt(memory)
     configuration = Config()
 
     config_dict = configuration.read()
-    if not configuration.config.has_section(CONFIG_SEC_GENERAL):
+    if CONFIG_SEC_GENERAL not in config_dict:
         click.echo(f"General section not found. Running config setup...")
         build_config(general=True)
         config_dict = configuration.read()
 
     platform = config_dict['general']['platform']
-    if not configuration.config.has_section(platform):
+    if platform not in config_dict:
         click.echo(f"Platform {platform} section not found. Running config setup...")
         build_config()
         config_dict = configuration.read()
 
-    model, platform = load_model()
-    # generate the commands from the model, and execute if auto_execute is True
-    intent = qa_prompt()
+    try:
+        model, platform = load_model(config_dict)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    # the next command prefetched by the shell plugins after the last command, offered as the first choice
+    prefetched = None
+    if config_dict.value(CONFIG_SEC_GENERAL, 'prefetch', PREFETCH_OFF) != PREFETCH_OFF:
+        prefetched = read_prefetch(os.getcwd())
+
+    intent = qa_prompt(prefetched['command'] if prefetched else None)
     if intent is None:
         return
 
-    with console.status(f"[cyan]Guessing..."):
-        primary, description = intent['primary'], intent['description']
-        guess_prompt = prompt.gen_suggestions(primary, platform)
-        command = model.to_command(prompt=guess_prompt, text=description)
+    prompt, session = None, None
+    if intent['primary'] == 'suggestion':
+        command, description = prefetched['command'], ""
+        click.echo(f"\nSuggestion (after `{prefetched['last_command']}`):\n")
+    else:
+        # generate the commands from the model, and execute if auto_execute is True
+        with console.status(f"[cyan]Guessing..."):
+            primary, description = intent['primary'], intent['description']
+            prompt = Prompt(None)
+            guess_prompt = prompt.gen_suggestions(primary, platform)
+            # the revisions continue the conversation instead of re-sending the whole prompt
+            session = model.session(guess_prompt, kind='suggestion')
+            try:
+                command = session.command(description)
+            except Exception as e:
+                # print the provider error as to_command does, the user can still revise
+                click.echo(f"Failed to guess the command: {e}", err=True)
+                command = None
+        click.echo(f"\nSuggestion:\n")
 
-    click.echo(f"\nSuggestion:\n")
     console.log(f"{command}\n", style="purple") if command else console.log(
         "Suggestion not readily available. Please revise for better results.\n", style="purple")
     try:
@@ -107,15 +161,26 @@ def guess():
                 break
             elif choice == 1:
                 with console.status(f"[cyan]Generating..."):
-                    description = model.to_description(prompt.explain_commands(), command)
+                    description = explain_command(model, prompt or Prompt(None), command, config_dict)
                 console.log(f"{description}")
                 break
             elif choice == 2:
                 command_success = execute_command(command)
                 break
             elif choice == 3:
-                description += f" Revised Command: {qa_revise()}"
-                command = model.to_command(prompt=guess_prompt, text=description)
+                revision = qa_revise()
+                description += f" Revised Command: {revision}"
+                with console.status(f"[cyan]Revising..."):
+                    if session is None:
+                        # a prefetched command has no conversation yet, start one from a generic shell suggestion
+                        prompt = prompt or Prompt(None)
+                        session = model.session(prompt.gen_suggestions('shell', model.platform), kind='suggestion')
+                        revision = f"{revision} (the suggested command was `{command}`)"
+                    try:
+                        command = session.command(f"Please revise the command: {revision}")
+                    except Exception as e:
+                        # keep the previous command, the revision can be tried again
+                        click.echo(f"Failed to revise the command: {e}", err=True)
                 click.echo()
                 console.log(f"{command}\n", style="purple")
             else:
@@ -124,14 +189,16 @@ def guess():
     except KeyboardInterrupt:
         command_success = True
     finally:
-        if choice == 2 and command_success:
-            save_command(command, description, config_dict, memory)
+        # a prefetched command has no intent description to remember it by
+        if choice == 2 and command_success and description.strip():
+            save_command(command, description.strip(), config_dict, get_memory())
 
 
 @cli.command(default_command=True)
 @click.argument('text', nargs=-1)
 @click.option('--print_cmd', '-p', is_flag=True, help="Print the generated command only.")
 # 根据用户输入调用大模型生成命令，并可选择直接执行或仅打印
+@traced('cli.generate')
 def generate(text, print_cmd=False):
     """
     This function will call and generate the commands from LLM
@@ -148,36 +215,38 @@ def generate(text, print_cmd=False):
         click.echo("Config file not found. Running config setup...")
         build_config()
 
+    memory = get_memory()
     prompt = Prompt(memory)
     config_dict = configuration.read()
-    if not configuration.config.has_section(CONFIG_SEC_GENERAL):
+    if CONFIG_SEC_GENERAL not in config_dict:
         click.echo(f"General section not found. Running config setup...")
         build_config(general=True)
         config_dict = configuration.read()
 
     platform = config_dict['general']['platform']
-    if not configuration.config.has_section(platform):
+    if platform not in config_dict:
         click.echo(f"Platform {platform} section not found. Running config setup...")
         build_config()
         config_dict = configuration.read()
 
     # load the LLM model
-    model, platform = load_model()
+    try:
+        model, platform = load_model(config_dict)
+    except ValueError as e:
+        raise click.ClickException(str(e))
     # generate the commands from the model, and execute if auto_execute is True
     with console.status(f"[cyan]Generating..."):
-        # loop until the generated command is not ''.
-        for i in range(3):
-            command = model.to_command(prompt.gen_commands(text, platform), text)
-            if command == None:
-                return
-            elif command != '':
-                if not command.startswith('t ') and not command.startswith('termax '):
-                    break
-                else:
-                    text = text + ", do not use command t or termax."
-            if i == 2:
-                console.log("Unable to generate the command, please try again.")
-                return
+        try:
+            command, errors = generate_command(model, prompt, text, platform, config_dict)
+        except Exception as e:
+            console.log(f"Failed to generate the command: {e}")
+            return
+    if command is None:
+        console.log("Unable to generate the command, please try again.")
+        return
+
+    if errors and not print_cmd:
+        console.log(f"Pre-flight check: {'; '.join(errors)}", style="yellow")
 
     if print_cmd:
         print(command)
@@ -185,13 +254,13 @@ def generate(text, print_cmd=False):
         # the command generate using the shell plugin will not be saved in the memory.
         # save_command(command, text, config_dict, memory)
     else:
-        if config_dict['general']['show_command'] == "True":
+        if config_dict.boolean(CONFIG_SEC_GENERAL, 'show_command'):
             console.log(command, style="purple")
 
         choice = None
         command_success = False
         try:
-            if config_dict['general']['auto_execute'] == "True":
+            if config_dict.boolean(CONFIG_SEC_GENERAL, 'auto_execute'):
                 command_success = execute_command(command)
             else:
                 choice = qa_confirm()
@@ -199,16 +268,108 @@ def generate(text, print_cmd=False):
                     command_success = execute_command(command)
                 elif choice == 2:
                     with console.status(f"[cyan]Generating..."):
-                        description = model.to_description(prompt.explain_commands(), command)
+                        description = explain_command(model, prompt, command, config_dict)
                     console.log(f"{description}")
         except KeyboardInterrupt:
             command_success = True
         finally:
-            if config_dict['general']['auto_execute'] == "True" or choice == 0:
+            if config_dict.boolean(CONFIG_SEC_GENERAL, 'auto_execute') or choice == 0:
                 if command_success:
                     save_command(command, text, config_dict, memory)
 
 
+@cli.command()
+# 交互式会话：只加载一次配置、模型与上下文，连续处理多个自然语言请求
+def chat():
+    """
+    Start an interactive session: type the requests one after another, `cd <dir>` to move, `exit` to quit.
+    """
+    console = Console()
+    configuration = Config()
+    if not os.path.exists(CONFIG_PATH) or CONFIG_SEC_GENERAL not in configuration.read():
+        click.echo("Config file not found. Running config setup...")
+        build_config(general=True)
+        build_config()
+    config_dict = configuration.read()
+
+    memory = get_memory()
+    prompt = Prompt(memory)
+    try:
+        model, _ = load_model(config_dict)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    session = None
+    read_line = chat_reader()
+    console.log(f"Termax chat with {model.version}, `exit` or Ctrl+D to quit.", style="cyan")
+
+    while True:
+        try:
+            text = read_line(f"{os.path.basename(os.getcwd()) or os.sep} > ").strip()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if not text:
+            continue
+        if text in ('exit', 'quit'):
+            break
+        if change_directory(text):
+            prompt.refresh()
+            continue
+
+        # 一轮请求出错（平台错误或 Ctrl+C）只结束这一轮，会话继续
+        try:
+            with console.status("[cyan]Generating..."):
+                # 后续请求沿用同一会话，上一轮的请求与命令留在上下文中，系统提示词随当前上下文刷新
+                system_prompt = prompt.gen_commands(
+                    text, model.platform, config_dict.integer(CONFIG_SEC_GENERAL, 'tool_docs', TOOL_DOCS_LIMIT)
+                )
+                if session is None:
+                    session = model.session(system_prompt)
+                command = session.command(text, prompt=system_prompt)
+
+                errors = []
+                if command and config_dict.boolean(CONFIG_SEC_GENERAL, 'preflight', True):
+                    errors = validate_command(command, prompt.files())
+                    if errors:
+                        # 未通过本地预检：在同一会话中带上具体错误请求修复
+                        command = session.command(prompt.repair_commands(command, errors)) or command
+                        errors = validate_command(command, prompt.files())
+        except KeyboardInterrupt:
+            console.log("Cancelled.", style="yellow")
+            continue
+        except Exception as e:
+            console.log(f"Failed to generate the command: {e}", style="red")
+            continue
+
+        if not command:
+            console.log("Unable to generate the command, please try again.")
+            continue
+        if errors:
+            console.log(f"Pre-flight check: {'; '.join(errors)}", style="yellow")
+        console.log(command, style="purple")
+
+        choice = None
+        command_success = False
+        try:
+            if config_dict.boolean(CONFIG_SEC_GENERAL, 'auto_execute'):
+                choice = 0
+            else:
+                choice = qa_confirm()
+            if choice == 0:
+                command_success = change_directory(command) or execute_command(command)
+                prompt.refresh()
+            elif choice == 2:
+                with console.status(f"[cyan]Generating..."):
+                    description = explain_command(model, prompt, command, config_dict)
+                console.log(f"{description}")
+        except KeyboardInterrupt:
+            continue
+        except Exception as e:
+            console.log(f"Error: {e}", style="red")
+            continue
+        if choice == 0 and command_success:
+            save_command(command, text, config_dict, memory)
+
+
 @cli.command()
 @click.option('--general', '-g', is_flag=True, help="Set up the general configuration for Termax.")
 # 配置 Termax 全局参数，支持通用配置
@@ -219,6 +380,84 @@ def config(general):
     build_config(general)
 
 
+@cli.command()
+# 预加载模型（如 Ollama 模型），使下一次请求无需等待模型加载
+def warmup():
+    """
+    Preload the model (Ollama), so the next request does not pay the model load. The shell plugins do the same in
+    the background when the shell starts, through `termax-startup`.
+    """
+    try:
+        model, platform = load_model()
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    try:
+        if model.warmup():
+            click.echo(f"Model {model.version} is ready.")
+        else:
+            click.echo(f"Nothing to warm up for {platform}.")
+    except Exception as e:
+        click.echo(f"Failed to warm up {platform}: {e}", err=True)
+
+
+@cli.group()
+# 管理 shell 插件在切换目录时预先计算的目录上下文快照
+def context():
+    """
+    Manage the directory context snapshots (file listing, git state, project type) read by the prompts.
+    """
+    pass
+
+
+@context.command()
+# 刷新当前目录的上下文快照，shell 插件在切换目录后于后台运行
+def refresh():
+    """
+    Refresh the context snapshot of the current directory, the shell plugins run it in the background after a cd.
+    """
+    snapshot = refresh_snapshot()
+    summary = ', '.join(f"{name.replace('_', ' ')}: {count}" for name, count in snapshot['summary'].items())
+    click.echo(f"{snapshot['path']}: {summary}; project: {', '.join(snapshot['project']) or 'unknown'}")
+
+
+@cli.group()
+# 管理已安装工具的本地说明索引（man 页面与 --help 摘要），生成命令时检索相关工具的用法与选项
+def tools():
+    """
+    Manage the local index of the installed tools' man page and --help summaries, retrieved for the command prompts.
+    """
+    pass
+
+
+@tools.command(name='refresh')
+@click.option('--budget', type=float, default=TOOL_REFRESH_BUDGET, help="The seconds to spend on summarizing tools.")
+# 为新增或变化的程序生成说明，termax-startup 在 shell 启动时于后台运行
+def refresh_tool_index(budget: float):
+    """
+    Summarize the new or changed tools on PATH, termax-startup runs it in the background when a shell starts.
+    """
+    run_help_for = Config().read().value(CONFIG_SEC_GENERAL, 'tool_help', TOOL_HELP_OFF)
+    if run_help_for not in TOOL_HELP_LIST:
+        raise click.ClickException(f"Invalid tool_help: {run_help_for}, should be one of {', '.join(TOOL_HELP_LIST)}.")
+    updated, pending = refresh_tools(history_usage(), budget, run_help_for=run_help_for)
+    click.echo(f"Updated {updated} tools, {pending} left for the next refresh.")
+
+
+@tools.command(name='search')
+@click.argument('text', nargs=-1, required=True)
+@click.option('--number', '-n', type=int, default=TOOL_DOCS_LIMIT, help="The number of tools to show.")
+# 查看一个请求会检索到哪些工具的说明
+def search_tool_index(text, number: int):
+    """
+    Show the tool summaries a request retrieves.
+    """
+    docs = Prompt(None).tools(" ".join(text), number)
+    if not docs:
+        click.echo("No tools found, run `t tools refresh` to build the index.")
+    for doc in docs:
+        click.echo(f"{doc}\n")
+
+
 @cli.command()
 @click.option('--name', '-n', type=str, required=True, help='Name of the plugin to install')
 # 安装指定名称的插件
@@ -245,29 +484,169 @@ def uninstall(name: str):
 
 @cli.command()
 @click.option('--clear', '-c', is_flag=True, help="Clear the memory.")
-# 查看或清除历史命令（RAG 记忆），可用于回顾或重置命令历史
-def rag(clear: bool = False):
+@click.option('--limit', '-l', type=click.IntRange(min=1), default=DB_PAGE_SIZE, help="Number of records per page.")
+@click.option('--offset', '-o', type=click.IntRange(min=0), default=0, help="Number of records to skip.")
+@click.option('--search', '-s', type=str, default=None, help="Substring/fuzzy search on the inputs and commands.")
+@click.option('--semantic', type=str, default=None, help="Semantic search on the inputs.")
+@click.option('--since', type=str, default=None, help="Only the records used since a date (2024-05-01) or 7d/12h/30m.")
+@click.option('--cwd', type=click.Path(), default=None, help="Only the records used in the directory or project.")
+@click.option('--json', 'as_json', is_flag=True, help="Stream the records as JSON lines.")
+# 分页查看、搜索或清除历史命令（RAG 记忆），可用于回顾或重置命令历史
+def rag(
+        clear: bool = False,
+        limit: int = DB_PAGE_SIZE,
+        offset: int = 0,
+        search: str = None,
+        semantic: str = None,
+        since: str = None,
+        cwd: str = None,
+        as_json: bool = False
+):
     """
-    Show all the historical commands in the RAG.
+    Browse the historical commands in the RAG page by page.
     """
     console = Console()
-    commands = memory.get()
+    if search and semantic:
+        raise click.UsageError("--search and --semantic cannot be used together.")
+    # 早期的记录没有 last_used，--since 无法在数据库中过滤，在读取时按 record_time 过滤并自行跳过 offset 条
+    cutoff = parse_since(since) if since else None
 
+    memory = get_memory()
     if clear:
         memory.delete()
         console.log("Memory cleared successfully.")
         return
 
-    if commands:
-        metadatas = commands['metadatas']
-        documents = commands['documents']
-        idx = commands['ids']
-
-        for i in range(len(idx)):
+    where = None
+    if cwd:
+        cwd = os.path.abspath(os.path.expanduser(cwd))
+        where = {'$or': [{'cwd': cwd}, {'project': cwd}]}
+
+    # 搜索时先得到有序的记录 ID，再按页读取记录内容
+    ids = None
+    if search:
+        ids = [record_id for record_id, _ in memory.fuzzy(search)]
+    elif semantic:
+        ids = memory.search([semantic], n_results=offset + limit, mode=RETRIEVAL_VECTOR, where=where)['ids'][0]
+
+    records = memory.iter_records(where=where, ids=ids, offset=0 if cutoff else offset, batch_size=limit)
+    interactive = not as_json and sys.stdout.isatty()
+    shown, skipped = 0, 0
+    for record_id, document, metadata in records:
+        if cutoff is not None:
+            if record_time(metadata) < cutoff:
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+        if as_json:
+            click.echo(json.dumps({'id': record_id, 'query': document, **metadata}, ensure_ascii=False))
+        else:
             console.log(f"""
-                User Input: {documents[i]}
-                Generated Commands: {metadatas[i]['response']}
-                Date: {metadatas[i]['created_at']}\n
+                User Input: {document}
+                Generated Commands: {metadata['response']}
+                Times Used: {metadata.get('count', 1)}
+                Directory: {metadata.get('cwd', '')}
+                Date: {metadata['created_at']}\n
                 """)
-    else:
+
+        shown += 1
+        if shown % limit == 0:
+            if semantic or not interactive or not click.confirm("Show the next page?", default=True):
+                break
+
+    if shown == 0 and not as_json:
         console.log("No commands found in the memory.")
+
+
+@cli.group()
+# 查看 Termax 的统计信息
+def stats():
+    """
+    Show the statistics of Termax.
+    """
+    pass
+
+
+@stats.command()
+@click.option('--command', '-c', type=str, default=None, help="Only the runs of this command, e.g. guess.")
+@click.option('--last', '-n', type=int, default=None, help="Only the latest N runs.")
+# 汇总追踪文件，按阶段输出 p50/p95 耗时
+def latency(command: str = None, last: int = None):
+    """
+    Summarize the stage latency (p50/p95) of the traced runs, enable it with `trace = True` in [general].
+    """
+    console = Console()
+    summary = summarize_traces(TRACE_PATH, command, last)
+    if not summary['total']['count']:
+        console.log(f"No traces found in {TRACE_PATH}, set `trace = True` in the \\[general] configuration.")
+        return
+
+    table = Table(title=f"Latency over {summary['total']['count']} runs")
+    table.add_column("Stage")
+    table.add_column("Count", justify="right")
+    table.add_column("p50 (ms)", justify="right")
+    table.add_column("p95 (ms)", justify="right")
+    for name, values in sorted(summary.items(), key=lambda item: item[1]['p50'], reverse=True):
+        table.add_row(name, str(values['count']), f"{values['p50'] * 1000:.1f}", f"{values['p95'] * 1000:.1f}")
+    console.print(table)
+
+
+@stats.command()
+@click.option('--by', '-b', type=click.Choice(['day', 'provider', 'model', 'kind', 'section']), default='day',
+              help="Group the usage by day, provider, model, command type or prompt section.")
+@click.option('--since', type=str, default=None, help="Only the calls since a date (2024-05-01) or 7d/12h/30m.")
+# 汇总本地用量账本，按日期、平台、模型、调用类型或提示词段落输出 token 用量
+def usage(by: str = 'day', since: str = None):
+    """
+    Summarize the token usage of the LLM calls recorded in the local ledger.
+    """
+    console = Console()
+    summary = summarize_usage(USAGE_PATH, by, parse_since(since) if since else None)
+    if not summary:
+        console.log(f"No usage found in {USAGE_PATH}.")
+        return
+
+    table = Table(title=f"Token usage by {by}")
+    table.add_column(by.capitalize())
+    table.add_column("Calls", justify="right")
+    table.add_column("Input", justify="right")
+    table.add_column("Cached", justify="right")
+    table.add_column("Output", justify="right")
+    if by != 'section':
+        table.add_column("Avg latency (ms)", justify="right")
+    for group, row in sorted(summary.items(), key=lambda item: item[1]['input'], reverse=True):
+        cells = [group, str(row['calls']), str(row['input']), str(row['cached']), str(row['output'])]
+        if by != 'section':
+            cells.append(f"{row['latency'] * 1000:.1f}")
+        table.add_row(*cells)
+    console.print(table)
+
+
+@stats.command()
+# 输出路由器记录的各平台/模型滚动延迟与错误率
+def providers():
+    """
+    Show the rolling latency and error rate of the providers used by the router (`platforms` in [general]).
+    """
+    console = Console()
+    provider_stats = ProviderStats()
+    windows = provider_stats.load()
+    if not windows:
+        console.log(f"No provider calls found in {ROUTING_PATH}.")
+        return
+
+    table = Table(title="Providers")
+    table.add_column("Provider/model")
+    table.add_column("Calls", justify="right")
+    table.add_column("Error rate", justify="right")
+    table.add_column("p50 (ms)", justify="right")
+    table.add_column("p90 (ms)", justify="right")
+    for key, samples in sorted(windows.items()):
+        row = provider_stats.summary(samples)
+        table.add_row(
+            key, str(row['calls']), f"{row['error_rate']:.0%}",
+            f"{row['p50'] * 1000:.1f}" if row['p50'] is not None else '-',
+            f"{row['p90'] * 1000:.1f}" if row['p90'] is not None else '-'
+        )
+    console.print(table)
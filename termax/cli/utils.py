@@ -1,11 +1,18 @@
 import os
+import re
+import sys
+import time
+import importlib.util
 import platform
 import subprocess
-import pyperclip
+from datetime import datetime
 
 from termax.prompt import Memory
-from termax.agent import OpenAIModel, OllamaModel, GeminiModel, ClaudeModel, QianFanModel, MistralModel, QianWenModel
-from termax.utils import Config, qa_general, qa_platform
+from termax.agent import OpenAIModel, OllamaModel, GeminiModel, ClaudeModel, QianFanModel, MistralModel, QianWenModel, \
+    RouterModel
+from termax.utils import Config, ConfigSnapshot, Cassette, CHAT_HISTORY_PATH, qa_general, qa_platform, rank_commands, \
+    validate_command, is_self_call, ExplanationCache, split_segments, parse_numbered, assemble_explanation
+from termax.utils.trace import traced
 from termax.utils.const import *
 
 
@@ -29,86 +36,289 @@ def build_config(general: bool = False):
             configuration.write_platform(platform_config, platform=platform_config['platform'])
 
 
-# 根据配置文件加载并返回对应的大模型实例和平台名。
-def load_model():
-    """
-    load_model：根据配置文件加载并返回对应的大模型实例和平台名。
+# 根据平台名与配置快照构建对应的大模型实例。
+def build_model(plat: str, config_dict: ConfigSnapshot):
     """
-    configuration = Config()
-    config_dict = configuration.read()
-    plat = config_dict['general']['platform']
+    build_model：根据平台名与配置快照构建大模型实例，选项的类型转换与校验由快照完成。
+    参数:
+        plat: 平台名。
+        config_dict: 配置快照（Config.read 的结果）。
 
-    if plat == CONFIG_SEC_OPENAI:
+    返回值：大模型实例。
+    """
+    if plat in (CONFIG_SEC_OPENAI, CONFIG_SEC_OPENAI_COMPATIBLE):
+        # OpenAI 与任意 OpenAI 兼容接口（vLLM、Ollama 等），默认使用内置的 HTTP 客户端
         model = OpenAIModel(
-            api_key=config_dict['openai'][CONFIG_SEC_API_KEY], version=config_dict['openai']['model'],
-            temperature=float(config_dict['openai']['temperature']), base_url=config_dict['openai']['base_url']
+            api_key=config_dict.value(plat, CONFIG_SEC_API_KEY), version=config_dict[plat]['model'],
+            temperature=config_dict.number(plat, 'temperature'), base_url=config_dict.value(plat, 'base_url'),
+            client=config_dict.value(plat, 'client', OPENAI_CLIENT_BUILTIN),
+            timeout=config_dict.number(plat, 'timeout', OPENAI_TIMEOUT),
+            stream=config_dict.boolean(plat, 'stream'), platform=plat
         )
     elif plat == CONFIG_SEC_OLLAMA:
         model = OllamaModel(
-            host_url=config_dict['ollama']['host_url'], version=config_dict['ollama']['model'],
+            host_url=config_dict.value(plat, 'host_url'), version=config_dict[plat]['model'],
+            keep_alive=config_dict.value(plat, 'keep_alive'),
+            options={
+                option: config_dict.convert(plat, option, cast) for option, cast in OLLAMA_OPTIONS.items()
+                if config_dict.value(plat, option) is not None
+            },
+            stream=config_dict.boolean(plat, 'stream')
         )
     elif plat == CONFIG_SEC_GEMINI:
         model = GeminiModel(
-            api_key=config_dict['gemini'][CONFIG_SEC_API_KEY], version=config_dict['gemini']['model'],
+            api_key=config_dict[plat][CONFIG_SEC_API_KEY], version=config_dict[plat]['model'],
             generation_config={
-                'stop_sequences': config_dict['gemini']['stop_sequences']
-                if config_dict['gemini']['stop_sequences'] != 'None' else None,
-                'temperature': config_dict['gemini']['temperature'],
-                'top_p': config_dict['gemini']['top_p'],
-                'top_k': config_dict['gemini']['top_k'],
-                'candidate_count': config_dict['gemini']['candidate_count'],
-                'max_output_tokens': config_dict['gemini']['max_tokens']
+                'stop_sequences': config_dict.value(plat, 'stop_sequences'),
+                'temperature': config_dict.number(plat, 'temperature'),
+                'top_p': config_dict.number(plat, 'top_p'),
+                'top_k': config_dict.integer(plat, 'top_k'),
+                'candidate_count': config_dict.integer(plat, 'candidate_count'),
+                'max_output_tokens': config_dict.integer(plat, 'max_tokens')
             }
         )
     elif plat == CONFIG_SEC_CLAUDE:
         model = ClaudeModel(
-            api_key=config_dict['claude'][CONFIG_SEC_API_KEY], version=config_dict['claude']['model'],
+            api_key=config_dict[plat][CONFIG_SEC_API_KEY], version=config_dict[plat]['model'],
             generation_config={
-                'stop_sequences': config_dict['claude']['stop_sequences']
-                if config_dict['claude']['stop_sequences'] != 'None' else None,
-                'temperature': config_dict['claude']['temperature'],
-                'top_p': config_dict['claude']['top_p'],
-                'top_k': config_dict['claude']['top_k'],
-                'max_tokens': config_dict['claude']['max_tokens']
+                'stop_sequences': config_dict.value(plat, 'stop_sequences'),
+                'temperature': config_dict.number(plat, 'temperature'),
+                'top_p': config_dict.number(plat, 'top_p'),
+                'top_k': config_dict.integer(plat, 'top_k'),
+                'max_tokens': config_dict.integer(plat, 'max_tokens')
             }
         )
     elif plat == CONFIG_SEC_QIANFAN:
         model = QianFanModel(
-            api_key=config_dict['qianfan'][CONFIG_SEC_API_KEY], secret_key=config_dict['qianfan']['secret_key'],
-            version=config_dict['qianfan']['model'],
+            api_key=config_dict[plat][CONFIG_SEC_API_KEY], secret_key=config_dict[plat]['secret_key'],
+            version=config_dict[plat]['model'],
             generation_config={
-                'temperature': config_dict['qianfan']['temperature'],
-                'top_p': config_dict['qianfan']['top_p'],
-                'max_output_tokens': config_dict['qianfan']['max_tokens']
+                'temperature': config_dict.number(plat, 'temperature'),
+                'top_p': config_dict.number(plat, 'top_p'),
+                'max_output_tokens': config_dict.integer(plat, 'max_tokens')
             }
         )
     elif plat == CONFIG_SEC_MISTRAL:
         model = MistralModel(
-            api_key=config_dict['mistral'][CONFIG_SEC_API_KEY], version=config_dict['mistral']['model'],
+            api_key=config_dict[plat][CONFIG_SEC_API_KEY], version=config_dict[plat]['model'],
             generation_config={
-                'temperature': config_dict['mistral']['temperature'],
-                'top_p': config_dict['mistral']['top_p'],
-                'max_tokens': config_dict['mistral']['max_tokens']
+                'temperature': config_dict.number(plat, 'temperature'),
+                'top_p': config_dict.number(plat, 'top_p'),
+                'max_tokens': config_dict.integer(plat, 'max_tokens')
             }
         )
     elif plat == CONFIG_SEC_QIANWEN:
         model = QianWenModel(
-            api_key=config_dict['qianwen'][CONFIG_SEC_API_KEY], version=config_dict['qianwen']['model'],
+            api_key=config_dict[plat][CONFIG_SEC_API_KEY], version=config_dict[plat]['model'],
             generation_config={
-                'temperature': config_dict['qianwen']['temperature'],
-                'top_p': config_dict['qianwen']['top_p'],
-                'top_k': config_dict['qianwen']['top_k'],
-                'stop': config_dict['qianwen']['stop_sequences']
-                if config_dict['qianwen']['stop_sequences'] != 'None' else None,
-                'max_tokens': config_dict['qianwen']['max_tokens']
+                'temperature': config_dict.number(plat, 'temperature'),
+                'top_p': config_dict.number(plat, 'top_p'),
+                'top_k': config_dict.integer(plat, 'top_k'),
+                'stop': config_dict.value(plat, 'stop_sequences'),
+                'max_tokens': config_dict.integer(plat, 'max_tokens')
             }
         )
     else:
         raise ValueError(f"Platform {plat} not supported.")
 
+    # 按任务选择模型（命令、猜测、解释），可选地将复杂请求升级到默认模型
+    model.tasks = {
+        kind: config_dict.value(plat, option) for kind, option in TASK_MODEL_OPTIONS.items()
+        if config_dict.value(plat, option)
+    }
+    model.upgrade = config_dict.boolean(CONFIG_SEC_GENERAL, 'classify_complexity')
+    model.budget = config_dict.integer(CONFIG_SEC_GENERAL, 'session_budget', SESSION_TOKEN_BUDGET)
+    # 通过平台的结构化输出（工具调用、函数声明或 JSON 模式）返回命令，可按平台关闭，回退到解析文本
+    model.structured = config_dict.boolean(
+        plat, 'structured_output', config_dict.boolean(CONFIG_SEC_GENERAL, 'structured_output', True)
+    )
+
+    # 关闭本地用量账本
+    if not config_dict.boolean(CONFIG_SEC_GENERAL, 'usage_ledger', True):
+        model.ledger = None
+
+    # 录制或回放大模型请求，环境变量优先于配置文件
+    cassette = os.environ.get('TERMAX_CASSETTE', config_dict.value(CONFIG_SEC_GENERAL, 'cassette'))
+    if cassette:
+        model.cassette = Cassette(
+            os.path.expanduser(cassette),
+            mode=os.environ.get('TERMAX_CASSETTE_MODE', config_dict.value(CONFIG_SEC_GENERAL, 'cassette_mode',
+                                                                          CASSETTE_REPLAY)),
+            latency=os.environ.get('TERMAX_CASSETTE_LATENCY', config_dict.value(CONFIG_SEC_GENERAL, 'cassette_latency',
+                                                                                'recorded'))
+        )
+
+    return model
+
+
+# 根据配置文件加载并返回对应的大模型实例和平台名。
+@traced('model.load')
+def load_model(config_dict: ConfigSnapshot = None):
+    """
+    load_model：根据配置文件加载并返回对应的大模型实例和平台名。
+    配置了多个平台（platforms）时，返回在这些平台间按观测延迟路由、出错自动切换的路由模型，平台名为下一次请求首先发往的平台
+    （请求之后 model.platform 为实际应答的平台）；所有平台都无法构建时抛出 ValueError。
+    返回前在后台预连接平台的服务端。
+    参数:
+        config_dict: 配置快照，默认读取配置文件。
+    """
+    config_dict = config_dict or Config().read()
+    plat = config_dict[CONFIG_SEC_GENERAL]['platform']
+
+    platforms = [
+        name.strip() for name in config_dict.value(CONFIG_SEC_GENERAL, 'platforms', '').split(',') if name.strip()
+    ]
+    if len(platforms) < 2:
+        model = build_model(plat, config_dict)
+    else:
+        models, skipped = [], []
+        for name in platforms:
+            try:
+                models.append(build_model(name, config_dict))
+            except (ImportError, KeyError, ValueError) as e:
+                # 缺少客户端或配置的平台不参与路由
+                skipped.append(f"{name} ({e})")
+                print(f"Skipping platform {name} for routing: {e}", file=sys.stderr)
+        if not models:
+            raise ValueError(f"None of the platforms could be loaded for routing: {', '.join(skipped)}.")
+        model = RouterModel(models, strategy=config_dict.value(CONFIG_SEC_GENERAL, 'routing', ROUTING_FASTEST))
+        # 提示词按实际处理请求的平台组织：路由时为下一次请求首先发往的平台
+        plat = model.platform
+
+    # 平台确定后立即在后台连接服务端，与提示词的组装（元数据、检索）并行
+    if config_dict.boolean(CONFIG_SEC_GENERAL, 'preconnect', True):
+        model.preconnect()
     return model, plat
 
 
+# 根据自然语言生成命令：一次请求多个候选并在本地排序，取第一个通过本地预检的候选，否则请求一次有针对性的修复。
+# t 命令与快速路径（termax-complete）共用此流程。
+def generate_command(model, prompt, text: str, platform: str, config_dict: ConfigSnapshot):
+    """
+    generate_command：根据自然语言生成命令。
+    参数:
+        model: 大模型实例。
+        prompt: Prompt 实例。
+        text: 自然语言描述。
+        platform: 平台名。
+        config_dict: 配置快照。
+
+    返回值：(命令, 预检错误列表)；没有可用的候选时命令为 None。模型请求失败时抛出异常。
+    """
+    # 默认只请求一个候选：多个候选会成倍增加输出 token，由用户在配置中选择
+    count = config_dict.integer(CONFIG_SEC_GENERAL, 'candidates', 1)
+    command_prompt = prompt.gen_commands(
+        text, platform, config_dict.integer(CONFIG_SEC_GENERAL, 'tool_docs', TOOL_DOCS_LIMIT)
+    )
+    examples = [metadata['response'] for metadata in prompt.samples['metadatas'][0]]
+    # 没有可用的候选时再请求一轮，并提示不要调用 termax 自身
+    for hint in ("", ", do not use command t or termax."):
+        candidates = model.candidates(command_prompt, text + hint, n=count)
+        if None in candidates:
+            return None, []
+        ranked = rank_commands(candidates, examples)
+        if ranked:
+            break
+    else:
+        return None, []
+
+    command, errors = ranked[0], []
+    if config_dict.boolean(CONFIG_SEC_GENERAL, 'preflight', True):
+        files = prompt.files()
+        checks = ((candidate, validate_command(candidate, files)) for candidate in ranked)
+        command, errors = next((check for check in checks if not check[1]), (command, None))
+        if errors is None:
+            errors = validate_command(command, files)
+            repaired = model.to_command(command_prompt, prompt.repair_commands(command, errors, text))
+            if repaired and not is_self_call(repaired):
+                command, errors = repaired, validate_command(repaired, files)
+    return command, errors
+
+
+# 解释命令：按平台/模型缓存解释；组合命令按管道与 && 等分隔符拆分，只向模型请求缓存中没有的段（一次请求），其余在本地拼接。
+def explain_command(model, prompt, command: str, config_dict: ConfigSnapshot):
+    """
+    explain_command：解释命令，优先使用缓存的解释。
+    参数:
+        model: 大模型实例。
+        prompt: Prompt 实例。
+        command: 要解释的命令。
+        config_dict: 配置快照。
+
+    返回值：命令的解释；请求失败时为 None。
+    """
+    if not config_dict.boolean(CONFIG_SEC_GENERAL, 'explain_cache', True):
+        return model.to_description(prompt.explain_commands(model.platform), command)
+
+    # 路由时解释可能来自任一平台：读取时依次查找各平台的缓存，写入时记在实际回答的平台与模型下
+    def explainer(backend):
+        return f"{backend.model_type}/{backend.tasks.get('description') or backend.version}"
+
+    cache = ExplanationCache([explainer(backend) for backend in model.backends])
+    description = cache.get('command', command)
+    if description:
+        cache.save()
+        return description
+
+    segments = split_segments(command)
+    if len(segments) > 1:
+        unknown = list(dict.fromkeys(segment for segment, _ in segments if not cache.get('segment', segment)))
+        items = []
+        if unknown:
+            listing = "\n".join(f"{index + 1}. `{segment}`" for index, segment in enumerate(unknown))
+            items = parse_numbered(model.to_description(prompt.explain_segments(), listing), len(unknown))
+            cache.model = explainer(model.responder)
+        if items is not None:
+            for segment, item in zip(unknown, items):
+                cache.put('segment', segment, item)
+            explanations = {segment: cache.get('segment', segment) for segment, _ in segments}
+            # 只有各段都有解释时才在本地拼接，不缓存不完整的解释
+            if all(explanations.values()):
+                description = assemble_explanation(segments, explanations)
+    # 单条命令，或模型没有按编号逐段回答时，解释整条命令
+    if not description:
+        description = model.to_description(prompt.explain_commands(model.platform), command)
+        cache.model = explainer(model.responder)
+    cache.put('command', command, description)
+    cache.save()
+    return description
+
+
+# 交互式会话的输入函数：安装了 prompt_toolkit 时支持历史记录与行编辑，否则使用 input。
+def chat_reader():
+    """
+    chat_reader：返回交互式会话读取一行输入的函数。
+    """
+    if importlib.util.find_spec("prompt_toolkit") is None or not sys.stdin.isatty():
+        return input
+
+    prompt_toolkit = importlib.import_module("prompt_toolkit")
+    history = importlib.import_module("prompt_toolkit.history").FileHistory(CHAT_HISTORY_PATH)
+    return prompt_toolkit.PromptSession(history=history).prompt
+
+
+# 处理单独的 cd 命令：子进程中的 cd 不会改变当前进程的目录，交互式会话需要在进程内切换。
+def change_directory(command: str) -> bool:
+    """
+    change_directory：如果命令是单独的 cd，则在当前进程中切换目录。
+    参数:
+        command: 命令或用户输入。
+
+    返回值：是否为 cd 命令且切换成功。
+    """
+    match = re.fullmatch(r'cd(?:\s+(.+))?', command.strip())
+    if not match:
+        return False
+
+    target = os.path.expandvars(os.path.expanduser((match.group(1) or '~').strip().strip('"\'')))
+    try:
+        os.chdir(target)
+        return True
+    except OSError as e:
+        print(f"cd: {e}")
+        return False
+
+
 # 执行命令行命令，返回是否执行成功（True/False）。
 def execute_command(command: str) -> bool:
     """
@@ -141,20 +351,17 @@ def execute_command(command: str) -> bool:
 
 
 # 保存用户命令及其对应的用户输入到内存数据库（向量数据库），并根据配置自动淘汰超出最大存储数的历史记录。
-def save_command(command: str, text: str, config_dict: dict, memory: Memory):
+def save_command(command: str, text: str, config_dict: ConfigSnapshot, memory: Memory):
     """
     save_command：将命令保存到数据库中。
     参数:
         command: 要执行的命令。
         text: 用户输入的提示。
-        config_dict: 配置字典。
+        config_dict: 配置快照。
         memory: 内存中的向量数据库。
     """
     # add the query to the memory, eviction with the default max size of 2000.
-    if config_dict.get(CONFIG_SEC_GENERAL).get('storage_size') is None:
-        storage_size = 2000
-    else:
-        storage_size = int(config_dict[CONFIG_SEC_GENERAL]['storage_size'])
+    storage_size = config_dict.integer(CONFIG_SEC_GENERAL, 'storage_size', 2000)
 
     if memory.count() > storage_size:
         memory.delete()
@@ -179,8 +386,48 @@ def copy_command(command: str):
     参数:
         command: 要复制的命令。
     """
+    import pyperclip
+
     try:
         pyperclip.copy(command)
         return True
     except pyperclip.PyperclipException:
         return False
+
+
+# 解析 --since 参数：支持 ISO 日期（如 2024-05-01）或相对时间（如 7d、12h、30m），返回时间戳。
+def parse_since(since: str) -> float:
+    """
+    parse_since：将日期或相对时间解析为时间戳。
+    参数:
+        since: ISO 日期字符串，或形如 7d / 12h / 30m 的相对时间。
+
+    返回值：对应的 Unix 时间戳；无法解析时抛出 click.BadParameter。
+    """
+    match = re.fullmatch(r'(\d+)([dhm])', since.strip())
+    if match:
+        seconds = {'d': 86400, 'h': 3600, 'm': 60}[match.group(2)]
+        return time.time() - int(match.group(1)) * seconds
+
+    try:
+        return datetime.fromisoformat(since.strip()).timestamp()
+    except ValueError:
+        import click
+        raise click.BadParameter("expected YYYY-MM-DD or 7d/12h/30m", param_hint='--since') from None
+
+
+# 记录最后一次使用的时间戳：早期的记录没有 last_used，以创建时间代替。
+def record_time(metadata: dict) -> float:
+    """
+    record_time：记录最后一次使用的时间戳。
+    参数:
+        metadata: 记录的元数据。
+
+    返回值：last_used，没有时为 created_at 对应的时间戳，都没有时为 0。
+    """
+    if metadata.get('last_used') is not None:
+        return float(metadata['last_used'])
+    try:
+        return datetime.fromisoformat(metadata['created_at']).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return 0.0
@@ -0,0 +1,62 @@
+# termax.fast
+# Shell 插件使用的快速路径入口：输入自然语言，输出命令。
+# 只加载配置、所选平台与命令记忆，不导入交互式命令行（click、rich、inquirer、pyperclip、插件安装），
+# 生成流程与 `t -p` 相同（generate_command），命令写到标准输出，错误写到标准错误。
+
+import os
+import sys
+
+from termax.prompt import Prompt, Memory
+from termax.cli.utils import load_model, generate_command
+from termax.utils.trace import tracer, span
+from termax.utils.config import Config, CONFIG_PATH, TRACE_PATH
+from termax.utils.const import CONFIG_SEC_GENERAL
+
+tracer.mark('imports')
+
+
+# 快速路径主函数：termax-complete "<text>" 或 python -m termax.fast "<text>"
+def main(argv: list = None):
+    """
+    Generate a command from the natural language text and write it to stdout, for the shell plugins.
+    Args:
+        argv: the words of the text, default is the command line arguments.
+
+    Returns: the exit code, 0 on success, 1 when no command could be generated, 2 without a text or a configuration.
+    """
+    text = " ".join(sys.argv[1:] if argv is None else argv).strip()
+    if not text:
+        print("Usage: termax-complete <text>", file=sys.stderr)
+        return 2
+
+    config_dict = Config().read()
+    if not os.path.exists(CONFIG_PATH) or config_dict.value(CONFIG_SEC_GENERAL, 'platform') not in config_dict:
+        print("Termax is not configured yet, please run `t config` first.", file=sys.stderr)
+        return 2
+
+    # avoid the tokenizers parallelism issue
+    os.environ['TOKENIZERS_PARALLELISM'] = 'false'
+    try:
+        # 先加载模型：预连接在后台进行，与记忆库（chromadb）的加载重叠
+        model, platform = load_model(config_dict)
+        with span('memory.init'):
+            memory = Memory()
+        command, _ = generate_command(model, Prompt(memory), text, platform, config_dict)
+    except Exception as e:
+        print(f"Failed to generate the command: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if os.environ.get('TERMAX_PROFILE'):
+            print(tracer.waterfall(), file=sys.stderr)
+        if config_dict.boolean(CONFIG_SEC_GENERAL, 'trace'):
+            tracer.dump(TRACE_PATH, 'complete')
+
+    if command is None:
+        print("Unable to generate the command, please try again.", file=sys.stderr)
+        return 1
+    print(command)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
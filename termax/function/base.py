@@ -21,3 +21,23 @@ def get_all_functions():
     if sys.platform.startswith('linux') or sys.platform == 'darwin':
         return [MacFunction, ShellFunction]  # TODO: load all modules dynamically
     return [WinFunction, ShellFunction]
+
+
+def get_function_declarations():
+    """
+    获取所有函数的通用声明（名称、描述与只含 type / description 的 JSON Schema 参数），
+    可直接用于 Claude、Gemini、Mistral、通义千问、文心千帆等平台的工具调用。
+    返回值：函数声明列表。
+    """
+    declarations = []
+    for schema in get_all_function_schemas():
+        properties = {}
+        for name, field in schema['parameters']['properties'].items():
+            description = field.get('descriptions', field.get('title', ''))
+            properties[name] = {'type': field.get('type', 'string'), 'description': description}
+        declarations.append({
+            'name': schema['name'],
+            'description': schema['description'],
+            'parameters': {'type': 'object', 'properties': properties, 'required': schema['parameters']['required']}
+        })
+    return declarations
@@ -1,6 +1,6 @@
 import subprocess
 
-from instructor import OpenAISchema
+from termax.function.schema import OpenAISchema
 
 
 class GitFunction(OpenAISchema):
@@ -1,5 +1,5 @@
 from pydantic import Field
-from instructor import OpenAISchema
+from termax.function.schema import OpenAISchema
 
 from termax.prompt import process_mac_script
 
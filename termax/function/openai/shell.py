@@ -1,4 +1,4 @@
-from instructor import OpenAISchema
+from termax.function.schema import OpenAISchema
 from pydantic import Field
 
 
@@ -0,0 +1,37 @@
+from pydantic import BaseModel, ConfigDict
+
+
+class classproperty:
+    """
+    只读的类属性。
+    """
+
+    def __init__(self, getter):
+        self.getter = getter
+
+    def __get__(self, instance, owner):
+        return self.getter(owner)
+
+
+class OpenAISchema(BaseModel):
+    """
+    OpenAISchema：由 pydantic 模型生成 OpenAI 函数调用的 schema：Config.title 为函数名，类的文档为描述，字段为参数。
+    """
+    model_config = ConfigDict(ignored_types=(classproperty,))
+
+    @classproperty
+    def openai_schema(cls):
+        """
+        openai_schema：OpenAI 格式的函数 schema（name / description / parameters）。
+        """
+        schema = cls.model_json_schema()
+        parameters = {key: value for key, value in schema.items() if key not in ("title", "description")}
+        parameters["required"] = sorted(
+            name for name, field in parameters.get("properties", {}).items() if "default" not in field
+        )
+        return {
+            "name": schema["title"],
+            "description": schema.get("description") or f"Correctly extracted `{cls.__name__}` with all the required "
+                                                         f"parameters with correct types",
+            "parameters": parameters,
+        }
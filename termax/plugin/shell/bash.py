@@ -1,5 +1,5 @@
 # termax.plugin.shell.bash
-# 定义 Bash 插件脚本内容，实现 Ctrl+k 快捷键调用 termax 处理命令行并显示进度动画。
+# 定义 Bash 插件脚本内容，实现 Ctrl+k 快捷键调用 termax 处理命令行并显示进度动画，以及可选的下一条命令预取（Alt+k）。
 
 bash_plugin = """
 # ====== Termax Bash Plugin ======
@@ -10,7 +10,8 @@ _termax_bash() {
         { spin 5 & } 2>/dev/null
         SPIN_PID=$!
 
-        READLINE_LINE=$(t termax -p "$_termax_prev_line")
+        # the lean entry point, keep the line as it was when no command comes back
+        READLINE_LINE=$(termax-complete "$_termax_prev_line" 2>/dev/null) || READLINE_LINE="$_termax_prev_line"
         kill "$SPIN_PID"
         printf "\r%s" "                 "
         echo " "
@@ -27,5 +28,38 @@ spin() {
     done
 }
 bind -x '"\\C-k": _termax_bash'
+# refresh the directory context snapshot in the background whenever the directory changes
+_termax_context() {
+    if [[ "$PWD" != "$_termax_last_pwd" ]]; then
+        _termax_last_pwd="$PWD"
+        (termax context refresh > /dev/null 2>&1 &)
+    fi
+}
+PROMPT_COMMAND="_termax_context${PROMPT_COMMAND:+;$PROMPT_COMMAND}"
+# with `prefetch` configured, predict the next command in the background after each command, Alt+K inserts it
+_termax_prefetch() {
+    local _termax_status=$? _termax_last
+    _termax_last=$(HISTTIMEFORMAT= history 1)
+    _termax_last="${_termax_last#*[0-9]  }"
+    if [[ -n "$_termax_last" && "$PWD:$_termax_status:$_termax_last" != "$_termax_prefetched_for" ]]; then
+        _termax_prefetched_for="$PWD:$_termax_status:$_termax_last"
+        (termax-prefetch --exit-code "$_termax_status" -- "$_termax_last" > /dev/null 2>&1 &)
+    fi
+    return $_termax_status
+}
+_termax_prefetched() {
+    local _termax_next
+    if _termax_next=$(termax-prefetch --show 2>/dev/null); then
+        READLINE_LINE="$_termax_next"
+        READLINE_POINT=${#READLINE_LINE}
+    fi
+}
+if termax-prefetch --enabled > /dev/null 2>&1; then
+    # runs first, while $? is still the exit code of the last command
+    PROMPT_COMMAND="_termax_prefetch;$PROMPT_COMMAND"
+    bind -x '"\\ek": _termax_prefetched'
+fi
+# run the start-up tasks of the configuration in the background: preload an Ollama model, summarize the tools on PATH
+(termax-startup > /dev/null 2>&1 &)
 # ====== Termax Bash Plugin End ======
 """
@@ -1,12 +1,12 @@
 # termax.plugin.shell.fish
-# 定义 Fish 插件脚本内容及函数，实现 Ctrl+k 快捷键调用 termax 处理命令行并显示进度动画。
+# 定义 Fish 插件脚本内容及函数，实现 Ctrl+k 快捷键调用 termax 处理命令行并显示进度动画，以及可选的下一条命令预取（Alt+k）。
 
 fish_function = """
 # ====== Termax Fish Plugin ======
 function termax_fish
     set -l _buffer (commandline)
     if test -n "$_buffer"
-        t termax -p "$_buffer" > /tmp/termax_output.txt &
+        termax-complete "$_buffer" > /tmp/termax_output.txt 2>/dev/null &
         set -l job_id $last_pid
         while kill -0 $job_id 2>/dev/null
             commandline -a "."
@@ -14,7 +14,10 @@ function termax_fish
         end
         set -l BUFFER (cat /tmp/termax_output.txt)
         rm /tmp/termax_output.txt
-        commandline $BUFFER
+        # keep the command line as it was when no command comes back
+        if test -n "$BUFFER"
+            commandline $BUFFER
+        end
         # commandline -f end-of-line
     end
 end
@@ -24,5 +27,29 @@ end
 fish_plugin = """
 # ====== Termax Fish Plugin ======
 bind \ck 'termax_fish'
+# refresh the directory context snapshot in the background whenever the directory changes
+function _termax_context --on-variable PWD
+    command termax context refresh > /dev/null 2>&1 &
+    disown 2>/dev/null
+end
+_termax_context
+# with `prefetch` configured, predict the next command in the background after each command, Alt+K inserts it
+if command termax-prefetch --enabled > /dev/null 2>&1
+    function _termax_prefetch --on-event fish_postexec
+        set -l _termax_status $status
+        command termax-prefetch --exit-code $_termax_status -- $argv[1] > /dev/null 2>&1 &
+        disown 2>/dev/null
+    end
+    function _termax_prefetched
+        set -l _termax_next (command termax-prefetch --show 2>/dev/null)
+        if test -n "$_termax_next"
+            commandline -- "$_termax_next"
+        end
+    end
+    bind \ek '_termax_prefetched'
+end
+# run the start-up tasks of the configuration in the background: preload an Ollama model, summarize the tools on PATH
+command termax-startup > /dev/null 2>&1 &
+disown 2>/dev/null
 # ====== Termax Fish Plugin End ======
 """
@@ -1,5 +1,5 @@
 # termax.plugin.shell.zsh
-# 定义 Zsh 插件脚本内容，实现 Ctrl+k 快捷键调用 termax 处理命令行并显示进度动画。
+# 定义 Zsh 插件脚本内容，实现 Ctrl+k 快捷键调用 termax 处理命令行并显示进度动画，以及可选的下一条命令预取（Alt+k）。
 
 zsh_plugin = """
 # ===== Termax ZSH Plugin =====
@@ -13,9 +13,9 @@ _termax_zsh() {
         # Create a temporary file for output
         tmpfile=$(mktemp)
 
-        # Start termax in the background and redirect its output to the temporary file
+        # Start the lean termax entry point in the background and redirect its output to the temporary file
         set +m
-        t termax -p "$_termax_prev_cmd" > "$tmpfile" &
+        termax-complete "$_termax_prev_cmd" > "$tmpfile" 2>/dev/null &
         pid=$!
 
         # Spinner
@@ -29,11 +29,14 @@ _termax_zsh() {
             sleep 0.3
         done
 
-        # Wait for the background process to finish
-        wait $pid
+        # Wait for the background process to finish, keep the command line as it was on failure
+        if wait $pid; then
+            BUFFER=$(<"$tmpfile")
+        else
+            BUFFER=$_termax_prev_cmd
+        fi
 
-        # Read the result from the temporary file and clean up
-        BUFFER=$(<"$tmpfile")
+        # Clean up the temporary file
         rm "$tmpfile"
 
         zle end-of-line
@@ -41,5 +44,35 @@ _termax_zsh() {
 }
 zle -N _termax_zsh
 bindkey '^k' _termax_zsh
+# refresh the directory context snapshot in the background whenever the directory changes
+_termax_context() {
+    (termax context refresh > /dev/null 2>&1 &)
+}
+autoload -Uz add-zsh-hook
+add-zsh-hook chpwd _termax_context
+_termax_context
+# with `prefetch` configured, predict the next command in the background after each command, Alt+K inserts it
+_termax_prefetch() {
+    local _termax_status=$? _termax_last
+    _termax_last=$(fc -ln -1 2>/dev/null)
+    if [[ -n "$_termax_last" && "$PWD:$_termax_status:$_termax_last" != "$_termax_prefetched_for" ]]; then
+        _termax_prefetched_for="$PWD:$_termax_status:$_termax_last"
+        (termax-prefetch --exit-code "$_termax_status" -- "$_termax_last" > /dev/null 2>&1 &)
+    fi
+}
+_termax_prefetched() {
+    local _termax_next
+    if _termax_next=$(termax-prefetch --show 2>/dev/null); then
+        BUFFER=$_termax_next
+        zle end-of-line
+    fi
+}
+if termax-prefetch --enabled > /dev/null 2>&1; then
+    add-zsh-hook precmd _termax_prefetch
+    zle -N _termax_prefetched
+    bindkey '^[k' _termax_prefetched
+fi
+# run the start-up tasks of the configuration in the background: preload an Ollama model, summarize the tools on PATH
+(termax-startup > /dev/null 2>&1 &)
 # ===== Termax ZSH Plugin End =====
 """
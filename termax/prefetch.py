@@ -0,0 +1,104 @@
+# termax.prefetch
+# Shell 插件的下一条命令预取入口：每条命令结束后在后台运行，预测用户最可能执行的下一条命令并保存，
+# `t guess` 与插件的快捷键（Alt+K）直接读取保存的结果，不必等待。
+# 只有配置了 prefetch（local 或 model）时才生效；local 只统计 shell 历史，model 才加载模型与提示词。
+
+import os
+import sys
+import argparse
+
+from termax.utils.config import Config, CONFIG_PATH, PREFETCH_PATH
+from termax.utils.const import CONFIG_SEC_GENERAL, PREFETCH_OFF, PREFETCH_LIST, PREFETCH_MODEL, PREFETCH_INTERVAL, \
+    PREFETCH_HISTORY
+from termax.utils.store import read_json
+from termax.utils.command import is_self_call, validate_command
+from termax.utils.prefetch import recent_commands, predict_next, read_prefetch, prefetch_source, write_prefetch
+
+
+# 用建议任务的模型（suggest_model，通常是更便宜的模型）预测下一条命令，未通过本地预检的预测不保存
+def predict_with_model(config_dict, history: list, last_command: str, exit_code: int):
+    """
+    Predict the next command with the suggestion model of the configured platform.
+    Args:
+        config_dict: the configuration snapshot.
+        history: the recent shell commands, the oldest first.
+        last_command: the command that just finished.
+        exit_code: the exit code of the last command.
+
+    Returns: the predicted command, None when the prediction does not pass the pre-flight checks.
+    """
+    from termax.prompt import Prompt
+    from termax.cli.utils import load_model
+
+    model, _ = load_model(config_dict)
+    prompt = Prompt(None)
+    command = model.to_command(
+        prompt.gen_prefetch(history, last_command, exit_code), "Predict my next command.", kind='suggestion'
+    )
+    if not command or is_self_call(command) or validate_command(command, prompt.files()):
+        return None
+    return command
+
+
+# 预取主函数：termax-prefetch --exit-code <code> -- <last command>
+def main(argv: list = None):
+    """
+    Predict the next command after the last one finished, and store it for `t guess` and the plugin shortcut.
+    Args:
+        argv: the command line arguments, default is sys.argv[1:].
+
+    Returns: the exit code: with --enabled, 0 when the prefetch is configured; with --show, 0 when a prediction is
+     available; 2 on an invalid configuration, 0 otherwise.
+    """
+    parser = argparse.ArgumentParser(prog='termax-prefetch', description="Prefetch the next command.")
+    parser.add_argument('--exit-code', type=int, default=0, help="The exit code of the last command.")
+    parser.add_argument('--enabled', action='store_true', help="Exit with 0 when the prefetch is configured.")
+    parser.add_argument('--show', action='store_true', help="Print the prediction for the current directory.")
+    parser.add_argument('command', nargs='*', help="The last command, after --.")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    if args.show:
+        record = read_prefetch(os.getcwd())
+        if record is None:
+            return 1
+        print(record['command'])
+        return 0
+
+    config_dict = Config().read()
+    mode = config_dict.value(CONFIG_SEC_GENERAL, 'prefetch', PREFETCH_OFF).lower()
+    if mode not in PREFETCH_LIST:
+        print(f"Invalid prefetch mode: {mode}, should be one of {', '.join(PREFETCH_LIST)}.", file=sys.stderr)
+        return 2
+    if args.enabled:
+        return 0 if os.path.exists(CONFIG_PATH) and mode != PREFETCH_OFF else 1
+
+    last_command = " ".join(args.command).strip()
+    if mode == PREFETCH_OFF or not last_command or is_self_call(last_command):
+        return 0
+
+    cwd, previous = os.getcwd(), read_json(PREFETCH_PATH)
+    source = prefetch_source(
+        previous, cwd, last_command, args.exit_code, mode,
+        config_dict.number(CONFIG_SEC_GENERAL, 'prefetch_interval', PREFETCH_INTERVAL)
+    )
+    if source is None:
+        return 0
+
+    history = recent_commands()
+    # the history file may not contain the last command yet (bash writes it when the shell exits)
+    if not history or history[-1] != last_command:
+        history.append(last_command)
+    command = None
+    if source == PREFETCH_MODEL:
+        try:
+            command = predict_with_model(config_dict, history[-PREFETCH_HISTORY:], last_command, args.exit_code)
+        except Exception as e:
+            print(f"Failed to prefetch the next command: {e}", file=sys.stderr)
+    else:
+        command = predict_next(history, last_command)
+    write_prefetch(cwd, last_command, args.exit_code, command, source, previous)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
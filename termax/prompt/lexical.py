@@ -0,0 +1,246 @@
+import os
+import re
+import math
+from collections import Counter, defaultdict
+from typing import List, Tuple
+
+from termax.utils.store import read_json, write_json, append_jsonl, iter_jsonl
+
+# 追加日志的条数超过快照中文档数的这一比例（且不少于 JOURNAL_MINIMUM 条）时，合并为新的快照
+JOURNAL_RATIO = 0.5
+JOURNAL_MINIMUM = 100
+
+TOKEN_REGEX = re.compile(r"[\w\-./:@~=+]+")
+SUBTOKEN_REGEX = re.compile(r"[^\W_]+|_")
+
+
+# 针对 shell 命令的分词：保留完整的参数、主机名和文件名，同时拆出其中的子词
+def tokenize(text: str) -> List[str]:
+    """
+    tokenize: split the text into lexical tokens. Flags (`--force`), hostnames (`api.example.com`) and file names
+    (`main.py`) are kept as a whole token, their alphanumeric parts are added as extra tokens.
+    Args:
+        text: the text to tokenize.
+
+    Returns: the list of tokens.
+    """
+    tokens = []
+    for token in TOKEN_REGEX.findall(text.lower()):
+        token = token.rstrip('.:')
+        if not token:
+            continue
+        tokens.append(token)
+        parts = [part for part in SUBTOKEN_REGEX.findall(token) if part != '_']
+        if len(parts) > 1 or (parts and parts[0] != token):
+            tokens.extend(parts)
+    return tokens
+
+
+class LexicalIndex:
+    # 初始化 BM25 倒排索引，索引持久化为 JSON 快照与追加写入的变更日志
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        """
+        In-process BM25 inverted index, maintained alongside the vector store. The index is persisted as a JSON
+        snapshot, the documents added or removed since are appended to a journal (`<path>.log`) instead of
+        rewriting the snapshot, the journal is merged into the snapshot once it grows large.
+        Args:
+            path: the path of the persisted index file, None for an index kept in memory only.
+            k1: the BM25 term frequency saturation.
+            b: the BM25 document length normalization.
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.documents = {}
+        self.postings = defaultdict(dict)
+        self.total_length = 0
+        # 上次保存之后的变更：文档 ID -> 词列表（删除为 None）；只在内存中的索引不记录
+        self.changes = {} if path else None
+        self.journal = 0
+
+    @property
+    def journal_path(self):
+        return f"{self.path}.log"
+
+    # 从磁盘加载索引，返回索引文件是否存在
+    def load(self):
+        """
+        load: load the persisted index.
+
+        Returns: False if there is no index file yet.
+        """
+        documents = read_json(self.path)
+        if documents is None:
+            return False
+
+        for doc_id, tokens in documents.items():
+            self._index(doc_id, tokens)
+        # 重放快照之后的变更，日志中的操作可以重复执行，合并快照时中断也不会出错
+        for change in iter_jsonl(self.journal_path):
+            if change.get('tokens') is None:
+                self.remove(change.get('id'))
+            else:
+                self.remove(change['id'])
+                self._index(change['id'], change['tokens'])
+            self.journal += 1
+        self.changes = {}
+        return True
+
+    # 将索引的变更写回磁盘：变更不多时追加到日志，否则写入新的快照
+    def save(self):
+        """
+        save: persist the changes since the last save, only the token lists are stored, the postings are rebuilt
+        on load. The changes are appended to the journal, the whole snapshot is rewritten only when the journal
+        has grown past a share of the documents (or after `clear`).
+        """
+        if not self.path:
+            return
+        if self.changes is not None and self.journal + len(self.changes) <= max(
+                JOURNAL_MINIMUM, JOURNAL_RATIO * len(self.documents)
+        ) and os.path.exists(self.path):
+            for doc_id, tokens in self.changes.items():
+                append_jsonl(self.journal_path, {'id': doc_id, 'tokens': tokens})
+            self.journal += len(self.changes)
+        else:
+            write_json(self.path, self.documents)
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self.journal = 0
+        self.changes = {}
+
+    def _index(self, doc_id: str, tokens: List[str]):
+        self.documents[doc_id] = tokens
+        self.total_length += len(tokens)
+        for token, freq in Counter(tokens).items():
+            self.postings[token][doc_id] = freq
+
+    # 向索引中添加（或替换）一条文档
+    def add(self, doc_id: str, text: str):
+        """
+        add: add or replace a document in the index.
+        Args:
+            doc_id: the id of the document, same as the id in the vector store.
+            text: the text of the document.
+        """
+        if doc_id in self.documents:
+            self.remove(doc_id)
+        self._index(doc_id, tokenize(text))
+        if self.changes is not None:
+            self.changes[doc_id] = self.documents[doc_id]
+
+    # 从索引中移除一条文档
+    def remove(self, doc_id: str):
+        """
+        remove: remove a document from the index.
+        Args:
+            doc_id: the id of the document.
+        """
+        tokens = self.documents.pop(doc_id, None)
+        if tokens is None:
+            return
+        if self.changes is not None:
+            self.changes[doc_id] = None
+
+        self.total_length -= len(tokens)
+        for token in set(tokens):
+            self.postings[token].pop(doc_id, None)
+            if not self.postings[token]:
+                del self.postings[token]
+
+    # 清空索引
+    def clear(self):
+        """
+        clear: remove all the documents from the index, the next save rewrites the snapshot.
+        """
+        self.documents = {}
+        self.postings = defaultdict(dict)
+        self.total_length = 0
+        # None 表示需要写入完整的快照
+        self.changes = None
+
+    # 使用 BM25 检索最相关的文档
+    def search(self, text: str, n_results: int = 5) -> List[Tuple[str, float]]:
+        """
+        search: rank the documents against the text with BM25.
+        Args:
+            text: the query text.
+            n_results: the number of results to return.
+
+        Returns: a list of (document id, BM25 score), best first.
+        """
+        if not self.documents:
+            return []
+
+        total = len(self.documents)
+        average_length = self.total_length / total
+        scores = defaultdict(float)
+        for token in set(tokenize(text)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, freq in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * len(self.documents[doc_id]) / average_length)
+                scores[doc_id] += idf * freq * (self.k1 + 1) / (freq + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:n_results]
+
+    def __len__(self):
+        return len(self.documents)
+
+
+class TrigramIndex:
+    # 初始化三元组（trigram）索引，用于子串与模糊匹配
+    def __init__(self):
+        """
+        Trigram index for the substring and fuzzy search over the documents.
+        """
+        self.grams = defaultdict(set)
+
+    @staticmethod
+    def trigrams(text: str, pad: bool = True):
+        """
+        trigrams: the set of character trigrams of the text.
+        Args:
+            text: the text to split.
+            pad: pad the text with spaces, so its start and end make trigrams of their own.
+
+        Returns: the set of trigrams.
+        """
+        text = f"  {text.lower()} " if pad else text.lower()
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    # 向索引中添加一条文档
+    def add(self, doc_id: str, text: str):
+        """
+        add: add a document to the index.
+        Args:
+            doc_id: the id of the document.
+            text: the text of the document.
+        """
+        for gram in self.trigrams(text):
+            self.grams[gram].add(doc_id)
+
+    # 按照查询串中被文档包含的三元组比例检索，查询串不加填充，文档中任意位置的子串匹配得分都为 1
+    def search(self, text: str, threshold: float = 0.5) -> List[Tuple[str, float]]:
+        """
+        search: rank the documents by the share of the trigrams of the text they contain. The text is not padded,
+        so a substring match anywhere in a document scores 1.0 and typos only lower the score. A text shorter than
+        three characters has no trigram of its own, it is padded in front and scores 1.0 at the start of a word.
+        Args:
+            text: the search text.
+            threshold: the minimum score to keep a document.
+
+        Returns: a list of (document id, score), best first.
+        """
+        text = text.strip()
+        grams = self.trigrams(text, pad=False) or self.trigrams(f"  {text}", pad=False)
+        if not grams:
+            return []
+        hits = Counter()
+        for gram in grams:
+            hits.update(self.grams.get(gram, ()))
+
+        results = [(doc_id, hit / len(grams)) for doc_id, hit in hits.items() if hit / len(grams) >= threshold]
+        return sorted(results, key=lambda item: item[1], reverse=True)
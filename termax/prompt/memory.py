@@ -1,15 +1,34 @@
-import uuid
+import re
+import sys
+import math
+import time
+import shutil
+import hashlib
 import os.path
 from typing import List, Dict
 
-import chromadb
-from chromadb.utils import embedding_functions
-
-chromadb.logger.setLevel(chromadb.logging.ERROR)
-
 from termax.utils.const import *
 from termax.utils.metadata import *
 from termax.utils import Config, CONFIG_HOME
+from termax.utils.trace import traced
+from termax.utils.httpclient import HTTPClient
+from .utils import is_url
+from .lexical import LexicalIndex, TrigramIndex
+
+
+class OpenAIEmbedding:
+    """
+    OpenAIEmbedding：通过内置 HTTP 客户端调用 OpenAI（或兼容接口）embeddings 接口的 embedding 函数，无需 openai SDK。
+    """
+
+    def __init__(self, api_key: str, model_name: str, base_url: str = None):
+        self.client = HTTPClient(base_url if is_url(base_url) else OPENAI_BASE_URL, api_key=api_key)
+        self.model_name = model_name
+
+    def __call__(self, input):
+        texts = [text.replace("\n", " ") for text in input]
+        response = self.client.post('/embeddings', {'model': self.model_name, 'input': texts})
+        return [item['embedding'] for item in sorted(response['data'], key=lambda item: item['index'])]
 
 
 class Memory:
@@ -27,30 +46,216 @@ class Memory:
              if the OpenAI has been set in the configuration, it will use the OpenAI embedding model
              "text-embedding-ada-002".
         """
+        # chromadb 的导入耗时约一秒，推迟到第一次创建 Memory 时，只导入本模块（如 is_url、CommandStream）时不加载
+        import chromadb
+        chromadb.logger.setLevel(chromadb.logging.ERROR)
+
         self.config = Config().read()
+        self.data_path = data_path
         self.client = chromadb.PersistentClient(path=os.path.join(data_path, DB_PATH))
+        self.collections = {}
+        self.indexes = {}
+        self.trigrams = {}
+        self.retrieval = self.config.value(CONFIG_SEC_GENERAL, 'retrieval', RETRIEVAL_HYBRID)
+        self.scoping = self.config.boolean(CONFIG_SEC_GENERAL, 'scope_by_project', True)
+        self.sharding = self.config.boolean(CONFIG_SEC_GENERAL, 'shard_by_project')
 
-        # 如果配置中设置了 openai 部分，则使用 OpenAI 的 embedding 函数。
-        if self.config.get(CONFIG_SEC_OPENAI, None):
-            self.client.get_or_create_collection(
-                DB_COMMAND_HISTORY,
-                embedding_function=embedding_functions.OpenAIEmbeddingFunction(
-                    model_name=embedding_model,
-                    api_key=self.config[CONFIG_SEC_OPENAI][CONFIG_SEC_API_KEY]
+        # HNSW 索引参数，只传递配置中设置了的参数
+        self.index_metadata = {}
+        for option, key, cast in DB_HNSW_OPTIONS:
+            value = self.config.convert(CONFIG_SEC_GENERAL, option, cast)
+            if value is not None:
+                self.index_metadata[key] = value
+
+        # 如果配置中设置了 openai 部分，则使用 OpenAI 的 embedding 函数（支持自定义 base_url，使用内置 HTTP 客户端）。
+        # 集合的元数据记录其向量所用的模型，模型变化时重新计算已有记录的 embedding，避免向量维度不一致。
+        self.functions = {}
+        self.models = {}
+        # 已检查过是否需要重新计算 embedding 的集合（只在写入时检查）
+        self.checked = set()
+        self.embedding_name = f"openai/{embedding_model}" if self.config.get(CONFIG_SEC_OPENAI, None) \
+            else DB_DEFAULT_EMBEDDING
+        self.embedding_function = self.embedding(self.embedding_name)
+
+        self.collection(DB_COMMAND_HISTORY, create=False)
+
+    # 根据集合元数据中记录的模型名创建 embedding 函数
+    def embedding(self, name: str):
+        """
+        embedding: build the embedding function of a model name recorded in the collection metadata.
+        Args:
+            name: `default` for the ChromaDB default model, `openai/<model>` for an OpenAI embedding model.
+
+        Returns: the embedding function, None if it cannot be built with the current configuration.
+        """
+        if name not in self.functions:
+            if name == DB_DEFAULT_EMBEDDING:
+                from chromadb.utils import embedding_functions
+                self.functions[name] = embedding_functions.DefaultEmbeddingFunction()
+            elif name.startswith('openai/') and self.config.get(CONFIG_SEC_OPENAI, None):
+                self.functions[name] = OpenAIEmbedding(
+                    api_key=self.config.value(CONFIG_SEC_OPENAI, CONFIG_SEC_API_KEY),
+                    model_name=name.partition('/')[2],
+                    base_url=self.config.value(CONFIG_SEC_OPENAI, 'base_url')
                 )
+            else:
+                return None
+        return self.functions[name]
+
+    # 获取集合并缓存集合对象；写入时集合不存在则创建，并在模型变化时重新计算 embedding，只读的查询不修改数据库
+    def collection(self, name: str = DB_COMMAND_HISTORY, create: bool = True):
+        """
+        collection: get the collection with the configured embedding function and HNSW parameters. A collection
+        embedded with another model (the collections without the model in their metadata were embedded with the
+        ChromaDB default model) is read with that model, and re-embedded before the first write.
+        Args:
+            name: the name of the collection.
+            create: create the missing collection and re-embed it if needed, the read-only lookups pass False so
+             they never write to the store.
+
+        Returns: the chromadb collection, None if it does not exist and `create` is False.
+        """
+        if name not in self.collections:
+            try:
+                collection = self.client.get_collection(name, embedding_function=self.embedding_function)
+            except ValueError:
+                if not create:
+                    return None
+                collection = self.client.get_or_create_collection(
+                    name, embedding_function=self.embedding_function,
+                    metadata={**self.index_metadata, DB_EMBEDDING_KEY: self.embedding_name}
+                )
+            self.models[name] = (collection.metadata or {}).get(DB_EMBEDDING_KEY) or DB_DEFAULT_EMBEDDING
+            # 查询文本需要用集合自己的模型计算 embedding
+            function = self.embedding(self.models[name])
+            if self.models[name] != self.embedding_name and function is not None:
+                collection = self.client.get_collection(name, embedding_function=function)
+            self.collections[name] = collection
+
+        if create and name not in self.checked:
+            self.checked.add(name)
+            collection = self.collections[name]
+            # 没有记录模型的空集合同样重建一次，写入模型与 HNSW 参数
+            if self.models[name] != self.embedding_name or (
+                    DB_EMBEDDING_KEY not in (collection.metadata or {}) and collection.count() == 0
+            ):
+                self.collections[name] = self.reembed(collection, self.models[name])
+        return self.collections[name]
+
+    # 用当前的 embedding 模型重建集合：向量维度可能不同，因此先计算全部 embedding，再删除并重新创建集合
+    def reembed(self, collection, model: str):
+        """
+        reembed: rebuild a collection embedded with another model with the configured embedding function. All the
+        embeddings are computed before the collection is replaced, if that fails the collection is kept and used
+        with the model it was embedded with.
+        Args:
+            collection: the chromadb collection.
+            model: the embedding model recorded in the collection metadata.
+
+        Returns: the rebuilt collection.
+        """
+        records = collection.get(include=['documents', 'metadatas'])
+        try:
+            embeddings = []
+            for start in range(0, len(records['ids']), DB_EMBEDDING_BATCH):
+                embeddings += self.embedding_function(records['documents'][start:start + DB_EMBEDDING_BATCH])
+        except Exception as e:
+            function = self.embedding(model)
+            if function is None:
+                raise
+            print(f"Failed to re-embed the {collection.name} collection with {self.embedding_name}, "
+                  f"keep using {model}: {e}", file=sys.stderr)
+            return self.client.get_collection(collection.name, embedding_function=function)
+
+        metadata = {**(collection.metadata or {}), **self.index_metadata, DB_EMBEDDING_KEY: self.embedding_name}
+        self.client.delete_collection(name=collection.name)
+        rebuilt = self.client.create_collection(
+            collection.name, embedding_function=self.embedding_function, metadata=metadata
+        )
+        for start in range(0, len(records['ids']), DB_EMBEDDING_BATCH):
+            end = start + DB_EMBEDDING_BATCH
+            rebuilt.add(
+                ids=records['ids'][start:end], documents=records['documents'][start:end],
+                metadatas=records['metadatas'][start:end], embeddings=embeddings[start:end]
             )
-        else:
-            self.client.get_or_create_collection(DB_COMMAND_HISTORY)
+        self.models[collection.name] = self.embedding_name
+        return rebuilt
+
+    # 获取集合对应的 BM25 词法索引，索引文件不存在时根据集合中的记录重建
+    def lexical(self, name: str = DB_COMMAND_HISTORY):
+        """
+        lexical: get the in-process BM25 index of the collection, rebuilt from the collection if it is missing.
+        Args:
+            name: the name of the collection.
+
+        Returns: the lexical index.
+        """
+        if name not in self.indexes:
+            index = LexicalIndex(os.path.join(self.data_path, DB_PATH, DB_LEXICAL_PATH, f"{name}.json"))
+            collection = None if index.load() else self.collection(name, create=False)
+            # 集合不存在（如尚未写入的项目分片）时为空索引，不创建集合
+            if collection is not None:
+                records = collection.get(include=['documents', 'metadatas'])
+                for record_id, document, metadata in zip(records['ids'], records['documents'], records['metadatas']):
+                    index.add(record_id, f"{document} {(metadata or {}).get('response', '')}")
+                if records['ids']:
+                    index.save()
+            self.indexes[name] = index
+        return self.indexes[name]
 
-    # 向指定集合中添加查询及其响应，返回生成的ID列表
+    # 规范化查询/命令文本：去除首尾空白并合并连续空白
+    @staticmethod
+    def normalize(text: str, lower: bool = False):
+        """
+        normalize: normalize the text before hashing, collapse the whitespaces.
+        Args:
+            text: the text to normalize.
+            lower: lowercase the text as well, shell commands are case-sensitive so only the queries use it.
+
+        Returns: the normalized text.
+        """
+        text = re.sub(r'\s+', ' ', text.strip())
+        return text.lower() if lower else text
+
+    # 根据规范化后的查询/命令对（以及所属项目）计算内容哈希，作为记录 ID
+    def content_id(self, query: str, response: str, project: str = ''):
+        """
+        content_id: the content hash of the query/response pair, used as the record id.
+        Args:
+            query: the user input.
+            response: the generated command.
+            project: the project (git repository root or working directory) the command was used in.
+
+        Returns: the hex digest of the normalized pair.
+        """
+        content = f"{self.normalize(query, lower=True)}\x00{self.normalize(response)}\x00{project}"
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    # 按项目分片时，项目对应的集合名称
+    @staticmethod
+    def shard(project: str, collection: str = DB_COMMAND_HISTORY):
+        """
+        shard: the name of the per-project shard of the collection.
+        Args:
+            project: the project (git repository root or working directory).
+            collection: the name of the sharded collection.
+
+        Returns: the name of the shard collection.
+        """
+        return f"{collection}_{hashlib.sha1(project.encode('utf-8')).hexdigest()[:12]}"
+
+    # 向指定集合中写入查询及其响应：相同的查询/命令对只保留一条记录，并累加使用次数
+    @traced('memory.add_query')
     def add_query(
             self,
             queries: List[Dict[str, str]],
             collection: str = DB_COMMAND_HISTORY,
-            idx: List[str] = None
+            idx: List[str] = None,
+            context: Dict[str, str] = None
     ):
         """
-        add_query: add the queries to the memery.
+        add_query: upsert the queries to the memery. A query/response pair that already exists is not inserted
+        again, its `count` is increased and `last_used` refreshed instead.
         Args:
             queries: the queries to add to the memery. Should be in the format of
                 {
@@ -59,39 +264,327 @@ class Memory:
                 }
             collection: the name of the collection to add the queries.
             idx: the ids of the queries, should be in the same length as the queries.
-            If not provided, the ids will be generated by UUID.
+            If not provided, the ids will be the content hash of the normalized query/response pair.
+            context: the context (cwd, repo, project, hostname and shell) stored with the records,
+             default is the context of the current process.
 
-        Return: A list of generated IDs.
+        Return: A list of the record IDs.
         """
+        context = context or get_context_metadata()
         if idx:
             ids = idx
         else:
-            ids = [str(uuid.uuid4()) for _ in range(len(queries))]
+            ids = [self.content_id(query['query'], query['response'], context['project']) for query in queries]
+
+        # 合并同一批次中的重复记录
+        batch = {}
+        for record_id, query in zip(ids, queries):
+            if record_id in batch:
+                batch[record_id]['count'] += 1
+            else:
+                batch[record_id] = {'query': query['query'], 'response': query['response'], 'count': 1}
+
+        # 开启分片时，记录同时写入全局集合与项目分片，两者共用同一份 embedding
+        targets = [collection]
+        if self.sharding and collection == DB_COMMAND_HISTORY:
+            targets.append(self.shard(context['project'], collection))
 
-        query_list = [query['query'] for query in queries]
+        embeddings = {}
         added_time = datetime.now().isoformat()
-        resp_list = [{'response': query['response'], 'created_at': added_time} for query in queries]
-        # 将记录插入数据库
-        self.client.get_or_create_collection(collection).add(
-            documents=query_list,
-            metadatas=resp_list,
-            ids=ids
-        )
+        last_used = time.time()
+        for name in targets:
+            target = self.collection(name)
+            pending = dict(batch)
+            existing = target.get(ids=list(pending.keys()), include=['metadatas'])
+
+            # 已存在的记录只更新元数据，不重新计算 embedding
+            if existing['ids']:
+                metadatas = []
+                for record_id, metadata in zip(existing['ids'], existing['metadatas']):
+                    metadata = dict(metadata or {})
+                    metadata['count'] = int(metadata.get('count', 1)) + pending.pop(record_id)['count']
+                    metadata['last_used'] = last_used
+                    metadata.setdefault('created_at', added_time)
+                    metadata.update(context)
+                    metadatas.append(metadata)
+                target.update(ids=existing['ids'], metadatas=metadatas)
+
+            # 将新记录插入数据库，并同步更新词法索引
+            if pending:
+                index = self.lexical(name)
+                for record_id, record in pending.items():
+                    index.add(record_id, f"{record['query']} {record['response']}")
+                    if name in self.trigrams:
+                        self.trigrams[name].add(record_id, ' '.join(index.documents[record_id]))
+                index.save()
+
+                # 集合未能重新计算 embedding 时仍使用其原来的模型，embedding 按模型缓存
+                model = self.models[name]
+                missing = [record_id for record_id in pending if (model, record_id) not in embeddings]
+                if missing:
+                    vectors = self.embedding(model)([pending[record_id]['query'] for record_id in missing])
+                    embeddings.update(((model, record_id), vector) for record_id, vector in zip(missing, vectors))
+
+                target.add(
+                    documents=[record['query'] for record in pending.values()],
+                    embeddings=[embeddings[(model, record_id)] for record_id in pending],
+                    metadatas=[
+                        {
+                            'response': record['response'],
+                            'created_at': added_time,
+                            'last_used': last_used,
+                            'count': record['count'],
+                            **context
+                        } for record in pending.values()
+                    ],
+                    ids=list(pending.keys())
+                )
 
         return ids
 
-    # 在指定集合中检索与输入文本最相关的若干条记录
-    def query(self, query_texts: List[str], collection: str = DB_COMMAND_HISTORY, n_results: int = 5):
+    # 检索与输入文本最相关的若干条记录：优先在当前项目内检索，结果不足时再放宽到全部记录
+    @traced('memory.query')
+    def query(
+            self,
+            query_texts: List[str],
+            collection: str = DB_COMMAND_HISTORY,
+            n_results: int = 5,
+            mode: str = None,
+            context: Dict[str, str] = None
+    ):
         """
-        query: query the memery.
+        query: query the memery. The vector similarity and the BM25 score are fused, then boosted by the usage count.
+        When scoping is enabled, the records of the current project are searched first (in the project shard or
+        with a `where` filter), the search is widened to all the records only if too few results come back.
         Args:
             query_texts: the query texts to search in the memery.
             collection: the name of the collection to search, default is the command history.
             n_results: the number of results to return.
+            mode: the retrieval mode, one of `hybrid`, `vector` and `lexical`, default is the `retrieval` option
+             in the general configuration. The lexical mode does not compute any embedding.
+            context: the context used to scope the search, default is the context of the current process.
 
-        Returns: the top k results.
+        Returns: the top k results, in the format of the chromadb query results with an extra `scores` field.
+        """
+        if not self.scoping or collection != DB_COMMAND_HISTORY:
+            return self.search(query_texts, collection, n_results, mode)
+
+        project = (context or get_context_metadata())['project']
+        if self.sharding:
+            results = self.search(query_texts, self.shard(project, collection), n_results, mode)
+        else:
+            results = self.search(query_texts, collection, n_results, mode, where={'project': project})
+
+        if all(len(ids) >= n_results for ids in results['ids']):
+            return results
+
+        # 当前项目的结果不足，放宽到全部记录，并排在项目内结果之后
+        widened = self.search(query_texts, collection, n_results, mode)
+        for i in range(len(query_texts)):
+            seen = set(results['ids'][i])
+            for j, record_id in enumerate(widened['ids'][i]):
+                if len(results['ids'][i]) >= n_results:
+                    break
+                if record_id in seen:
+                    continue
+                for key in results:
+                    results[key][i].append(widened[key][i][j])
+
+        return results
+
+    # 在单个集合中检索：融合向量相似度、BM25 词法得分与使用频率
+    def search(
+            self,
+            query_texts: List[str],
+            collection: str = DB_COMMAND_HISTORY,
+            n_results: int = 5,
+            mode: str = None,
+            where: Dict[str, str] = None
+    ):
+        """
+        search: search a single collection.
+        Args:
+            query_texts: the query texts to search in the collection.
+            collection: the name of the collection to search.
+            n_results: the number of results to return.
+            mode: the retrieval mode, one of `hybrid`, `vector` and `lexical`.
+            where: the metadata equality filter applied to the records.
+
+        Returns: the top k results, in the format of the chromadb query results with an extra `scores` field.
+        """
+        mode = mode or self.retrieval
+        pool = n_results * DB_QUERY_POOL
+        # 不存在的集合（如尚未写入的项目分片）视为空集合
+        target = self.collection(collection, create=False)
+        if target is None:
+            return self.rank(collection, len(query_texts), None, None, n_results, where)
+
+        vector = None
+        if mode != RETRIEVAL_LEXICAL:
+            try:
+                vector = target.query(query_texts=query_texts, n_results=pool, where=where)
+            except Exception:
+                # embedding 不可用时（例如网络错误）退化为纯词法检索
+                if mode == RETRIEVAL_VECTOR:
+                    raise
+
+        lexical = None
+        if mode != RETRIEVAL_VECTOR or vector is None:
+            index = self.lexical(collection)
+            lexical = [index.search(text, pool) for text in query_texts]
+
+        return self.rank(collection, len(query_texts), vector, lexical, n_results, where)
+
+    # 融合排序：向量相似度与归一化的 BM25 得分加权求和，再按使用次数加权
+    def rank(
+            self,
+            collection: str,
+            n_queries: int,
+            vector: dict,
+            lexical: list,
+            n_results: int,
+            where: Dict[str, str] = None
+    ):
+        """
+        rank: fuse the vector and the lexical results, with the frequency-aware boost.
+        Args:
+            collection: the name of the collection searched.
+            n_queries: the number of query texts.
+            vector: the chromadb query results, None if the vector search was skipped.
+            lexical: the BM25 results for each query text, None if the lexical search was skipped.
+            n_results: the number of results to keep for each query.
+            where: the metadata equality filter, the lexical results not matching it are dropped.
+
+        Returns: the ranked results, in the format of the chromadb query results with an extra `scores` field.
+        """
+        candidates = [{} for _ in range(n_queries)]
+        if vector:
+            for i in range(n_queries):
+                for record_id, document, metadata, distance in zip(
+                        vector['ids'][i], vector['documents'][i], vector['metadatas'][i], vector['distances'][i]
+                ):
+                    candidates[i][record_id] = {
+                        'document': document, 'metadata': metadata, 'distance': distance, 'lexical': 0.0
+                    }
+
+        if lexical:
+            missing = set()
+            for i in range(n_queries):
+                top = lexical[i][0][1] if lexical[i] else 0.0
+                for record_id, score in lexical[i]:
+                    candidate = candidates[i].setdefault(
+                        record_id, {'document': None, 'metadata': None, 'distance': None, 'lexical': 0.0}
+                    )
+                    candidate['lexical'] = score / top if top else 0.0
+                    if candidate['document'] is None:
+                        missing.add(record_id)
+
+            # 只在词法检索命中的记录才需要额外读取文档与元数据
+            if missing:
+                target = self.collection(collection, create=False)
+                records = target.get(ids=list(missing), include=['documents', 'metadatas']) if target else {
+                    'ids': [], 'documents': [], 'metadatas': []
+                }
+                found = {
+                    record_id: (document, metadata)
+                    for record_id, document, metadata in zip(records['ids'], records['documents'], records['metadatas'])
+                }
+                for i in range(n_queries):
+                    for record_id in list(candidates[i]):
+                        if candidates[i][record_id]['document'] is not None:
+                            continue
+                        document, metadata = found.get(record_id, (None, None))
+                        if document is None or any((metadata or {}).get(k) != v for k, v in (where or {}).items()):
+                            del candidates[i][record_id]
+                        else:
+                            candidates[i][record_id].update(document=document, metadata=metadata)
+
+        ranked = {key: [] for key in ('ids', 'documents', 'metadatas', 'distances', 'scores')}
+        for i in range(n_queries):
+            rows = []
+            for record_id, candidate in candidates[i].items():
+                similarity = 1 / (1 + candidate['distance']) if candidate['distance'] is not None else 0.0
+                if vector and lexical:
+                    relevance = (1 - DB_LEXICAL_WEIGHT) * similarity + DB_LEXICAL_WEIGHT * candidate['lexical']
+                else:
+                    relevance = similarity if vector else candidate['lexical']
+                count = int((candidate['metadata'] or {}).get('count', 1))
+                score = relevance * (1 + DB_FREQUENCY_WEIGHT * math.log(max(count, 1)))
+                rows.append((record_id, candidate['document'], candidate['metadata'], candidate['distance'], score))
+
+            rows.sort(key=lambda row: row[4], reverse=True)
+            rows = rows[:n_results]
+            for key, column in zip(ranked.keys(), zip(*rows) if rows else ([], [], [], [], [])):
+                ranked[key].append(list(column))
+
+        return ranked
+
+    # 基于三元组索引的子串/模糊检索，索引由词法索引中的文档构建一次，之后随新记录更新
+    def fuzzy(self, text: str, collection: str = DB_COMMAND_HISTORY, threshold: float = 0.5):
         """
-        return self.client.get_or_create_collection(collection).query(query_texts=query_texts, n_results=n_results)
+        fuzzy: substring and fuzzy search with a trigram index, built once from the documents of the lexical index
+        and kept up to date by `add_query`.
+        Args:
+            text: the search text.
+            collection: the name of the collection to search.
+            threshold: the minimum share of the trigrams of the text a record has to contain.
+
+        Returns: a list of (record id, score), best first.
+        """
+        if collection not in self.trigrams:
+            index = TrigramIndex()
+            for record_id, tokens in self.lexical(collection).documents.items():
+                index.add(record_id, ' '.join(tokens))
+            self.trigrams[collection] = index
+        return self.trigrams[collection].search(text, threshold)
+
+    # 分页读取集合中的记录，每次只从数据库读取一页，内存占用与记录总数无关
+    def iter_records(
+            self,
+            collection: str = DB_COMMAND_HISTORY,
+            where: dict = None,
+            ids: List[str] = None,
+            offset: int = 0,
+            batch_size: int = DB_PAGE_SIZE
+    ):
+        """
+        iter_records: stream the records of the collection page by page.
+        Args:
+            collection: the name of the collection to read.
+            where: the chromadb metadata filter.
+            ids: only read these records, in this order.
+            offset: the number of records to skip, applied in the database when `ids` is not given.
+            batch_size: the number of records read from the database at a time.
+
+        Returns: a generator of (id, document, metadata).
+        """
+        target = self.collection(collection, create=False)
+        if target is None:
+            return
+        if ids is not None:
+            skipped = 0
+            for start in range(0, len(ids), batch_size):
+                chunk = ids[start:start + batch_size]
+                records = target.get(ids=chunk, where=where, include=['documents', 'metadatas'])
+                found = {
+                    record_id: (document, metadata)
+                    for record_id, document, metadata in zip(records['ids'], records['documents'], records['metadatas'])
+                }
+                for record_id in chunk:
+                    if record_id not in found:
+                        continue
+                    if skipped < offset:
+                        skipped += 1
+                        continue
+                    yield (record_id, *found[record_id])
+            return
+
+        while True:
+            records = target.get(where=where, limit=batch_size, offset=offset, include=['documents', 'metadatas'])
+            if not records['ids']:
+                return
+            yield from zip(records['ids'], records['documents'], records['metadatas'])
+            offset += len(records['ids'])
 
     # 查看指定集合中的前若干条记录
     def peek(self, collection: str = DB_COMMAND_HISTORY, n_results: int = 20):
@@ -103,7 +596,8 @@ class Memory:
 
         Returns: the top k results.
         """
-        return self.client.get_or_create_collection(collection).peek(limit=n_results)
+        target = self.collection(collection, create=False)
+        return target.peek(limit=n_results) if target is not None else {'ids': [], 'documents': [], 'metadatas': []}
 
     # 根据ID获取指定集合中的记录，若未指定ID则返回全部
     def get(self, record_id: str = None, collection: str = DB_COMMAND_HISTORY):
@@ -115,7 +609,9 @@ class Memory:
 
         Returns: the record.
         """
-        collection = self.client.get_collection(collection)
+        collection = self.collection(collection, create=False)
+        if collection is None:
+            return {'ids': [], 'documents': [], 'metadatas': []}
         if not record_id:
             return collection.get()
 
@@ -124,11 +620,27 @@ class Memory:
     # 删除指定名称的集合
     def delete(self, collection_name: str = DB_COMMAND_HISTORY):
         """
-        delete: delete the memery collections.
+        delete: delete the memery collections, deleting the command history deletes its project shards as well.
         Args:
             collection_name: the name of the collection to delete.
         """
-        return self.client.delete_collection(name=collection_name)
+        existing = {collection.name for collection in self.client.list_collections()}
+        names = [collection_name]
+        if collection_name == DB_COMMAND_HISTORY:
+            names += [name for name in existing if name.startswith(f"{DB_COMMAND_HISTORY}_")]
+
+        for name in names:
+            # 直接清空词法索引文件，不必先从集合重建索引
+            self.indexes.pop(name, None)
+            self.trigrams.pop(name, None)
+            index = LexicalIndex(os.path.join(self.data_path, DB_PATH, DB_LEXICAL_PATH, f"{name}.json"))
+            index.clear()
+            index.save()
+            self.collections.pop(name, None)
+            self.models.pop(name, None)
+            self.checked.discard(name)
+            if name in existing:
+                self.client.delete_collection(name=name)
 
     # 统计指定集合中的记录数量
     def count(self, collection_name: str = DB_COMMAND_HISTORY):
@@ -138,7 +650,8 @@ class Memory:
             collection_name: the name of the collection to count.
         """
 
-        return self.client.get_collection(name=collection_name).count()
+        collection = self.collection(collection_name, create=False)
+        return collection.count() if collection is not None else 0
 
     # 重置所有内存数据（需设置环境变量 ALLOW_RESET 为 TRUE）
     def reset(self):
@@ -146,4 +659,10 @@ class Memory:
         reset: reset the memory.
         Notice: You may need to set the environment variable `ALLOW_RESET` to `TRUE` to enable this function.
         """
+        self.collections = {}
+        self.models = {}
+        self.checked = set()
+        self.indexes = {}
+        self.trigrams = {}
+        shutil.rmtree(os.path.join(self.data_path, DB_PATH, DB_LEXICAL_PATH), ignore_errors=True)
         self.client.reset()
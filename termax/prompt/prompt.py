@@ -1,7 +1,14 @@
 from .memory import Memory
+from .lexical import LexicalIndex
 from termax.utils.metadata import *
-from termax.utils import CONFIG_SEC_OPENAI
+from termax.utils import CONFIG_SEC_OPENAI, TOOL_DOCS_LIMIT, TOOLS_PATH
+from termax.utils.context import files_key, git_key, project_types, read_snapshot
+from termax.utils.tools import read_tools
+from termax.utils.trace import span, traced
+from termax.utils.usage import register_prompt
 
+import os
+import math
 import textwrap
 from datetime import datetime
 
@@ -12,20 +19,156 @@ class Prompt:
         """
         Prompt for Termax: the prompt for the LLMs.
         Args:
-            memory: the memory instance.
+            memory: the memory instance, opened on first use when None.
         """
         # TODO：让系统相关元数据的同步只在初始化时发生
-        self.system_metadata = get_system_metadata()
-        self.path_metadata = get_path_metadata()
+        with span('prompt.metadata'):
+            self.system_metadata = get_system_metadata()
+            self.path_metadata = get_path_metadata()
         # self.command_history = get_command_history()
 
-        # 共享同一个 memory 实例。
-        if memory is None:
-            self.memory = Memory()
-        else:
-            self.memory = memory
+        # 共享同一个 memory 实例；没有传入时在第一次检索时才打开（预测下一条命令等不需要检索的提示词不必加载 chromadb）
+        self._memory = memory
+
+        # 上下文缓存：名称 -> (失效键, 数据)，长时间运行的会话（如 t chat）只刷新发生变化的部分
+        self.cache = {}
+        # 最近一次 gen_commands 检索到的历史相似样例
+        self.samples = None
+
+    # 命令历史（RAG 记忆），第一次使用时打开
+    @property
+    def memory(self):
+        """
+        The command memory, opened on first use when no instance was given.
+        """
+        if self._memory is None:
+            self._memory = Memory()
+        return self._memory
+
+    # 按失效键缓存上下文数据，键不变时直接复用
+    def cached(self, name: str, key, loader):
+        """
+        Return the cached context data while its key is unchanged, reload it otherwise.
+        Args:
+            name: the name of the context data.
+            key: the invalidation key, e.g. the directory and its modification time.
+            loader: the function loading the data.
+        """
+        if name not in self.cache or self.cache[name][0] != key:
+            self.cache[name] = (key, loader())
+        return self.cache[name][1]
+
+    # 刷新随工作目录变化的上下文（目录切换后），PATH 中的命令列表保持不变
+    def refresh(self):
+        """
+        Refresh the context that changed since the last request, e.g. after a `cd`.
+        """
+        self.path_metadata['current_directory'] = os.getcwd()
+
+    # 读取 shell 插件在切换目录时预先计算的上下文快照，失效键与当前状态一致时才使用
+    def snapshot(self, name: str, key: list):
+        """
+        The context data precomputed by `t context refresh` (run by the shell plugins after a cd), if it is still fresh.
+        Args:
+            name: the name of the context data: files, git or project.
+            key: the current invalidation key of the data.
+
+        Returns: the data, None when there is no fresh snapshot.
+        """
+        if 'snapshot' not in self.cache or self.cache['snapshot'][0] != os.getcwd():
+            self.cache['snapshot'] = (os.getcwd(), read_snapshot(os.getcwd()))
+        snapshot = self.cache['snapshot'][1]
+        if snapshot and snapshot.get(f'{name}_key') == key and snapshot.get(name) is not None:
+            return snapshot[name]
+        return None
+
+    # 当前目录的文件列表，目录内容不变（修改时间不变）时复用
+    def files(self):
+        """
+        The file listing of the current directory, reloaded only when the directory changed.
+        """
+        key = files_key(os.getcwd())
+        return self.cached('files', key, lambda: self.snapshot('files', key) or get_file_metadata())
+
+    # 当前仓库的 git 信息，HEAD 与暂存区不变时复用；工作区的改动每次重新读取
+    def git(self):
+        """
+        The git metadata of the current repository, reloaded only after a commit, checkout or staging change. The
+        working tree status is read for every prompt, the unstaged edits change neither HEAD nor the index.
+        """
+        repo = get_context_metadata()['repo']
+        key = git_key(os.getcwd(), repo)
+        metadata = self.cached('git', key, lambda: self.snapshot('git', key) or get_git_metadata())
+        if not repo:
+            return metadata
+        return {**metadata, 'git_status': get_git_status(repo)}
+
+    # 当前项目的类型（python、node、docker 等），由目录与仓库根目录中的标志文件判断
+    def project(self):
+        """
+        The types of the current project, detected from the marker files (pyproject.toml, package.json, ...).
+        """
+        key = files_key(os.getcwd())
+
+        def load():
+            names = [name for items in self.files().values() for name in items]
+            return project_types(names, get_context_metadata()['repo'])
+
+        project = self.cached('project', key, lambda: self.snapshot('project', key) or load())
+        return ', '.join(project) or 'unknown'
+
+    # 检索与请求相关的已安装工具的说明（man 页面与 --help 摘要，由 termax-startup 在 shell 启动时于后台建立索引）
+    def tools(self, text: str, n_results: int = TOOL_DOCS_LIMIT):
+        """
+        The summaries of the installed tools most relevant to the request, from the local tool index.
+        Args:
+            text: the natural language text.
+            n_results: the number of tools to return, 0 disables the retrieval.
+
+        Returns: the list of the tool summaries, best first, empty before the index is built.
+        """
+        if n_results <= 0:
+            return []
+        tools = read_tools()
+
+        def load():
+            # 只索引程序名与一句话描述，程序名出现两次以提高其权重
+            index = LexicalIndex(None)
+            for name, tool in tools.items():
+                if tool.get('doc'):
+                    index.add(name, f"{name} {name} {tool.get('description') or ''}")
+            return index
+
+        key = os.stat(TOOLS_PATH).st_mtime_ns if tools else None
+        results = self.cached('tools', key, load).search(text, n_results * 4)
+        if not results:
+            return []
+        # 常用的程序（shell 历史中的使用次数）优先，只保留与最相关者得分接近的工具
+        ranked = sorted(
+            ((score * (1 + 0.25 * math.log1p(tools[name].get('used', 0))), name) for name, score in results),
+            reverse=True
+        )
+        return [tools[name]['doc'] for score, name in ranked[:n_results] if score >= ranked[0][0] / 2]
+
+    # 统计提示词中各段落的字符数，用量账本据此按段落拆分输入 token
+    def sections(self, files: dict, **extra):
+        """
+        Measure the sections of a prompt, so the token usage can be split by prompt section.
+        Args:
+            files: the file metadata listed in the prompt.
+            extra: the other sections of the prompt, as section name to text.
+        """
+        return {
+            'system': sum(
+                len(str(self.system_metadata[key])) for key in ('platform', 'platform_version', 'architecture')
+            ),
+            'path': len(str(self.path_metadata['user'])) + len(str(self.path_metadata['current_directory'])),
+            'files': sum(len(str(value)) for value in files.values()),
+            **{name: len(value) for name, value in extra.items()}
+        }
 
     # 生成命令建议提示词，根据环境和历史信息生成 LLM 输入
+    @traced('prompt.gen_suggestions')
     def gen_suggestions(self, primary: str, model: str = CONFIG_SEC_OPENAI):
         """
         [Prompt] Generate the suggestions based on the environment and the history.
@@ -33,18 +176,21 @@ class Prompt:
             primary: the primary data source, could be git or docker.
             model: the model to use, default is OpenAI.
         """
-        if primary == 'git':
-            primary_data = "\n".join(
-                f"{index + 1}. {key}: {value}" for index, (key, value) in enumerate(get_git_metadata().items()))
-        elif primary == 'docker':
-            primary_data = "\n".join(
-                f"{index + 1}. {key}: {value}" for index, (key, value) in enumerate(get_docker_metadata().items()))
-        else:
-            primary_data = 'No primary data source available'
+        with span(f'prompt.{primary}'):
+            if primary == 'git':
+                primary_data = "\n".join(
+                    f"{index + 1}. {key}: {value}" for index, (key, value) in enumerate(self.git().items()))
+            elif primary == 'docker':
+                primary_data = "\n".join(
+                    f"{index + 1}. {key}: {value}" for index, (key, value) in enumerate(get_docker_metadata().items()))
+            else:
+                primary_data = 'No primary data source available'
 
-        files = get_file_metadata()
+        with span('prompt.files'):
+            files = self.files()
+            project = self.project()
         if model == CONFIG_SEC_OPENAI:
-            return textwrap.dedent(
+            prompt = textwrap.dedent(
                 f"""\
                 You are an shell expert, you need to assist user to infer the next command based on
                  user's given intent description.
@@ -63,6 +209,7 @@ class Prompt:
                 4. Directories under the current directory: {files['directory']}
                 5. Invisible files under the current directory: {files['invisible_files']}
                 6. Invisible directories under the current directory: {files['invisible_directory']}
+                7. Project type: {project}
                 
                 [INFORMATION] The current time: {datetime.now().isoformat()}
 
@@ -80,7 +227,7 @@ class Prompt:
             )
         else:
             # TODO：添加更多模型专用的 prompt
-            return textwrap.dedent(
+            prompt = textwrap.dedent(
                 f"""\
                 You are an shell expert, you need to assist user to infer the next command based on
                  user's given intent description.
@@ -99,6 +246,7 @@ class Prompt:
                 4. Directories under the current directory: {files['directory']}
                 5. Invisible files under the current directory: {files['invisible_files']}
                 6. Invisible directories under the current directory: {files['invisible_directory']}
+                7. Project type: {project}
                 
                 [INFORMATION] The current time: {datetime.now().isoformat()}
 
@@ -115,6 +263,75 @@ class Prompt:
                 """
             )
 
+        return register_prompt(prompt, 'suggestion', self.sections(files, primary=primary_data))
+
+    # 生成下一条命令的预测提示词：最近的历史、上一条命令的退出码与当前目录的上下文，由 shell 插件在后台预取
+    @traced('prompt.gen_prefetch')
+    def gen_prefetch(self, history: list, last_command: str, exit_code: int):
+        """
+        [Prompt] Predict the next command right after a command finished, without an intent description.
+        Args:
+            history: the recent shell commands, the oldest first.
+            last_command: the command that just finished.
+            exit_code: the exit code of the last command.
+        """
+        with span('prompt.files'):
+            files = self.files()
+            project = self.project()
+        # 历史命令逐行列出，并与模板保持相同的缩进，使 dedent 仍然生效
+        history_data = f"\n{' ' * 12}".join(
+            f"{index + 1}. {command}" for index, command in enumerate(history)
+        ) or 'No history available'
+        prompt = textwrap.dedent(
+            f"""\
+            You are an shell expert, you need to predict the next command the user is most likely to run.
+
+            [INFORMATION] The user's current system information:
+
+            1. OS: {self.system_metadata['platform']}
+            2. OS Version: {self.system_metadata['platform_version']}
+            3. Architecture: {self.system_metadata['architecture']}
+
+            [INFORMATION] The user's current PATH information:
+
+            1. User: {self.path_metadata['user']}
+            2. Current PATH: {self.path_metadata['current_directory']}
+            3. Files under the current directory: {files['files']}
+            4. Directories under the current directory: {files['directory']}
+            5. Project type: {project}
+
+            [INFORMATION] The recent commands, the oldest first:
+            {history_data}
+
+            [INFORMATION] The last command: {last_command}
+            [INFORMATION] The exit code of the last command: {exit_code}
+
+            Here are some rules you need to follow:
+            1. Please provide only one shell command as the format below without any description.
+            2. If the last command failed, prefer the command fixing it.
+            3. Ensure the output is a valid shell command.
+
+            The output shell commands is (please replace the `{{commands}}` with the actual commands):
+
+            Commands: ${{commands}}
+            """
+        )
+
+        return register_prompt(prompt, 'suggestion', self.sections(files, history=history_data))
+
+    # 生成命令未通过本地预检时的修复请求，附上具体的错误信息，而不是盲目重试
+    def repair_commands(self, command: str, errors: list, text: str = ""):
+        """
+        [Prompt] Ask to fix a generated command that failed the pre-flight checks.
+        Args:
+            command: the generated command.
+            errors: the errors found by the pre-flight checks.
+            text: the natural language text, when it is not already in the conversation.
+        """
+        details = "\n".join(f"- {error}" for error in errors)
+        request = f"The command `{command}` does not work here:\n{details}\nPlease fix it."
+        return f"{text}\n\n{request}" if text else request
+
     # 生成命令解释提示词，用于让 LLM 解释 shell 命令
     def explain_commands(self, model: str = CONFIG_SEC_OPENAI):
         """
@@ -123,24 +340,40 @@ class Prompt:
             model: the model to use, default is OpenAI.
         """
         if model == CONFIG_SEC_OPENAI:
-            return f"Help me describe this command:"
+            prompt = f"Help me describe this command:"
         else:
             # TODO：添加更多模型专用的 prompt
-            return f"Help me describe this command:"
+            prompt = f"Help me describe this command:"
+
+        return register_prompt(prompt, 'description')
+
+    # 生成组合命令各段的解释提示词：只请求缓存中没有的段，每段一句话，按编号返回
+    def explain_segments(self):
+        """
+        [Prompt] Explain the segments of a compound command (its pipeline and `&&` parts), one numbered line each.
+        The numbered segments are sent after the prompt.
+        """
+        prompt = ("Help me describe each of these shell commands in one sentence, "
+                  "as a numbered list in the same order, one line per command:\n")
+        return register_prompt(prompt, 'description')
 
     # 生成命令转换提示词，将自然语言转为 shell 命令，并结合历史相似样例
-    def gen_commands(self, text: str, model: str = CONFIG_SEC_OPENAI):
+    @traced('prompt.gen_commands')
+    def gen_commands(self, text: str, model: str = CONFIG_SEC_OPENAI, tools: int = TOOL_DOCS_LIMIT):
         """
         [Prompt] Convert the natural language text to the commands.
         Args:
             text: the natural language text.
             model: the model to use, default is OpenAI.
+            tools: the number of relevant installed tools to describe, 0 disables the tool information.
         """
         # 查询历史数据库以获取相似样例
         samples = self.memory.query([text])
+        # 保留样例，用于对候选命令排序
+        self.samples = samples
         metadatas = samples['metadatas'][0]
         documents = samples['documents'][0]
-        distances = samples['distances'][0]
+        scores = samples['scores'][0]
 
         # 构造一个包含样例的人类可读字符串
         sample_string = ""
@@ -148,14 +381,23 @@ class Prompt:
             sample_string += f"""
             User Input: {documents[i]}
             Generated Commands: {metadatas[i]['response']}
-            Distance Score: {distances[i]}
+            Relevance Score: {scores[i]:.3f}
+            Times Used: {metadatas[i].get('count', 1)}
             Date: {metadatas[i]['created_at']}\n
             """
 
+        # 相关工具的用法与选项，每行与模板保持相同的缩进
+        with span('prompt.tools'):
+            tool_string = f"\n{' ' * 16}".join(
+                line for doc in self.tools(text, tools) for line in doc.splitlines()
+            ) or 'No tool information available'
+
         # 刷新元数据
-        files = get_file_metadata()
+        with span('prompt.files'):
+            files = self.files()
+            project = self.project()
         if model == CONFIG_SEC_OPENAI:
-            return textwrap.dedent(
+            prompt = textwrap.dedent(
                 f"""\
                 You are an shell expert, you can convert natural language text from user to shell commands.
                 
@@ -168,6 +410,7 @@ class Prompt:
                 1. The commands should be able to run on the current system according to the system information.
                 2. The files in the commands should be available in the path, according to the path information.
                 3. The CLI application should be installed in the system (check the path information).
+                4. Use the options of the tools as described in the tool information.
 
                 Here are some information you may need to know:
                 
@@ -183,7 +426,11 @@ class Prompt:
                 4. Directories under the current directory: {files['directory']}
                 5. Invisible files under the current directory: {files['invisible_files']}
                 6. Invisible directories under the current directory: {files['invisible_directory']}
-    
+                7. Project type: {project}
+
+                [INFORMATION] The relevant installed tools:
+                {tool_string}
+
                 Here are some similar commands generated before:
                 {sample_string}
 
@@ -194,7 +441,7 @@ class Prompt:
             )
         else:
             # TODO：添加更多模型专用的 prompt
-            return textwrap.dedent(
+            prompt = textwrap.dedent(
                 f"""\
                 You are an shell expert, you can convert natural language text from user to shell commands.
                 
@@ -207,6 +454,7 @@ class Prompt:
                 1. The commands should be able to run on the current system according to the system information.
                 2. The files in the commands should be available in the path, according to the path information.
                 3. The CLI application should be installed in the system (check the path information).
+                4. Use the options of the tools as described in the tool information.
 
                 Here are some information you may need to know:
                 
@@ -222,7 +470,11 @@ class Prompt:
                 4. Directories under the current directory: {files['directory']}
                 5. Invisible files under the current directory: {files['invisible_files']}
                 6. Invisible directories under the current directory: {files['invisible_directory']}
-                
+                7. Project type: {project}
+
+                [INFORMATION] The relevant installed tools:
+                {tool_string}
+
                 Here are some similar commands generated before:
                 {sample_string}
                 
@@ -231,3 +483,5 @@ class Prompt:
                 Commands: ${{commands}}
                 """
             )
+
+        return register_prompt(prompt, 'command', self.sections(files, samples=sample_string, tools=tool_string))
@@ -1,6 +1,8 @@
 import re
 from urllib.parse import urlparse
 
+from termax.utils.trace import traced
+
 
 # 从 markdown 文本中提取所有代码块，并用分隔符拼接
 def extract_code_from_markdown(markdown_text, separator="\n\n"):
@@ -17,6 +19,7 @@ def extract_code_from_markdown(markdown_text, separator="\n\n"):
 
 
 # 从输出文本中提取 shell 命令，支持多种格式
+@traced('parse')
 def extract_shell_commands(output):
     commands_start = "Commands: "
     commands_index = output.find(commands_start)
@@ -104,3 +107,84 @@ def is_url(string):
         return all([result.scheme, result.netloc])
     except ValueError:
         return False
+
+
+# 启发式地判断用户请求是否复杂（多步骤、条件/循环、文本处理或脚本），复杂请求改用更强的模型
+COMPLEX_PATTERNS = [
+    r"\b(and then|then|after that|afterwards|finally|followed by)\b",
+    r"\b(if|unless|otherwise|only when|only if|until|while)\b",
+    r"\b(for each|for every|each of|every|all of the|recursively|loop|iterate)\b",
+    r"\b(regex|regular expression|awk|sed|jq|xargs|pipe|parse|extract|replace|rename|convert|cron|schedule)\b",
+    r"\b(script|function|retry|parallel|concurrent|in background|notify)\b",
+    r"[|;&><]",
+]
+
+
+def is_complex(text, threshold=2):
+    """
+    判断用户请求是否复杂。
+
+    参数:
+    - text (str): 用户输入的请求。
+    - threshold (int): 判定为复杂所需的特征数。
+
+    返回:
+    - bool: 请求复杂返回 True，否则返回 False。
+    """
+    text = text.lower()
+    score = sum(1 for pattern in COMPLEX_PATTERNS if re.search(pattern, text))
+    score += len(text.split()) > 25
+    score += len(re.findall(r"['\"`]", text)) >= 4
+    return score >= threshold
+
+
+# 流式回复的增量命令提取：命令完整后即可停止读取剩余的回复
+COMMAND_MARKER_REGEX = re.compile(r"Commands?: ")
+CODE_BLOCK_REGEX = re.compile(r"```(?:[a-zA-Z0-9]+)?\n(.*?)```", re.DOTALL)
+
+
+class CommandStream:
+    """
+    增量地从流式回复中提取命令。命令在以下情况视为完整：
+    - 回复包含 "Command: " / "Commands: "，且命令之后出现了空行（之后通常是解释）；
+    - 回复不含上述标记，且第一个 markdown 代码块已经闭合。
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.done = False
+
+    def feed(self, piece):
+        """
+        追加一段流式回复。
+
+        参数:
+        - piece (str): 新收到的文本片段。
+
+        返回:
+        - bool: 命令已经完整返回 True，否则返回 False。
+        """
+        if not self.done:
+            self.text += piece or ""
+            self.done = self.end() is not None
+        return self.done
+
+    def end(self):
+        """
+        命令完整时回复中命令的结束位置，尚未完整时返回 None。
+        """
+        marker = COMMAND_MARKER_REGEX.search(self.text)
+        if marker:
+            end = self.text.find("\n\n", marker.end())
+            return end if end >= 0 and self.text[marker.end():end].strip() else None
+
+        block = CODE_BLOCK_REGEX.search(self.text)
+        return block.end() if block else None
+
+    @property
+    def command(self):
+        """
+        当前提取到的命令。
+        """
+        end = self.end()
+        return extract_shell_commands(self.text if end is None else self.text[:end])
@@ -0,0 +1,67 @@
+# termax.startup
+# Shell 插件在 shell 启动时于后台运行的入口：先读取配置，只做配置需要的事情，不导入交互式命令行（click、rich）。
+# 配置的平台（platform 或 platforms）中有 Ollama 时预加载模型；tool_docs 大于 0 时更新已安装工具的说明索引。
+
+import os
+import sys
+
+from termax.utils.config import Config, CONFIG_PATH
+from termax.utils.const import CONFIG_SEC_GENERAL, CONFIG_SEC_OLLAMA, TOOL_DOCS_LIMIT, TOOL_HELP_OFF, \
+    TOOL_HELP_LIST
+
+
+# 配置中参与请求的平台：首选平台与路由的平台
+def configured_platforms(config_dict):
+    """
+    The platforms the requests may go to: the preferred platform and the routed ones.
+    Args:
+        config_dict: the configuration snapshot.
+
+    Returns: the set of platform names.
+    """
+    platforms = {config_dict.value(CONFIG_SEC_GENERAL, 'platform')}
+    platforms.update(
+        name.strip() for name in config_dict.value(CONFIG_SEC_GENERAL, 'platforms', '').split(',') if name.strip()
+    )
+    return platforms - {None}
+
+
+# 启动主函数：termax-startup
+def main(argv: list = None):
+    """
+    Run the shell start-up tasks the configuration asks for, in the background of a new shell.
+    Args:
+        argv: the command line arguments, unused.
+
+    Returns: the exit code, 0 when there was nothing to do or the tasks succeeded, 1 otherwise.
+    """
+    if not os.path.exists(CONFIG_PATH):
+        return 0
+    config_dict = Config().read()
+    status = 0
+    if CONFIG_SEC_OLLAMA in configured_platforms(config_dict):
+        from termax.cli.utils import load_model
+        try:
+            model, _ = load_model(config_dict)
+            model.warmup()
+        except Exception as e:
+            print(f"Failed to warm up the model: {e}", file=sys.stderr)
+            status = 1
+
+    # the tool summaries are only read when they are added to the command prompts
+    try:
+        tool_docs = config_dict.integer(CONFIG_SEC_GENERAL, 'tool_docs', TOOL_DOCS_LIMIT)
+        run_help_for = config_dict.value(CONFIG_SEC_GENERAL, 'tool_help', TOOL_HELP_OFF)
+        if run_help_for not in TOOL_HELP_LIST:
+            raise ValueError(f"Invalid tool_help: {run_help_for}, should be one of {', '.join(TOOL_HELP_LIST)}.")
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if tool_docs > 0:
+        from termax.utils.tools import refresh_tools, history_usage
+        refresh_tools(history_usage(), run_help_for=run_help_for)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
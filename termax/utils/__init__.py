@@ -1,4 +1,13 @@
 from .const import *
 from .config import *
+from .store import *
+from .trace import *
+from .usage import *
+from .cassette import *
+from .command import *
 from .metadata import *
+from .context import *
+from .prefetch import *
+from .tools import *
+from .explain import *
 from .qa import *
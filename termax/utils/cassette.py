@@ -0,0 +1,102 @@
+import time
+import json
+import hashlib
+
+from .const import CASSETTE_RECORD, CASSETTE_REPLAY
+from .store import append_jsonl, iter_jsonl
+
+
+class CassetteMiss(KeyError):
+    """
+    CassetteMiss：回放模式下，磁带中找不到与请求匹配的记录。
+    """
+
+
+class Cassette:
+    """
+    Cassette：记录与回放大模型请求的磁带。记录模式下把每次请求（消息、参数）与原始回复、耗时追加到 JSONL 文件；
+    回放模式下所有模型后端都直接从磁带取回复，不访问网络。
+    """
+
+    def __init__(self, path: str, mode: str = CASSETTE_REPLAY, latency: str = 'recorded'):
+        """
+        参数:
+            path: 磁带文件路径（JSONL）。
+            mode: record 或 replay。
+            latency: 回放时模拟的延迟，'recorded' 表示按记录的耗时，数字表示固定秒数，'0' 表示不等待。
+        """
+        if mode not in (CASSETTE_RECORD, CASSETTE_REPLAY):
+            raise ValueError(f"Cassette mode {mode} not supported, use {CASSETTE_RECORD} or {CASSETTE_REPLAY}.")
+
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.by_key = {}
+        self.by_text = {}
+        if mode == CASSETTE_REPLAY:
+            for entry in iter_jsonl(path):
+                self.by_key.setdefault(entry['key'], []).append(entry)
+                self.by_text.setdefault((entry['kind'], self.text(entry['request']['messages'])), []).append(entry)
+
+    @staticmethod
+    def key(provider: str, model: str, messages: list, params: dict):
+        """
+        key：请求的指纹，由平台、模型、消息与参数决定。
+        """
+        payload = json.dumps([provider, model, messages, params], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def text(messages: list):
+        """
+        text：请求中最后一条用户消息，用于提示词变化（目录、历史等）时的宽松匹配。
+        """
+        for message in reversed(messages):
+            if message['role'] == 'user':
+                return message['content']
+        return ''
+
+    def play(self, model, kind: str, messages: list, params: dict, send, version: str = None):
+        """
+        play：通过磁带完成一次请求。记录模式下调用 send 并保存结果，回放模式下返回匹配的记录。
+
+        参数:
+            model: 发起请求的模型实例。
+            kind: 调用类型（command / suggestion / description）。
+            messages: 对话消息列表。
+            params: 本次请求的参数。
+            send: 实际向平台发送请求的函数，返回回复字典。
+            version: 本次请求实际使用的模型版本，默认为模型实例的版本。
+
+        返回值：回复字典（text / function_call）。
+        """
+        params = {**model.parameters, **params}
+        version = version or model.version
+        key = self.key(model.model_type, version, messages, params)
+
+        if self.mode == CASSETTE_RECORD:
+            start = time.perf_counter()
+            response = send()
+            append_jsonl(self.path, {
+                'key': key,
+                'time': time.time(),
+                'provider': model.model_type,
+                'model': version,
+                'kind': kind,
+                'request': {'messages': messages, 'params': params},
+                'response': response,
+                'usage': model.usage,
+                'latency': round(time.perf_counter() - start, 4)
+            })
+            return response
+
+        # 优先精确匹配，其次匹配同类型、同用户输入的记录；同一请求被记录多次时按顺序依次回放
+        entries = self.by_key.get(key) or self.by_text.get((kind, self.text(messages)))
+        if not entries:
+            raise CassetteMiss(f"no recorded {kind} response for: {self.text(messages)[:80]!r}")
+        entry = entries.pop(0) if len(entries) > 1 else entries[0]
+
+        delay = entry['latency'] if self.latency == 'recorded' else float(self.latency)
+        if delay > 0:
+            time.sleep(delay)
+        return entry['response']
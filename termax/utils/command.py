@@ -0,0 +1,515 @@
+import os
+import re
+import sys
+import shlex
+import shutil
+import subprocess
+
+from .config import PATH_INDEX_PATH
+from .store import read_json, write_json
+
+# 位于真正的可执行程序之前的前缀命令
+COMMAND_PREFIXES = {
+    'sudo', 'time', 'nohup', 'exec', 'env', 'command', 'builtin', 'nice', 'xargs', 'watch', 'timeout'
+}
+# 前缀命令中带值的选项，选项之后的参数是它的值而不是程序名（如 sudo -u root ls）
+PREFIX_OPTIONS = {
+    'sudo': {'-u', '-g', '-h', '-p', '-C', '-D', '-R', '-T', '-U', '-r', '-t', '--user', '--group', '--host',
+             '--prompt', '--close-from', '--chdir', '--chroot', '--command-timeout', '--other-user', '--role',
+             '--type'},
+    'env': {'-u', '-C', '-S', '--unset', '--chdir', '--split-string'},
+    'nice': {'-n', '--adjustment'},
+    'timeout': {'-s', '-k', '--signal', '--kill-after'},
+    'xargs': {'-I', '-L', '-P', '-a', '-d', '-E', '-n', '-s', '--arg-file', '--delimiter', '--max-args', '--max-procs'},
+    'watch': {'-n', '--interval'},
+}
+# 前缀命令在程序名之前的位置参数个数（如 timeout 5 curl ... 中的时长）
+PREFIX_ARGUMENTS = {'timeout': 1}
+ASSIGNMENT_REGEX = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*=')
+# 一个不含引号、转义、括号与分隔符的词，用于识别 case / esac 等关键字
+WORD_REGEX = re.compile(r'[^\s;&|()<>{}\'"`\\$]+')
+# 之后仍是命令位置的关键字（如 then case ...）
+COMMAND_KEYWORDS = {'if', 'then', 'else', 'elif', 'while', 'until', 'do', '!', 'time'}
+# 一段命令开头不属于命令本身的关键字（if ...; then cat a; fi 中的 if、then 与 fi）
+LEADING_KEYWORDS_REGEX = re.compile(r'^\s*(if|then|else|elif|while|until|do|fi|done|esac|!)(?=\s|$)')
+# 不执行程序的复合命令的头部（for x in ...、select x in ...、function f）
+HEADER_KEYWORDS = {'for', 'select', 'function'}
+# 重定向：[n|&] 与操作符，之后为目标（同一个词或下一个词），如 2>&1、&> build.log、>out.txt、<<EOF
+REDIRECTION_REGEX = re.compile(r'^(\d*|&)(>>?|<<?<?|>&|<&|>\|)(.*)$')
+# 像路径的参数：每一级都只由文件名字符组成
+PATH_ARGUMENT_REGEX = re.compile(r'^(\.{1,2}/|/)?[\w.\-]+(/[\w.\-]*)*$')
+# 参数中的路径可能尚不存在（由命令创建）或不是本地路径的命令，不检查其参数
+UNCHECKED_COMMANDS = {
+    'mkdir', 'touch', 'tee', 'wget', 'curl', 'git', 'ssh', 'docker', 'kubectl', 'echo', 'printf', 'sed', 'awk', 'grep',
+    'egrep', 'fgrep', 'rg', 'perl', 'jq', 'find', 'tar', 'zip', 'unzip', 'pip', 'npm', 'brew', 'apt', 'apt-get', 'yum'
+}
+# 最后一个参数是目标路径的命令
+DESTINATION_COMMANDS = {'cp', 'mv', 'ln', 'rsync', 'scp', 'install'}
+# 不在 PATH 中的 shell 内建命令与关键字
+SHELL_BUILTINS = {
+    'cd', 'echo', 'export', 'source', '.', 'alias', 'unalias', 'set', 'unset', 'read', 'printf', 'pwd', 'test', '[',
+    '[[', 'type', 'eval', 'exit', 'return', 'shift', 'trap', 'ulimit', 'umask', 'wait', 'jobs', 'fg', 'bg', 'kill',
+    'history', 'for', 'while', 'if', 'until', 'case', 'do', 'done', 'then', 'fi', 'esac', 'function', '{', '}', '(',
+    ')', '!', 'true', 'false', 'local', 'declare', 'let', 'hash', 'pushd', 'popd', 'dirs', 'disown', 'getopts'
+}
+
+
+def split_command(command: str):
+    """
+    split_command：将命令按管道与命令列表拆分为若干简单命令，每个为词法单元列表。
+    基于 split_segments 拆分：子 shell 与命令组展开为其中的命令，case 展开为各分支的命令，
+    去掉 if / then / fi 等关键字、for 等复合命令的头部与重定向（2>&1、&> build.log 等）。
+
+    参数:
+        command: shell 命令。
+
+    返回值：简单命令列表；命令无法解析（如引号或括号不匹配）时抛出 ValueError。
+    """
+    commands = []
+    for segment, _ in split_segments(command):
+        commands.extend(segment_commands(segment))
+    return commands
+
+
+def segment_commands(segment: str):
+    """
+    segment_commands：split_segments 拆分出的一段中的简单命令，见 split_command。
+    """
+    match = LEADING_KEYWORDS_REGEX.match(segment)
+    while match:
+        segment = segment[match.end():]
+        match = LEADING_KEYWORDS_REGEX.match(segment)
+    segment = segment.strip()
+    if not segment or segment.startswith('(('):
+        # 算术求值 (( ... )) 不执行程序
+        return []
+    if segment[0] in '({':
+        # 子 shell 与命令组，之后的重定向不是命令
+        return split_command(segment[1:group_end(segment)])
+    if re.match(r'^case\s', segment):
+        end = segment.rfind('esac')
+        body = segment[:end if end > 0 else len(segment)].split(None, 3)
+        if len(body) < 4 or body[2] != 'in':
+            raise ValueError("Invalid case statement")
+        return [tokens for clause in case_clauses(body[3]) for tokens in split_command(clause)]
+
+    tokens = shlex.split(segment)
+    if tokens and tokens[0] in HEADER_KEYWORDS:
+        return []
+    words, target = [], False
+    for token in tokens:
+        if target:
+            target = False
+            continue
+        match = REDIRECTION_REGEX.match(token)
+        if match:
+            target = not match.group(3)
+            continue
+        words.append(token)
+    return [words] if words else []
+
+
+def group_end(segment: str):
+    """
+    group_end：以 ( 或 { 开头的命令中与之配对的括号的位置，引号中的括号不计。
+
+    参数:
+        segment: 以 ( 或 { 开头的命令。
+
+    返回值：配对括号的下标；括号不匹配时抛出 ValueError。
+    """
+    opening = segment[0]
+    closing = ')' if opening == '(' else '}'
+    depth, index, quote = 0, 0, None
+    while index < len(segment):
+        char = segment[index]
+        if quote:
+            if char == '\\' and quote == '"':
+                index += 1
+            elif char == quote:
+                quote = None
+        elif char == '\\':
+            index += 1
+        elif char in '\'"`':
+            quote = char
+        elif char == opening:
+            depth += 1
+        elif char == closing:
+            depth -= 1
+            if depth == 0:
+                return index
+        index += 1
+    raise ValueError(f"No closing {closing}")
+
+
+def case_clauses(body: str):
+    """
+    case_clauses：case 语句（in 与 esac 之间）各分支的命令原文，去掉各分支的模式（如 a|b)）与 ;; 。
+
+    参数:
+        body: case 语句 in 之后、esac 之前的部分。
+
+    返回值：各分支命令的原文列表。
+    """
+    clauses, start, index, depth, quote, pattern = [], 0, 0, 0, None, True
+    while index < len(body):
+        char = body[index]
+        if quote:
+            if char == '\\' and quote == '"':
+                index += 1
+            elif char == quote:
+                quote = None
+        elif char == '\\':
+            index += 1
+        elif char in '\'"`':
+            quote = char
+        elif pattern:
+            if char == ')':
+                pattern, start = False, index + 1
+        elif char in '()':
+            depth = depth + 1 if char == '(' else max(depth - 1, 0)
+        elif depth == 0 and (body.startswith(';;', index) or body.startswith(';&', index)):
+            clauses.append(body[start:index])
+            pattern = True
+            index += 3 if body.startswith(';;&', index) else 2
+            continue
+        index += 1
+    if not pattern:
+        clauses.append(body[start:])
+    return clauses
+
+
+def split_segments(command: str):
+    """
+    split_segments：将命令按顶层的管道与命令列表分隔符（|、|&、&&、||、;、&）拆分，保留各段的原文。
+    引号、转义、括号、$( ) 与 case ... esac 中的分隔符不拆分。
+
+    参数:
+        command: shell 命令。
+
+    返回值：(段的原文, 其后的分隔符) 列表，最后一段的分隔符通常为空字符串。
+    """
+    segments, start, index, depth, case, quote = [], 0, 0, 0, 0, None
+    # 当前位置是否为命令的开头，只有命令开头的 case / esac 是关键字
+    command_start = True
+    while index < len(command):
+        char = command[index]
+        if quote:
+            if char == '\\' and quote == '"':
+                index += 1
+            elif char == quote:
+                quote = None
+        elif char.isspace():
+            command_start = command_start or char == '\n'
+        elif char == '\\':
+            index += 1
+            command_start = False
+        elif char in '\'"`':
+            quote, command_start = char, False
+        elif char in '()':
+            # case 中模式的 ) 不与 ( 配对
+            if not case:
+                depth = depth + 1 if char == '(' else max(depth - 1, 0)
+            command_start = True
+        elif char in '{}':
+            depth = depth + 1 if char == '{' else max(depth - 1, 0)
+            command_start = True
+        elif depth == 0 and case == 0 and char in '|&;':
+            separator = next(op for op in ('||', '|&', '&&', ';;', '|', '&', ';') if command.startswith(op, index))
+            # 重定向中的 & （如 2>&1、&>）不是分隔符
+            if separator == '&' and (command[index - 1:index] in ('>', '<') or command[index + 1:index + 2] == '>'):
+                index += 1
+                continue
+            if command[start:index].strip():
+                segments.append((command[start:index].strip(), separator))
+            start = index = index + len(separator)
+            command_start = True
+            continue
+        elif char in '|&;':
+            command_start = command[index - 1:index] not in ('>', '<')
+        elif WORD_REGEX.match(command, index):
+            word = WORD_REGEX.match(command, index).group()
+            if command_start and word == 'case':
+                case += 1
+            elif command_start and word == 'esac' and case:
+                case -= 1
+            command_start = command_start and word in COMMAND_KEYWORDS
+            index += len(word)
+            continue
+        else:
+            command_start = False
+        index += 1
+    if command[start:].strip():
+        segments.append((command[start:].strip(), ''))
+    return segments
+
+
+def segment_executable(tokens: list):
+    """
+    segment_executable：一段命令实际执行的程序名，跳过环境变量赋值与 sudo、time 等前缀命令及其选项和选项的值。
+
+    参数:
+        tokens: 一段命令的词法单元。
+
+    返回值：程序名，没有时返回 None。
+    """
+    prefix, value, arguments = None, False, 0
+    for token in tokens:
+        if value:
+            value = False
+        elif ASSIGNMENT_REGEX.match(token):
+            continue
+        elif token in COMMAND_PREFIXES:
+            prefix, arguments = token, PREFIX_ARGUMENTS.get(token, 0)
+        elif token.startswith('-'):
+            value = token in PREFIX_OPTIONS.get(prefix, ())
+        elif arguments:
+            arguments -= 1
+        else:
+            return token
+    return None
+
+
+def command_executables(command: str):
+    """
+    command_executables：命令各段实际执行的程序名列表。
+
+    参数:
+        command: shell 命令。
+
+    返回值：程序名列表；命令无法解析时返回 None。
+    """
+    try:
+        segments = split_command(command)
+    except ValueError:
+        return None
+    return [name for name in (segment_executable(tokens) for tokens in segments) if name]
+
+
+def is_self_call(command: str):
+    """
+    is_self_call：命令是否调用了 termax 自身（t / termax）。
+    """
+    return any(name in ('t', 'termax') for name in command_executables(command) or [command.split(' ')[0]])
+
+
+def command_tokens(command: str):
+    """
+    command_tokens：命令的词集合，用于比较命令之间的相似度。
+    """
+    return set(re.findall(r'[\w\-./~]+', command))
+
+
+def score_command(command: str, candidates: list, examples: list, which=None):
+    """
+    score_command：对候选命令打分，分数越高越好。
+
+    评分项：
+    - 可以被解析（引号、括号匹配）；
+    - 各段的程序可以在 PATH 中找到（或是 shell 内建命令）；
+    - 与历史中相似请求的命令一致（词集合的 Jaccard 相似度）；
+    - 与其他候选一致（多个候选给出相同命令时更可信）。
+
+    参数:
+        command: 候选命令。
+        candidates: 全部候选命令。
+        examples: 记忆中相似请求对应的命令。
+        which: 查找程序的函数，默认查 PATH 索引。
+
+    返回值：分数；空命令或调用 termax 自身的命令返回 None（不可用）。
+    """
+    if not command or not command.strip() or is_self_call(command):
+        return None
+
+    score = 0.0
+    executables = command_executables(command)
+    if executables is None:
+        score -= 2.0
+    else:
+        score += 2.0
+        if executables:
+            which = which or executable_exists
+            found = sum(1 for name in executables if which(name) or name in SHELL_BUILTINS)
+            score += 2.0 * found / len(executables)
+
+    tokens = command_tokens(command)
+    if examples and tokens:
+        similarities = []
+        for example in examples:
+            example_tokens = command_tokens(example)
+            similarities.append(len(tokens & example_tokens) / len(tokens | example_tokens))
+        score += max(similarities)
+
+    score += 0.5 * (sum(1 for candidate in candidates if candidate == command) - 1)
+    return score
+
+
+def rank_commands(candidates: list, examples: list = None):
+    """
+    rank_commands：按 score_command 对候选命令排序，去掉不可用的候选与重复项。
+
+    参数:
+        candidates: 候选命令列表。
+        examples: 记忆中相似请求对应的命令。
+
+    返回值：从好到差排序的命令列表。
+    """
+    scored = {}
+    for index, command in enumerate(candidates):
+        if command in scored:
+            continue
+        score = score_command(command, candidates, examples or [])
+        if score is not None:
+            scored[command] = (score, -index)
+    return sorted(scored, key=scored.get, reverse=True)
+
+
+# PATH 索引的进程内缓存：(PATH 各目录及其修改时间, 程序名集合)
+_path_index = (None, set())
+
+
+def path_index(path: str = None):
+    """
+    path_index：PATH 中所有可执行程序名的集合。PATH 各目录的修改时间不变时，复用进程内缓存或 PATH_INDEX_PATH 中的索引，
+    不必每次都扫描全部目录。
+
+    参数:
+        path: PATH 字符串，默认为当前环境的 PATH。
+
+    返回值：程序名集合。
+    """
+    global _path_index
+    directories = [directory for directory in (path or os.environ.get('PATH', '')).split(os.pathsep) if directory]
+    key = [[directory, os.stat(directory).st_mtime_ns if os.path.isdir(directory) else None]
+           for directory in directories]
+    if _path_index[0] == key:
+        return _path_index[1]
+
+    cached = read_json(PATH_INDEX_PATH, {})
+    if cached.get('key') == key:
+        names = set(cached['names'])
+    else:
+        names = set()
+        for directory, mtime in key:
+            if mtime is None:
+                continue
+            try:
+                for entry in os.scandir(directory):
+                    if entry.is_file() and os.access(entry.path, os.X_OK):
+                        names.add(entry.name)
+                        if sys.platform == 'win32':
+                            names.add(os.path.splitext(entry.name)[0])
+            except OSError:
+                continue
+        try:
+            write_json(PATH_INDEX_PATH, {'key': key, 'names': sorted(names)})
+        except OSError:
+            pass
+    _path_index = (key, names)
+    return names
+
+
+def executable_exists(name: str):
+    """
+    executable_exists：程序是否可以执行：PATH 中的程序名，或存在的可执行文件路径。
+    """
+    if '/' in name:
+        return os.path.isfile(name) and os.access(name, os.X_OK)
+    return name in path_index()
+
+
+def check_syntax(command: str, shell: str = None):
+    """
+    check_syntax：检查命令的 shell 语法。系统中有 bash / zsh 时用 `-n` 只解析不执行，否则用 Python 的词法分析检查引号是否匹配。
+
+    参数:
+        command: shell 命令。
+        shell: 检查所用的 shell，默认为 $SHELL。
+
+    返回值：错误信息，语法正确时返回 None。
+    """
+    shell = shell or os.path.basename(os.environ.get('SHELL', ''))
+    if shell in ('bash', 'zsh') and shutil.which(shell):
+        try:
+            result = subprocess.run(
+                [shell, '-n', '-c', command], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, timeout=2
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        if result.returncode != 0:
+            return result.stderr.strip() or f"{shell}: syntax error"
+        return None
+
+    try:
+        split_command(command)
+    except ValueError as e:
+        return f"syntax error: {e}"
+    return None
+
+
+def missing_paths(segments: list, listing: set):
+    """
+    missing_paths：命令参数中引用、但不存在的文件路径。相对路径先按当前目录的文件列表检查，其余路径检查是否存在；
+    会创建路径的命令（mkdir、重定向的输出文件、cp 的目标等）与参数是模式的命令（grep、sed 等）不检查。
+
+    参数:
+        segments: split_command 拆分出的命令段。
+        listing: 当前目录下的文件与目录名。
+
+    返回值：不存在的路径列表。
+    """
+    missing = []
+    for tokens in segments:
+        name = segment_executable(tokens)
+        if name is None or name in UNCHECKED_COMMANDS:
+            continue
+        arguments = tokens[tokens.index(name) + 1:]
+        if name in DESTINATION_COMMANDS:
+            arguments = arguments[:-1]
+
+        for token in arguments:
+            if token.startswith('-') or '/' not in token or not PATH_ARGUMENT_REGEX.match(token):
+                continue
+            if token.startswith('/') or token.startswith('../'):
+                exists = os.path.exists(token)
+            else:
+                relative = token[2:] if token.startswith('./') else token
+                # 第一级按文件列表检查，更深的路径才需要访问文件系统
+                exists = relative == '' or relative.split('/')[0] in listing and (
+                    '/' not in relative.rstrip('/') or os.path.exists(relative))
+            if not exists:
+                missing.append(token)
+    return missing
+
+
+def validate_command(command: str, files: dict = None, shell: str = None):
+    """
+    validate_command：在展示或执行之前对生成的命令做本地预检：shell 语法、各段程序是否在 PATH 中、引用的文件是否存在。
+
+    参数:
+        command: 生成的命令。
+        files: 当前目录的文件信息（get_file_metadata 的结果），默认直接列出当前目录。
+        shell: 检查语法所用的 shell，默认为 $SHELL。
+
+    返回值：错误信息列表，通过检查时为空。
+    """
+    error = check_syntax(command, shell)
+    if error:
+        return [error]
+    try:
+        segments = split_command(command)
+    except ValueError as e:
+        return [f"syntax error: {e}"]
+
+    errors = []
+    for tokens in segments:
+        name = segment_executable(tokens)
+        if name and name not in SHELL_BUILTINS and not executable_exists(name):
+            errors.append(f"command not found: {name}")
+
+    if files is None:
+        listing = set(os.listdir(os.getcwd()))
+    else:
+        listing = {name for names in files.values() for name in names}
+    errors.extend(f"no such file or directory: {path}" for path in missing_paths(segments, listing))
+    return errors
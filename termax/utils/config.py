@@ -3,40 +3,167 @@ import configparser
 from pathlib import Path
 
 from termax.utils.const import *
+from termax.utils.trace import span
 
 CONFIG_HOME = os.path.join(str(Path.home()), ".termax")
 CONFIG_PATH = os.path.join(CONFIG_HOME, "config")
+TRACE_PATH = os.path.join(CONFIG_HOME, "trace.jsonl")
+USAGE_PATH = os.path.join(CONFIG_HOME, "usage.jsonl")
+ROUTING_PATH = os.path.join(CONFIG_HOME, "routing.json")
+CHAT_HISTORY_PATH = os.path.join(CONFIG_HOME, "chat_history")
+PATH_INDEX_PATH = os.path.join(CONFIG_HOME, "path_index.json")
+CONTEXT_PATH = os.path.join(CONFIG_HOME, "context")
+PREFETCH_PATH = os.path.join(CONFIG_HOME, "prefetch.json")
+TOOLS_PATH = os.path.join(CONFIG_HOME, "tools.json")
+EXPLANATIONS_PATH = os.path.join(CONFIG_HOME, "explanations.json")
+
+
+# 可以用环境变量覆盖的配置节：通用配置与各平台
+CONFIG_SECTIONS = [CONFIG_SEC_GENERAL] + [name.lower() for name in CONFIG_LLM_LIST]
+# 布尔选项接受的取值
+BOOLEAN_STATES = configparser.ConfigParser.BOOLEAN_STATES
+
+# 配置快照的进程内缓存：(配置文件路径、修改时间与大小及环境变量覆盖, 快照)
+_snapshot = (None, None)
+# 配置目录每个进程只需创建一次
+_home_ready = False
+
+
+def env_overrides():
+    """
+    env_overrides：环境变量中的配置覆盖项，形如 TERMAX_<节>_<选项>，如 TERMAX_GENERAL_PLATFORM=ollama、
+    TERMAX_OPENAI_MODEL=gpt-4o；节名中的 - 写作 _（TERMAX_OPENAI_COMPATIBLE_BASE_URL）。
+
+    返回值：(节, 选项, 值) 的元组，按节与选项排序。
+    """
+    # 较长的节名优先匹配，openai_compatible 不会被当作 openai
+    prefixes = sorted(
+        ((f"{CONFIG_ENV_PREFIX}{section.replace('-', '_').upper()}_", section) for section in CONFIG_SECTIONS),
+        key=lambda item: len(item[0]), reverse=True
+    )
+    overrides = []
+    for name, value in os.environ.items():
+        if not name.startswith(CONFIG_ENV_PREFIX):
+            continue
+        for prefix, section in prefixes:
+            if name.startswith(prefix) and len(name) > len(prefix):
+                overrides.append((section, name[len(prefix):].lower(), value))
+                break
+    return tuple(sorted(overrides))
+
+
+class ConfigSnapshot(dict):
+    """
+    ConfigSnapshot：解析后的配置（节 -> 选项 -> 字符串），提供带类型转换与校验的读取方法，
+    空字符串与 "None" 视为未设置。
+    """
+
+    def value(self, section: str, option: str, default=None):
+        """
+        value：选项的字符串值，未设置时返回默认值。
+        """
+        value = self.get(section, {}).get(option)
+        return default if value is None or value.strip() in ('', 'None') else value
+
+    def boolean(self, section: str, option: str, default: bool = False):
+        """
+        boolean：布尔选项（True / False、yes / no、on / off、1 / 0），取值无效时抛出 ValueError。
+        """
+        value = self.value(section, option)
+        if value is None:
+            return default
+        if value.strip().lower() not in BOOLEAN_STATES:
+            raise ValueError(f"Invalid boolean value for [{section}] {option}: {value}")
+        return BOOLEAN_STATES[value.strip().lower()]
+
+    def integer(self, section: str, option: str, default: int = None):
+        """
+        integer：整数选项，取值无效时抛出 ValueError。
+        """
+        return self.convert(section, option, int, default)
+
+    def number(self, section: str, option: str, default: float = None):
+        """
+        number：浮点数选项，取值无效时抛出 ValueError。
+        """
+        return self.convert(section, option, float, default)
+
+    def convert(self, section: str, option: str, cast, default=None):
+        """
+        convert：按 cast 转换选项的值，未设置时返回默认值，转换失败时抛出 ValueError。
+        """
+        value = self.value(section, option)
+        if value is None:
+            return default
+        try:
+            return cast(value.strip())
+        except ValueError:
+            raise ValueError(f"Invalid {cast.__name__} value for [{section}] {option}: {value}") from None
+
+    def copy(self):
+        """
+        copy：快照的副本，修改副本不会影响缓存。
+        """
+        return ConfigSnapshot({section: dict(options) for section, options in self.items()})
 
 
 class Config:
     """
     Config：Termax 的整体系统配置类。
+    配置文件在每个进程中只解析一次：快照按文件的修改时间与环境变量覆盖缓存，文件改变后下一次 read 才重新解析，
+    长时间运行的进程（守护进程、批处理）因此可以热加载配置，而不必每个请求都重新读取。
     """
 
     def __init__(self):
+        global _home_ready
         self.home = CONFIG_HOME
-        Path(self.home).mkdir(parents=True, exist_ok=True)
+        if not _home_ready:
+            Path(self.home).mkdir(parents=True, exist_ok=True)
+            _home_ready = True
 
         self.config_path = CONFIG_PATH
-        self.config = configparser.ConfigParser()
-        self.config.read(self.config_path)
+        self.parser = None
         self.snowflake_auth = None
         self.docker_auth = None
 
-    def read(self):
+    @property
+    def config(self):
+        """
+        config：配置文件的 ConfigParser，第一次使用时解析，用于写入配置。
         """
-        read：读取配置文件。
+        if self.parser is None:
+            self.parser = configparser.ConfigParser()
+            self.parser.read(self.config_path)
+        return self.parser
 
-        返回值：配置字典。
+    def key(self):
         """
-        self.reload_config(CONFIG_PATH)
-        config_dict = {}
+        key：配置快照的失效键：配置文件的路径、修改时间与大小，以及环境变量覆盖。
+        """
+        try:
+            stat = os.stat(self.config_path)
+            return self.config_path, stat.st_mtime_ns, stat.st_size, env_overrides()
+        except OSError:
+            return self.config_path, None, None, env_overrides()
 
-        for section in self.config.sections():
-            options_dict = {option: self.config.get(section, option) for option in self.config.options(section)}
-            config_dict[section] = options_dict
+    def read(self):
+        """
+        read：读取配置。配置文件与环境变量覆盖都没有变化时直接复用进程内的快照。
 
-        return config_dict
+        返回值：配置快照（ConfigSnapshot，节 -> 选项 -> 字符串的字典）。
+        """
+        global _snapshot
+        with span('config.read'):
+            key = self.key()
+            if _snapshot[0] != key:
+                parser = configparser.ConfigParser()
+                parser.read(self.config_path)
+                snapshot = ConfigSnapshot({section: dict(parser.items(section)) for section in parser.sections()})
+                for section, option, value in key[-1]:
+                    snapshot.setdefault(section, {})[option] = value
+                _snapshot = (key, snapshot)
+
+        return _snapshot[1].copy()
 
     def reload_config(self, config_path):
         """
@@ -45,6 +172,7 @@ class Config:
         参数:
             config_path: 新配置文件的路径。
         """
+        self.config_path = config_path
         self.config.read(config_path)
 
     def load_openai_config(self):
@@ -1,7 +1,9 @@
 CONFIG_SEC_GENERAL = 'general'
 CONFIG_SEC_API_KEY = 'api_key'
+CONFIG_ENV_PREFIX = 'TERMAX_'  # TERMAX_<SECTION>_<OPTION> overrides an option of the configuration file.
 CONFIG_LLM_LIST = {  # with the default model.
     'OpenAI': 'gpt-3.5-turbo',
+    'OpenAI-Compatible': 'gpt-3.5-turbo',
     'Ollama': 'llama2',
     'Gemini': 'gemini-pro',
     'Claude': 'claude-3-opus-20240229',
@@ -11,12 +13,61 @@ CONFIG_LLM_LIST = {  # with the default model.
 }
 
 COMMAND_HISTORY_COUNT = 15
+TRACE_SPAN_LIMIT = 2000  # the spans kept in memory by a long-running process (t chat), the oldest are dropped.
+USAGE_LEDGER_LIMIT = 1 << 20  # the usage ledger size (bytes) over which its old days are rolled into daily totals.
+USAGE_RETENTION_DAYS = 30  # the days of usage kept call by call, the older ones are kept as daily totals.
 DB_PATH = 'database'
 DB_COMMAND_HISTORY = 'history'
 DB_SYS_METRICS = 'system'
+DB_QUERY_POOL = 3  # over-fetch factor used before re-ranking the retrieved samples.
+DB_FREQUENCY_WEIGHT = 0.1  # how much the usage count of a command boosts its relevance.
+DB_LEXICAL_PATH = 'lexical'
+DB_PAGE_SIZE = 20
+DB_HNSW_OPTIONS = [  # (option in [general], chromadb collection metadata key, type)
+    ('hnsw_space', 'hnsw:space', str),
+    ('hnsw_construction_ef', 'hnsw:construction_ef', int),
+    ('hnsw_search_ef', 'hnsw:search_ef', int),
+    ('hnsw_m', 'hnsw:M', int),
+]
+DB_LEXICAL_WEIGHT = 0.5  # the weight of the BM25 score when fused with the vector similarity.
+DB_EMBEDDING_KEY = 'termax:embedding'  # the collection metadata key recording the embedding model of its vectors.
+DB_DEFAULT_EMBEDDING = 'default'  # the ChromaDB default model, also assumed for the collections without the key.
+DB_EMBEDDING_BATCH = 100  # the number of documents embedded per request when a collection is re-embedded.
+
+# Retrieval modes
+RETRIEVAL_HYBRID = 'hybrid'
+RETRIEVAL_VECTOR = 'vector'
+RETRIEVAL_LEXICAL = 'lexical'
+
+# Per-task models: the task -> the option of the platform section
+TASK_MODEL_OPTIONS = {
+    'command': 'command_model',
+    'suggestion': 'suggest_model',
+    'description': 'explain_model'
+}
+
+SESSION_TOKEN_BUDGET = 4000  # the estimated tokens of the conversation history kept by a session.
+
+# Structured output: the function returning the shell command, and the JSON answer asked in the JSON-only modes
+SHELL_FUNCTION = 'execute_shell_command'
+JSON_COMMAND_INSTRUCTION = 'Answer only with a JSON object of the form {"shell_command": "<the shell command>"}.'
+
+# Cassette modes
+CASSETTE_RECORD = 'record'
+CASSETTE_REPLAY = 'replay'
+
+# Provider routing
+ROUTING_FASTEST = 'fastest'
+ROUTING_HEDGE = 'hedge'
+ROUTER_WINDOW = 50  # the calls kept per provider/model for the rolling latency and error rate.
+ROUTER_MIN_CALLS = 3  # the calls needed before a provider can be marked as unhealthy.
+ROUTER_MAX_ERROR_RATE = 0.5
+ROUTER_COOLDOWN = 300  # seconds before an unhealthy provider is tried first again.
+ROUTER_HEDGE_DELAY = 3.0  # seconds before hedging when the provider has no latency history yet.
 
 # LLMs
 CONFIG_SEC_OPENAI = 'openai'
+CONFIG_SEC_OPENAI_COMPATIBLE = 'openai-compatible'
 CONFIG_SEC_OLLAMA = 'ollama'
 CONFIG_SEC_GEMINI = 'gemini'
 CONFIG_SEC_CLAUDE = 'claude'
@@ -24,6 +75,74 @@ CONFIG_SEC_MISTRAL = 'mistral'
 CONFIG_SEC_QIANFAN = 'qianfan'
 CONFIG_SEC_QIANWEN = 'qianwen'
 
+# The OpenAI clients: the built-in standard library client, or the openai SDK
+OPENAI_CLIENT_BUILTIN = 'builtin'
+OPENAI_CLIENT_SDK = 'sdk'
+OPENAI_BASE_URL = 'https://api.openai.com/v1'
+OPENAI_TIMEOUT = 60.0
+HTTP_PRECONNECT_WAIT = 1.0  # the seconds a request waits for a pending pre-connection before opening its own.
+
+# The Ollama model options that can be set in the [ollama] section, with their types
+OLLAMA_OPTIONS = {
+    'num_ctx': int,
+    'num_predict': int,
+    'num_thread': int,
+    'num_gpu': int,
+    'temperature': float,
+    'top_k': int,
+    'top_p': float,
+    'repeat_penalty': float,
+    'seed': int
+}
+
+# Directory context snapshots, refreshed by the shell plugins when the directory changes
+CONTEXT_SNAPSHOT_LIMIT = 200  # the snapshots kept, the least recently refreshed ones are removed.
+GIT_STATUS_LIMIT = 20  # the changed files listed in the git context, read fresh for every prompt.
+PROJECT_MARKERS = {  # the file marking a project -> the project type.
+    'pyproject.toml': 'python',
+    'setup.py': 'python',
+    'requirements.txt': 'python',
+    'package.json': 'node',
+    'Cargo.toml': 'rust',
+    'go.mod': 'go',
+    'pom.xml': 'java',
+    'build.gradle': 'java',
+    'Gemfile': 'ruby',
+    'composer.json': 'php',
+    'CMakeLists.txt': 'cmake',
+    'Makefile': 'make',
+    'Dockerfile': 'docker',
+    'docker-compose.yml': 'docker',
+    'compose.yaml': 'docker'
+}
+
+# Next-command prefetch, computed in the background by the shell plugins after each command
+PREFETCH_OFF = 'off'
+PREFETCH_LOCAL = 'local'  # the most frequent successor of the last command in the shell history.
+PREFETCH_MODEL = 'model'  # asked to the suggestion model, with the history, the exit code and the context.
+PREFETCH_LIST = [PREFETCH_OFF, PREFETCH_LOCAL, PREFETCH_MODEL]
+PREFETCH_INTERVAL = 30  # the minimum seconds between two model predictions.
+PREFETCH_TTL = 600  # the seconds a prediction is shown for.
+PREFETCH_HISTORY = 20  # the recent history commands in the prediction prompt.
+
+# Local index of the man page and --help summaries of the tools on PATH, retrieved for the command prompts
+TOOL_DOCS_LIMIT = 3  # the tool summaries added to a command prompt.
+TOOL_DOC_SIZE = 600  # the maximum characters of a tool summary.
+TOOL_REFRESH_BUDGET = 20  # the seconds one `t tools refresh` run spends on summarizing tools.
+TOOL_HELP_OFF = 'off'  # read the man pages only, the default.
+TOOL_HELP_HISTORY = 'history'  # also run `<tool> --help` for the tools without a man page found in the shell history.
+TOOL_HELP_ALL = 'all'  # also run `<tool> --help` for every tool on PATH without a man page.
+TOOL_HELP_LIST = [TOOL_HELP_OFF, TOOL_HELP_HISTORY, TOOL_HELP_ALL]
+TOOL_HELP_TIMEOUT = 2  # the seconds to wait for `man` or `--help` of one tool.
+TOOL_HELP_BYTES = 65536  # the output read from `man` or `--help`.
+TOOL_HELP_EXCLUDED = {  # the tools never run with --help, they may act on it or never exit.
+    't', 'termax', 'termax-complete', 'termax-prefetch', 'termax-startup', 'reboot', 'shutdown', 'halt', 'poweroff',
+    'init', 'telinit', 'yes', 'login', 'su', 'sudo', 'passwd'
+}
+
+# Explanation cache, keyed by the normalized command (or pipeline segment) and the provider/model
+EXPLAIN_CACHE_LIMIT = 2000  # the explanations kept, the least recently used ones are removed.
+
 # Plugins
 PLUGIN_SHELL_ZSH = 'zsh'
 PLUGIN_SHELL_BASH = 'bash'
@@ -0,0 +1,114 @@
+import os
+import time
+import hashlib
+
+from .config import CONTEXT_PATH
+from .const import PROJECT_MARKERS, CONTEXT_SNAPSHOT_LIMIT
+from .store import read_json, write_json
+from .metadata import get_file_metadata, get_git_metadata, get_context_metadata
+
+
+def files_key(cwd: str):
+    """
+    files_key：目录文件列表的失效键：目录路径与修改时间（目录中增删、重命名条目时改变）。
+    """
+    return [cwd, os.stat(cwd).st_mtime_ns]
+
+
+def git_key(cwd: str, repo: str):
+    """
+    git_key：git 信息的失效键：HEAD、暂存区与 HEAD 日志的修改时间（提交、切换分支或暂存后改变）。
+
+    参数:
+        cwd: 当前目录。
+        repo: git 仓库根目录，不在仓库中时为空。
+    """
+    key = [cwd]
+    if repo:
+        for name in ('HEAD', 'index', os.path.join('logs', 'HEAD')):
+            path = os.path.join(repo, '.git', name)
+            key.append(os.stat(path).st_mtime_ns if os.path.exists(path) else None)
+    return key
+
+
+def project_types(names, repo: str = ''):
+    """
+    project_types：根据标志文件（pyproject.toml、package.json、Dockerfile 等）判断项目类型，
+    同时检查当前目录与 git 仓库根目录。
+
+    参数:
+        names: 当前目录下的文件与目录名。
+        repo: git 仓库根目录。
+
+    返回值：项目类型列表，如 ['docker', 'python']。
+    """
+    names = set(names)
+    if repo:
+        try:
+            names |= set(os.listdir(repo))
+        except OSError:
+            pass
+    return sorted({kind for marker, kind in PROJECT_MARKERS.items() if marker in names})
+
+
+def snapshot_path(cwd: str):
+    """
+    snapshot_path：目录上下文快照的文件路径，按目录路径的哈希命名。
+    """
+    return os.path.join(CONTEXT_PATH, f"{hashlib.sha1(cwd.encode('utf-8')).hexdigest()[:16]}.json")
+
+
+def read_snapshot(cwd: str):
+    """
+    read_snapshot：读取目录的上下文快照，是否仍然有效由调用方按失效键判断。
+
+    返回值：快照字典，没有快照时返回 None。
+    """
+    snapshot = read_json(snapshot_path(cwd))
+    return snapshot if isinstance(snapshot, dict) and snapshot.get('path') == cwd else None
+
+
+def refresh_snapshot():
+    """
+    refresh_snapshot：重新计算当前目录的上下文快照（文件列表及其摘要、git 状态、项目类型）并写入 CONTEXT_PATH。
+    由 shell 插件在切换目录后于后台运行（`t context refresh`），生成提示词时不必再同步采集。
+    失效键在采集之前计算，采集期间目录发生的变化会使快照失效，而不会被当作最新状态。
+
+    返回值：快照字典。
+    """
+    cwd = os.getcwd()
+    repo = get_context_metadata()['repo']
+    snapshot = {'path': cwd, 'refreshed_at': time.time(), 'files_key': files_key(cwd), 'git_key': git_key(cwd, repo)}
+
+    files = get_file_metadata()
+    snapshot['files'] = files
+    snapshot['summary'] = {name: len(items) for name, items in files.items()}
+    snapshot['project_key'] = snapshot['files_key']
+    snapshot['project'] = project_types([name for items in files.values() for name in items], repo)
+    try:
+        snapshot['git'] = get_git_metadata()
+    except Exception:
+        # git 不可用（未安装、空仓库等）时不保存，生成提示词时再实时采集
+        snapshot['git'] = None
+
+    write_json(snapshot_path(cwd), snapshot)
+    prune_snapshots()
+    return snapshot
+
+
+def prune_snapshots(limit: int = CONTEXT_SNAPSHOT_LIMIT):
+    """
+    prune_snapshots：快照数量超过上限时，删除最久未刷新的快照。
+    """
+    try:
+        entries = [entry for entry in os.scandir(CONTEXT_PATH) if entry.name.endswith('.json')]
+    except OSError:
+        return
+    if len(entries) <= limit:
+        return
+    entries.sort(key=lambda entry: entry.stat().st_mtime)
+    for entry in entries[:len(entries) - limit]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
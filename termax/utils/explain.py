@@ -0,0 +1,168 @@
+import re
+import time
+import hashlib
+
+from .config import EXPLANATIONS_PATH
+from .const import EXPLAIN_CACHE_LIMIT
+from .store import read_json, write_json
+from .command import split_segments
+
+# 组合命令中各分隔符的含义，用于在本地拼接各段的解释
+SEPARATOR_MEANINGS = {
+    '|': "receives the output of the previous step",
+    '|&': "receives the output and the errors of the previous step",
+    '&&': "runs only if the previous step succeeded",
+    '||': "runs only if the previous step failed",
+    ';': "runs after the previous step",
+    ';;': "runs after the previous step",
+    '&': "runs while the previous step continues in the background"
+}
+# 编号列表的一项，如 "1. ..." 或 "2) ..."
+NUMBERED_REGEX = re.compile(r'^\s*(\d+)[.)]\s*(.+)$')
+
+
+def collapse_whitespace(segment: str):
+    """
+    collapse_whitespace：将引号外的连续空白合并为一个空格，引号（及其类型）、引号内的文字与转义保持原样。
+    """
+    chars, quote, escaped, space = [], None, False, False
+    for char in segment.strip():
+        if not escaped and not quote and char.isspace():
+            space = True
+            continue
+        if space:
+            chars.append(' ')
+            space = False
+        if escaped:
+            escaped = False
+        elif quote:
+            if char == '\\' and quote == '"':
+                escaped = True
+            elif char == quote:
+                quote = None
+        elif char == '\\':
+            escaped = True
+        elif char in '\'"`':
+            quote = char
+        chars.append(char)
+    return "".join(chars)
+
+
+def normalize_command(command: str):
+    """
+    normalize_command：命令的规范形式，用作缓存键：各段只合并引号外的空白，以单个空格连接各段与分隔符。
+    引号的类型保持不变（'$HOME' 与 "$HOME" 含义不同，不会得到相同结果）。
+    """
+    parts = []
+    for segment, separator in split_segments(command):
+        parts.append(collapse_whitespace(segment))
+        parts.append(separator)
+    return " ".join(part for part in parts if part)
+
+
+def assemble_explanation(segments: list, explanations: dict):
+    """
+    assemble_explanation：将组合命令各段的解释按顺序拼接为整条命令的解释，并说明各段之间的关系。
+
+    参数:
+        segments: split_segments 的结果，(段的原文, 其后的分隔符) 列表。
+        explanations: 段的原文 -> 解释；没有解释的段只列出其原文。
+
+    返回值：整条命令的解释。
+    """
+    lines, previous = [], ''
+    for index, (segment, separator) in enumerate(segments):
+        relation = f" ({SEPARATOR_MEANINGS[previous]})" if previous in SEPARATOR_MEANINGS else ''
+        explanation = explanations.get(segment)
+        lines.append(f"{index + 1}. `{segment}`{relation}" + (f": {explanation}" if explanation else ""))
+        previous = separator
+    if previous == '&':
+        lines.append("The last step runs in the background.")
+    return "\n".join(lines)
+
+
+def parse_numbered(text: str, count: int):
+    """
+    parse_numbered：解析模型返回的编号列表（每段命令一项）。
+
+    参数:
+        text: 模型的回复。
+        count: 期望的项数。
+
+    返回值：按编号排列的各项文字；编号不完整（或有空的项）时返回 None。
+    """
+    items = {}
+    for line in (text or '').splitlines():
+        match = NUMBERED_REGEX.match(line)
+        if match and 1 <= int(match.group(1)) <= count and match.group(2).strip():
+            items.setdefault(int(match.group(1)), match.group(2).strip())
+    if len(items) != count:
+        return None
+    return [items[number] for number in range(1, count + 1)]
+
+
+class ExplanationCache:
+    """
+    ExplanationCache：持久化的命令解释缓存，键为解释的类型（整条命令或组合命令中的一段）、平台/模型与规范化的命令。
+    由多段已解释过的命令组成的新命令只需向模型请求未见过的段。
+    """
+
+    def __init__(self, models, path: str = EXPLANATIONS_PATH, limit: int = EXPLAIN_CACHE_LIMIT):
+        """
+        参数:
+            models: 平台与模型，如 openai/gpt-4o，不同模型的解释分开缓存；路由到多个平台时为各平台的模型列表，
+                读取时依次查找，写入时记在 model（默认为第一个，得到回答后设为实际回答的平台与模型）下。
+            path: 缓存文件路径。
+            limit: 缓存的最大条数，超过时删除最久未使用的解释。
+        """
+        self.models = [models] if isinstance(models, str) else list(models)
+        self.model = self.models[0]
+        self.path = path
+        self.limit = limit
+        entries = read_json(path, {})
+        self.entries = entries if isinstance(entries, dict) else {}
+        self.changed = False
+
+    def key(self, kind: str, command: str, model: str = None):
+        """
+        key：缓存键，类型、模型（默认为 model）与规范化命令的哈希。
+        """
+        model = model or self.model
+        return hashlib.sha1(f"{kind}\0{model}\0{normalize_command(command)}".encode('utf-8')).hexdigest()
+
+    def get(self, kind: str, command: str):
+        """
+        get：读取缓存的解释并更新其使用时间。
+
+        参数:
+            kind: command（整条命令）或 segment（组合命令中的一段）。
+            command: 命令。
+
+        返回值：解释，没有缓存时返回 None。
+        """
+        entry = next(filter(None, (self.entries.get(self.key(kind, command, model)) for model in self.models)), None)
+        if not entry:
+            return None
+        entry['used_at'] = time.time()
+        self.changed = True
+        return entry['text']
+
+    def put(self, kind: str, command: str, text: str):
+        """
+        put：缓存一条解释，空的解释（如请求失败）不缓存。
+        """
+        if text:
+            self.entries[self.key(kind, command)] = {'text': text, 'used_at': time.time()}
+            self.changed = True
+
+    def save(self):
+        """
+        save：写回缓存文件，超过上限时删除最久未使用的解释。
+        """
+        if not self.changed:
+            return
+        if len(self.entries) > self.limit:
+            ranked = sorted(self.entries.items(), key=lambda item: item[1].get('used_at', 0), reverse=True)
+            self.entries = dict(ranked[:self.limit])
+        write_json(self.path, self.entries)
+        self.changed = False
@@ -0,0 +1,237 @@
+import json
+import threading
+import http.client
+from urllib.parse import urlsplit
+
+from .const import HTTP_PRECONNECT_WAIT
+
+
+class HTTPError(Exception):
+    """
+    HTTPError：服务端返回了错误状态码。
+    """
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class RateLimitError(HTTPError):
+    """
+    RateLimitError：请求被限流（HTTP 429）。
+    """
+
+
+class ConnectionPool:
+    """
+    ConnectionPool：同一服务端（协议、主机、端口）的空闲 keep-alive 连接，由该服务端的所有客户端共享，
+    如模型的 chat/completions 请求与记忆库的 embeddings 请求。超时时间由取用连接的客户端决定。
+    """
+
+    def __init__(self, scheme: str, host: str, port: int, size: int = 4):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.size = size
+        self.idle = []
+        self.warming = None
+        self.lock = threading.Lock()
+
+    def connect(self, timeout: float):
+        """
+        connect：新建一个（尚未连接的）HTTP / HTTPS 连接。
+
+        参数:
+            timeout: 连接与读取的超时时间（秒）。
+        """
+        if self.scheme == 'https':
+            return http.client.HTTPSConnection(self.host, self.port, timeout=timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+
+    def preconnect(self, timeout: float):
+        """
+        preconnect：在后台线程中提前完成 DNS 解析与 TCP / TLS 握手，建立好的连接放入连接池，供之后的请求直接使用。
+
+        参数:
+            timeout: 握手的超时时间（秒）。
+
+        返回值：后台线程。
+        """
+        def run():
+            connection = self.connect(timeout)
+            try:
+                connection.connect()
+            except OSError:
+                connection.close()
+                return
+            self.release(connection)
+
+        with self.lock:
+            if self.idle or self.warming is not None:
+                return self.warming
+            self.warming = threading.Thread(target=run, daemon=True)
+            self.warming.start()
+            return self.warming
+
+    def acquire(self, timeout: float, wait: float = HTTP_PRECONNECT_WAIT):
+        """
+        acquire：取出一个空闲连接，没有时新建。预连接尚未完成时最多等待 wait 秒，握手已经进行了一部分，比新建连接更快；
+        服务端无法访问时不会为预连接等待整个超时时间。
+
+        参数:
+            timeout: 本次请求的连接与读取超时时间（秒），也应用于取出的空闲连接。
+            wait: 等待预连接的最长时间（秒）。
+        """
+        warming = self.warming
+        if warming is not None:
+            warming.join(min(wait, timeout))
+            self.warming = None
+        with self.lock:
+            connection = self.idle.pop() if self.idle else None
+        if connection is None:
+            return self.connect(timeout)
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+        return connection
+
+    def release(self, connection):
+        """
+        release：把读完响应的连接放回连接池，池满时关闭。
+        """
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append(connection)
+                return
+        connection.close()
+
+    def close(self):
+        """
+        close：关闭所有空闲连接。
+        """
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for connection in idle:
+            connection.close()
+
+
+# 服务端 -> 连接池
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(scheme: str, host: str, port: int):
+    """
+    get_pool：服务端对应的共享连接池。
+    """
+    with _pools_lock:
+        key = (scheme, host, port)
+        if key not in _pools:
+            _pools[key] = ConnectionPool(scheme, host, port)
+        return _pools[key]
+
+
+class HTTPClient:
+    """
+    HTTPClient：基于标准库 http.client 的轻量 JSON 客户端，用于 OpenAI 兼容接口（chat/completions、embeddings）。
+    空闲连接保存在同一服务端共享的连接池中复用（keep-alive），支持超时、预连接与 SSE 流式响应，
+    无需导入 openai SDK 及其依赖。
+    """
+
+    def __init__(self, base_url: str, api_key: str = None, timeout: float = 60.0):
+        """
+        参数:
+            base_url: 接口地址，如 https://api.openai.com/v1。
+            api_key: API key，为空时不发送 Authorization 头。
+            timeout: 连接与读取的超时时间（秒）。
+        """
+        parts = urlsplit(base_url)
+        self.path = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.pool = get_pool(parts.scheme or 'https', parts.hostname, parts.port)
+        self.headers = {'Content-Type': 'application/json', 'Accept': 'application/json', 'Connection': 'keep-alive'}
+        if api_key and api_key != 'None':
+            self.headers['Authorization'] = f"Bearer {api_key}"
+
+    def preconnect(self):
+        """
+        preconnect：在后台提前连接服务端，见 ConnectionPool.preconnect。
+        """
+        return self.pool.preconnect(self.timeout)
+
+    def send(self, path: str, payload: dict, accept: str = 'application/json'):
+        """
+        send：发送 POST 请求，返回连接与响应。复用的空闲连接可能已被服务端关闭，此时换新连接重试一次。
+
+        参数:
+            path: 接口路径，如 /chat/completions。
+            payload: 请求体。
+            accept: Accept 头。
+
+        返回值：(连接, 响应)；状态码为错误时抛出 HTTPError。
+        """
+        body = json.dumps(payload).encode('utf-8')
+        headers = {**self.headers, 'Accept': accept}
+        for attempt in range(2):
+            connection = self.pool.acquire(self.timeout)
+            reused = connection.sock is not None
+            try:
+                connection.request('POST', self.path + path, body=body, headers=headers)
+                response = connection.getresponse()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                connection.close()
+                if not reused or attempt:
+                    raise
+            except Exception:
+                connection.close()
+                raise
+
+        if response.status >= 400:
+            data = response.read()
+            self.pool.release(connection)
+            try:
+                error = json.loads(data).get('error')
+                message = error.get('message', str(error)) if isinstance(error, dict) else str(error)
+            except (ValueError, AttributeError):
+                message = data.decode('utf-8', 'replace')
+            raise (RateLimitError if response.status == 429 else HTTPError)(response.status, message)
+        return connection, response
+
+    def post(self, path: str, payload: dict):
+        """
+        post：发送 JSON 请求并返回解析后的 JSON 响应。
+        """
+        connection, response = self.send(path, payload)
+        try:
+            data = response.read()
+        except Exception:
+            connection.close()
+            raise
+        self.pool.release(connection)
+        return json.loads(data)
+
+    def stream(self, path: str, payload: dict):
+        """
+        stream：发送流式请求，逐个返回服务端推送（SSE）的 JSON 事件，直到 [DONE]。
+        提前结束迭代时关闭连接（响应未读完，连接不能复用）。
+        """
+        connection, response = self.send(path, payload, accept='text/event-stream')
+        finished = False
+        try:
+            for line in response:
+                line = line.decode('utf-8').strip()
+                if not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    break
+                yield json.loads(data)
+            response.read()
+            finished = True
+        finally:
+            if finished:
+                self.pool.release(connection)
+            else:
+                connection.close()
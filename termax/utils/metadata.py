@@ -9,6 +9,8 @@ import platform
 import subprocess
 from datetime import datetime
 
+from .const import GIT_STATUS_LIMIT
+
 
 def get_git_metadata():
     """
@@ -85,6 +87,32 @@ def get_git_metadata():
     }
 
 
+def get_git_status(repo: str, limit: int = GIT_STATUS_LIMIT):
+    """
+    get_git_status：工作区的改动（git status --porcelain），未暂存的修改不会改变 HEAD 与暂存区，因此每次都重新读取。
+
+    参数:
+        repo: git 仓库根目录。
+        limit: 最多列出的文件数。
+
+    返回值：改动列表的文字，如 " M README.md; ?? new.py"；没有改动时为 "clean"，无法读取时为空字符串。
+    """
+    try:
+        result = subprocess.run(
+            ['git', '-C', repo, 'status', '--porcelain'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, timeout=5
+        )
+    except (OSError, subprocess.SubprocessError):
+        return ""
+    if result.returncode != 0:
+        return ""
+    lines = [line for line in result.stdout.splitlines() if line.strip()]
+    if not lines:
+        return "clean"
+    more = f"; ... {len(lines) - limit} more" if len(lines) > limit else ""
+    return "; ".join(lines[:limit]) + more
+
+
 def get_docker_metadata():
     """
     记录当前工作区的 Docker 容器和镜像信息。
@@ -192,14 +220,51 @@ def get_path_metadata():
                 # 如果没有权限列出目录内容，跳过该目录
                 continue
 
+    # 没有控制终端时（如在后台或 CI 中运行）os.getlogin 会失败
+    try:
+        user = os.getlogin()
+    except OSError:
+        user = getpass.getuser()
+
     return {
-        "user": os.getlogin(),
+        "user": user,
         "current_directory": os.getcwd(),
         "home_directory": os.path.expanduser("~"),
         "executable_commands": sorted(list(commands))
     }
 
 
+def get_context_metadata():
+    """
+    get_context_metadata：记录当前命令所处的上下文，包括工作目录、git 仓库根目录、主机名和 shell。
+    项目（project）为 git 仓库根目录，不在仓库中时为当前工作目录。
+
+    返回值：包含上下文元数据的字典。
+    """
+    current_directory = os.getcwd()
+
+    # 逐级向上查找 .git，避免启动 git 子进程
+    repo = ''
+    path = current_directory
+    while True:
+        if os.path.exists(os.path.join(path, '.git')):
+            repo = path
+            break
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+
+    shell = os.environ.get('SHELL') or os.environ.get('COMSPEC') or ''
+    return {
+        "cwd": current_directory,
+        "repo": repo,
+        "project": repo or current_directory,
+        "hostname": socket.gethostname(),
+        "shell": os.path.basename(shell)
+    }
+
+
 def get_file_metadata():
     """
     get_file_metadata：记录当前目录下的文件信息。
@@ -0,0 +1,111 @@
+import time
+from collections import defaultdict
+
+from .config import PREFETCH_PATH
+from .const import PREFETCH_LOCAL, PREFETCH_MODEL, PREFETCH_INTERVAL, PREFETCH_TTL
+from .store import read_json, write_json
+from .metadata import get_command_history
+
+
+def recent_commands(limit: int = None):
+    """
+    recent_commands：按时间顺序（从旧到新）返回 shell 历史中的命令，读取失败或 shell 不受支持时返回空列表。
+
+    参数:
+        limit: 只返回最近的若干条命令，默认返回全部。
+    """
+    try:
+        history = get_command_history()
+    except ValueError:
+        return []
+    if not isinstance(history, dict):
+        return []
+    commands = [item['command'] for item in reversed(history['shell_command_history']) if item.get('command')]
+    return commands[-limit:] if limit else commands
+
+
+def predict_next(commands: list, last_command: str):
+    """
+    predict_next：在本地预测下一条命令：历史中紧跟在上一条命令之后出现次数最多的命令，越近的出现权重越高；
+    上一条命令没有出现过时，按同一程序（第一个词）的后继命令统计。
+
+    参数:
+        commands: 按时间顺序排列的历史命令。
+        last_command: 刚刚执行完的命令。
+
+    返回值：预测的命令，历史中没有可用的后继时返回 None。
+    """
+    program = last_command.split(' ')[0]
+    for matches in (lambda command: command == last_command, lambda command: command.split(' ')[0] == program):
+        scores = defaultdict(float)
+        for index, (command, successor) in enumerate(zip(commands, commands[1:])):
+            if matches(command) and successor != last_command:
+                scores[successor] += 1 + index / len(commands)
+        if scores:
+            return max(scores, key=scores.get)
+    return None
+
+
+def read_prefetch(cwd: str, ttl: float = PREFETCH_TTL):
+    """
+    read_prefetch：读取为当前目录预取的下一条命令。
+
+    参数:
+        cwd: 当前目录。
+        ttl: 预取结果的有效时间（秒）。
+
+    返回值：预取记录（command、last_command、exit_code、source 等），没有有效的预测时返回 None。
+    """
+    record = read_json(PREFETCH_PATH)
+    if not isinstance(record, dict) or record.get('cwd') != cwd or not record.get('command'):
+        return None
+    return record if time.time() - record.get('created_at', 0) <= ttl else None
+
+
+def prefetch_source(record, cwd: str, last_command: str, exit_code: int, mode: str,
+                    interval: float = PREFETCH_INTERVAL):
+    """
+    prefetch_source：决定这次是否需要预测以及由谁预测。同一状态（目录、上一条命令与退出码）只预测一次，
+    模型预测受最小间隔限制，间隔内退回到本地预测。
+
+    参数:
+        record: 上一次的预取记录。
+        cwd: 当前目录。
+        last_command: 刚刚执行完的命令。
+        exit_code: 它的退出码。
+        mode: 配置的预取方式（local 或 model）。
+        interval: 两次模型预测之间的最小秒数。
+
+    返回值：'local'、'model'，不需要预测时返回 None。
+    """
+    record = record if isinstance(record, dict) else {}
+    if [record.get('cwd'), record.get('last_command'), record.get('exit_code')] == [cwd, last_command, exit_code]:
+        return None
+    if mode == PREFETCH_MODEL and time.time() - record.get('model_at', 0) >= interval:
+        return PREFETCH_MODEL
+    return PREFETCH_LOCAL
+
+
+def write_prefetch(cwd: str, last_command: str, exit_code: int, command, source: str, previous=None):
+    """
+    write_prefetch：保存预测结果，没有预测出命令时也保存，使同一状态不再重复预测。
+
+    参数:
+        cwd: 当前目录。
+        last_command: 刚刚执行完的命令。
+        exit_code: 它的退出码。
+        command: 预测的命令，可以为 None。
+        source: 预测方式（local 或 model）。
+        previous: 上一次的预取记录，用于沿用最近一次模型预测的时间。
+
+    返回值：保存的预取记录。
+    """
+    now = time.time()
+    previous = previous if isinstance(previous, dict) else {}
+    record = {
+        'cwd': cwd, 'last_command': last_command, 'exit_code': exit_code, 'command': command, 'source': source,
+        'created_at': now,
+        'model_at': now if source == PREFETCH_MODEL else previous.get('model_at', 0)
+    }
+    write_json(PREFETCH_PATH, record)
+    return record
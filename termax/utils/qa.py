@@ -1,4 +1,4 @@
-import inquirer
+# inquirer 只在交互时导入，命令行的快速路径（termax-complete）不需要加载它
 from termax.utils.const import *
 
 
@@ -9,6 +9,8 @@ def qa_platform(model_list: dict = CONFIG_LLM_LIST):
     Args:
         model_list: the list of models.
     """
+    import inquirer
+
     try:
         # Prompt for platform selection
         platform_question = [
@@ -45,6 +47,16 @@ def qa_platform(model_list: dict = CONFIG_LLM_LIST):
                     message=f"[OPTIONAL] What is the base url for {selected_platform}"
                 )
             )
+        elif selected_platform == 'OpenAI-Compatible':
+            other_questions[0] = inquirer.Text(
+                CONFIG_SEC_API_KEY, message=f"[OPTIONAL] What is your {selected_platform} API key"
+            )
+            other_questions.append(
+                inquirer.Text(
+                    'base_url',
+                    message=f"What is the base url of the endpoint, e.g. http://localhost:8000/v1"
+                )
+            )
 
         # Gather responses to other questions
         answers = inquirer.prompt(other_questions)
@@ -63,7 +75,7 @@ def qa_platform(model_list: dict = CONFIG_LLM_LIST):
             'candidate_count': 1,
             'api_key': answers.get(CONFIG_SEC_API_KEY) if selected_platform != 'Ollama' else 'None',
             'host_url': answers.get('host_url') if selected_platform == 'Ollama' else 'None',
-            'base_url': answers.get('base_url') if selected_platform == 'OpenAI' else 'None'
+            'base_url': answers.get('base_url') if selected_platform in ('OpenAI', 'OpenAI-Compatible') else 'None'
         }
 
         return config_dict
@@ -78,6 +90,8 @@ def qa_general(model_list: dict = CONFIG_LLM_LIST):
     Args:
         model_list: the list of models.
     """
+    import inquirer
+
     try:
         exe_questions = [
             inquirer.List(
@@ -119,6 +133,8 @@ def qa_confirm():
     """
     qa_execute: ask the user confirm whether to execute the generated commmand.
     """
+    import inquirer
+
     try:
         exe_questions = [
             inquirer.List(
@@ -138,6 +154,8 @@ def qa_action():
     """
     qa_action: ask the user to choose the action to perform for guess output.
     """
+    import inquirer
+
     try:
         action_questions = [
             inquirer.List(
@@ -153,19 +171,31 @@ def qa_action():
         return None
 
 
-def qa_prompt():
+def qa_prompt(suggestion: str = None):
     """
     qa_prompt: ask the user to input the prompt and intent.
+    Args:
+        suggestion: the predicted next command, offered as the first (default) choice.
+
+    Returns: the kind and the description of the intent, the kind is 'suggestion' (with an empty description) when
+    the user picks the predicted command.
     """
+    import inquirer
+
     try:
+        choices = [('generic shell command', 'shell'), ('git command', 'git'), ('docker command', 'docker')]
+        if suggestion:
+            choices.insert(0, (f"suggested command: {suggestion}", 'suggestion'))
         command_questions = [
             inquirer.List(
                 'kind',
                 message="What kind of command can I help you with",
-                choices=[('generic shell command', 'shell'), ('git command', 'git'), ('docker command', 'docker')]
+                choices=choices
             )
         ]
         command = inquirer.prompt(command_questions)
+        if command["kind"] == 'suggestion':
+            return {'primary': 'suggestion', 'description': ""}
 
         intent_questions = [
             inquirer.Text(
@@ -185,6 +215,8 @@ def qa_revise():
     """
     qa_revise: ask the user to input the revised command.
     """
+    import inquirer
+
     try:
         revise_questions = [
             inquirer.Text(
@@ -0,0 +1,95 @@
+import os
+import json
+import tempfile
+
+
+def read_json(path: str, default=None):
+    """
+    read_json：读取 JSON 文件，文件不存在或已损坏时返回默认值。
+
+    参数:
+        path: JSON 文件路径。
+        default: 读取失败时的返回值。
+
+    返回值：解析后的数据。
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return default
+
+
+def write_json(path: str, data):
+    """
+    write_json：原子地写入 JSON 文件（先写临时文件再替换），避免并发读取到写了一半的文件。
+
+    参数:
+        path: JSON 文件路径。
+        data: 要写入的数据。
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            json.dump(data, file, separators=(',', ':'))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def append_jsonl(path: str, record: dict):
+    """
+    append_jsonl：向 JSONL 文件追加一条记录（每行一个 JSON 对象）。
+
+    参数:
+        path: JSONL 文件路径。
+        record: 要追加的记录。
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as file:
+        file.write(json.dumps(record, separators=(',', ':'), ensure_ascii=False) + "\n")
+
+
+def write_jsonl(path: str, records: list):
+    """
+    write_jsonl：原子地重写 JSONL 文件（先写临时文件再替换）。
+
+    参数:
+        path: JSONL 文件路径。
+        records: 要写入的记录列表。
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            for record in records:
+                file.write(json.dumps(record, separators=(',', ':'), ensure_ascii=False) + "\n")
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def iter_jsonl(path: str):
+    """
+    iter_jsonl：逐行读取 JSONL 文件，跳过无法解析的行；文件不存在时不返回任何记录。
+
+    参数:
+        path: JSONL 文件路径。
+
+    返回值：记录生成器。
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
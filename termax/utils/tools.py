@@ -0,0 +1,241 @@
+import os
+import re
+import time
+from collections import Counter
+import signal
+import shutil
+import tempfile
+import threading
+import subprocess
+
+from .config import TOOLS_PATH
+from .const import TOOL_DOC_SIZE, TOOL_REFRESH_BUDGET, TOOL_HELP_TIMEOUT, TOOL_HELP_BYTES, TOOL_HELP_EXCLUDED, \
+    TOOL_HELP_OFF, TOOL_HELP_HISTORY, TOOL_HELP_ALL
+from .store import read_json, write_json
+from .command import command_executables
+from .prefetch import recent_commands
+
+# man 页面中的章节标题，如 NAME、SYNOPSIS、OPTIONS
+SECTION_REGEX = re.compile(r'^[A-Z][A-Z ]+$')
+# 选项行：缩进后以 - 或 -- 开头
+OPTION_REGEX = re.compile(r'^\s+(-{1,2}[\w?#][^\s]*.*)$')
+# 终端加粗与下划线的退格控制字符
+OVERSTRIKE_REGEX = re.compile(r'.\x08')
+
+# 工具索引的进程内缓存：(索引文件的修改时间, 索引)
+_tools = (None, {})
+
+
+def path_tools(path: str = None):
+    """
+    path_tools：PATH 中的可执行程序，同名程序取 PATH 中靠前的一个（即 shell 实际执行的那个）。
+
+    参数:
+        path: PATH 字符串，默认为环境变量 PATH。
+
+    返回值：程序名 -> [程序路径, 修改时间]。
+    """
+    tools = {}
+    for directory in (path or os.environ.get('PATH', '')).split(os.pathsep):
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name in tools:
+                continue
+            try:
+                if entry.is_file() and os.access(entry.path, os.X_OK):
+                    tools[entry.name] = [entry.path, entry.stat().st_mtime_ns]
+            except OSError:
+                continue
+    return tools
+
+
+def run_help(arguments: list, executable: str = None):
+    """
+    run_help：运行 man 或 --help 并读取有限长度的输出；超时或无法运行时返回空字符串。
+    标准输入为空，程序在独立的会话中运行，不会读取终端；工作目录为临时目录，程序留下的文件随之删除。
+
+    参数:
+        arguments: 命令与参数。
+        executable: 程序路径，默认按 arguments[0] 在 PATH 中查找。
+    """
+    output = []
+    with tempfile.TemporaryDirectory(prefix='termax-help-') as directory:
+        try:
+            process = subprocess.Popen(
+                arguments, executable=executable, cwd=directory, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT, start_new_session=True,
+                env={**os.environ, 'LC_ALL': 'C', 'MANWIDTH': '120', 'MANPAGER': 'cat', 'PAGER': 'cat'}
+            )
+        except OSError:
+            return ""
+        # 在线程中读取，程序不退出也不再输出时不会一直阻塞
+        reader = threading.Thread(target=lambda: output.append(process.stdout.read(TOOL_HELP_BYTES)), daemon=True)
+        reader.start()
+        reader.join(TOOL_HELP_TIMEOUT)
+        if process.poll() is None:
+            # 超时或输出超过上限：结束程序及其子进程
+            try:
+                if hasattr(os, 'killpg'):
+                    os.killpg(process.pid, signal.SIGKILL)
+                else:
+                    process.kill()
+            except OSError:
+                pass
+            process.wait()
+    if not output:
+        return ""
+    return OVERSTRIKE_REGEX.sub('', output[0].decode('utf-8', 'replace'))
+
+
+def summarize_help(name: str, text: str, size: int = TOOL_DOC_SIZE):
+    """
+    summarize_help：将 man 页面或 --help 输出压缩为简短的说明：一句描述、用法（SYNOPSIS / Usage）与选项列表。
+
+    参数:
+        name: 程序名。
+        text: man 页面或 --help 的输出。
+        size: 说明的最大字符数。
+
+    返回值：(描述, 说明)；无法从输出中找到用法或选项时返回 (None, None)。
+    """
+    lines = [line.rstrip() for line in text.splitlines()]
+    sections, section = {}, None
+    for line in lines:
+        if SECTION_REGEX.match(line):
+            section = line.strip()
+            continue
+        sections.setdefault(section, []).append(line)
+
+    if 'SYNOPSIS' in sections:
+        # man 页面：NAME 段为 "ls - list directory contents"
+        description = " ".join(" ".join(sections.get('NAME', [])).split()).partition(' - ')[2]
+        usage = [line.strip() for line in sections['SYNOPSIS'] if line.strip()][:3]
+    else:
+        # --help：Usage 行之后第一行不缩进的文字为描述
+        first = next((index for index, line in enumerate(lines) if line.strip().lower().startswith('usage:')), None)
+        usage = [] if first is None else [re.sub(r'^usage:\s*', '', lines[first].strip(), flags=re.IGNORECASE)] + [
+            line.strip() for line in lines[first + 1:first + 3] if line.strip().startswith('or:')
+        ]
+        after = lines[first + 1:] if first is not None else lines
+        description = next((
+            line.strip() for line in after
+            if line.strip() and not line.startswith((' ', '\t')) and not re.match(r'^[A-Z ]+:$', line.strip())
+        ), '')
+
+    options = []
+    for index, line in enumerate(lines):
+        match = OPTION_REGEX.match(line)
+        if not match:
+            continue
+        option = match.group(1)
+        following = lines[index + 1].strip() if index + 1 < len(lines) else ''
+        # man 页面的选项说明在下一行
+        if not re.search(r'\S\s{2,}\S', option) and following and not following.startswith('-'):
+            option = f"{option}  {following}"
+        options.append(re.sub(r'\s{2,}', ': ', option.strip(), count=1).rstrip(';'))
+
+    if not usage and not options:
+        return None, None
+    doc = f"{name}: {description}\nUsage: {' '.join(' '.join(usage).split())}\nOptions: {'; '.join(options)}"
+    return description[:200], doc[:size]
+
+
+def describe_tool(name: str, path: str, run: bool = False):
+    """
+    describe_tool：为一个程序生成说明，优先使用 man 页面，没有时按 run 运行 `<程序> --help`（TOOL_HELP_EXCLUDED 中的程序除外）。
+
+    参数:
+        name: 程序名。
+        path: 程序路径。
+        run: 没有 man 页面时是否运行程序读取 --help 输出。
+
+    返回值：(描述, 说明)，都没有时返回 (None, None)。
+    """
+    if shutil.which('man'):
+        description, doc = summarize_help(name, run_help(['man', name]))
+        if doc:
+            return description, doc
+    if not run or name in TOOL_HELP_EXCLUDED:
+        return None, None
+    # argv[0] 使用程序名，用法中显示程序名而不是完整路径
+    return summarize_help(name, run_help([name, '--help'], executable=path))
+
+
+def read_tools():
+    """
+    read_tools：读取工具索引，索引文件不变时复用进程内缓存。
+
+    返回值：程序名 -> {'path', 'mtime', 'description', 'doc'}。
+    """
+    global _tools
+    try:
+        mtime = os.stat(TOOLS_PATH).st_mtime_ns
+    except OSError:
+        return {}
+    if _tools[0] != mtime:
+        tools = read_json(TOOLS_PATH, {})
+        _tools = (mtime, tools if isinstance(tools, dict) else {})
+    return _tools[1]
+
+
+def history_usage():
+    """
+    history_usage：shell 历史中各程序的使用次数（按命令各段实际执行的程序统计）。
+
+    返回值：Counter，程序名 -> 使用次数。
+    """
+    usage = Counter()
+    for command in recent_commands():
+        usage.update(command_executables(command) or [])
+    return usage
+
+
+def refresh_tools(usage: dict = None, budget: float = TOOL_REFRESH_BUDGET, path: str = None,
+                  run_help_for: str = TOOL_HELP_OFF):
+    """
+    refresh_tools：增量更新工具索引：以程序路径与修改时间为键，只为新增或变化的程序生成说明，删除已不在 PATH 中的程序。
+    由 termax-startup 在 shell 启动时于后台运行（也可手动运行 `t tools refresh`），每次最多运行 budget 秒，
+    未完成的部分留给下一次。
+
+    参数:
+        usage: 程序名 -> 在 shell 历史中的使用次数，常用的程序先生成说明，检索时也优先。
+        budget: 本次运行的最长秒数。
+        path: PATH 字符串，默认为环境变量 PATH。
+        run_help_for: 没有 man 页面时为哪些程序运行 --help：off（都不运行）、history（shell 历史中用过的程序）或 all。
+
+    返回值：(本次更新的程序数, 尚未更新的程序数)。
+    """
+    start = time.monotonic()
+    usage = usage or {}
+    current = path_tools(path)
+    previous = read_tools()
+    tools = {name: dict(tool) for name, tool in previous.items() if name in current}
+
+    def runnable(name):
+        return run_help_for == TOOL_HELP_ALL or (run_help_for == TOOL_HELP_HISTORY and usage.get(name, 0) > 0)
+
+    # 新增或变化的程序，以及没有说明、之前未运行 --help 而现在可以运行的程序（如之后在 shell 中用过）
+    stale = [name for name, (tool_path, mtime) in current.items()
+             if name not in tools or [tools[name]['path'], tools[name]['mtime']] != [tool_path, mtime]
+             or (tools[name]['doc'] is None and not tools[name].get('help') and runnable(name))]
+    stale.sort(key=lambda name: (-usage.get(name, 0), name))
+
+    updated = 0
+    for name in stale:
+        if time.monotonic() - start >= budget:
+            break
+        description, doc = describe_tool(name, current[name][0], run=runnable(name))
+        # 没有说明的程序也记录下来，程序不变时不再重复尝试
+        tools[name] = {
+            'path': current[name][0], 'mtime': current[name][1], 'description': description, 'doc': doc,
+            'help': runnable(name)
+        }
+        updated += 1
+    for name, tool in tools.items():
+        tool['used'] = usage.get(name, 0) if usage else tool.get('used', 0)
+    if tools != previous:
+        write_json(TOOLS_PATH, tools)
+    return updated, len(stale) - updated
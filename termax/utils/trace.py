@@ -0,0 +1,182 @@
+import time
+import threading
+import functools
+from collections import deque
+from contextlib import contextmanager
+
+import psutil
+
+from .store import iter_jsonl, append_jsonl
+from .const import TRACE_SPAN_LIMIT
+
+
+class Tracer:
+    """
+    Tracer：轻量级的阶段耗时追踪器，记录一次 termax 调用中每个阶段（span）的开始时间与耗时。
+    长时间运行的进程（t chat）只保留最近的 limit 个阶段，写入追踪文件后清空。
+    """
+
+    def __init__(self, limit: int = TRACE_SPAN_LIMIT):
+        # 以进程启动时间为原点，这样解释器启动与模块导入的耗时也能被统计到
+        now = time.perf_counter()
+        try:
+            self.origin = now - (time.time() - psutil.Process().create_time())
+        except psutil.Error:
+            self.origin = now
+        self.spans = deque(maxlen=limit)
+        self.local = threading.local()
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """
+        span：记录一个阶段的耗时，支持嵌套。
+
+        参数:
+            name: 阶段名称。
+            attrs: 附加属性（如平台、模型）。
+        """
+        stack = self.local.__dict__.setdefault('stack', [])
+        start = time.perf_counter()
+        stack.append(name)
+        try:
+            yield
+        finally:
+            stack.pop()
+            self.spans.append({
+                'name': name,
+                'start': start - self.origin,
+                'duration': time.perf_counter() - start,
+                'depth': len(stack),
+                **attrs
+            })
+
+    def mark(self, name: str):
+        """
+        mark：记录从进程启动到当前时刻的阶段，用于统计启动与导入耗时。
+
+        参数:
+            name: 阶段名称。
+        """
+        self.spans.append({'name': name, 'start': 0.0, 'duration': time.perf_counter() - self.origin, 'depth': 0})
+
+    def total(self):
+        """
+        total：从进程启动到当前时刻的总耗时（秒）。
+        """
+        return time.perf_counter() - self.origin
+
+    def waterfall(self, width: int = 40):
+        """
+        waterfall：将已记录的阶段渲染为瀑布图文本。
+
+        参数:
+            width: 时间轴的字符宽度。
+
+        返回值：瀑布图字符串。
+        """
+        total = max(self.total(), 1e-9)
+        lines = [f"{'stage':<36}{'start':>10}{'duration':>11}  timeline", "-" * (59 + width)]
+        for record in sorted(self.spans, key=lambda item: (item['start'], item['depth'])):
+            offset = int(record['start'] / total * width)
+            length = max(1, int(record['duration'] / total * width))
+            label = ("  " * record['depth'] + record['name'])[:35]
+            lines.append(
+                f"{label:<36}{record['start'] * 1000:>8.1f}ms{record['duration'] * 1000:>9.1f}ms  "
+                f"{' ' * offset}{'█' * min(length, width - offset)}"
+            )
+        lines.append(f"{'total':<36}{'':>10}{total * 1000:>9.1f}ms")
+        return "\n".join(lines)
+
+    def dump(self, path: str, command: str):
+        """
+        dump：将本次调用的阶段记录追加写入 JSONL 追踪文件，写入的阶段随后清空。
+
+        参数:
+            path: 追踪文件路径。
+            command: 本次调用的子命令名称。
+        """
+        append_jsonl(path, {
+            'time': time.time(),
+            'command': command,
+            'total': self.total(),
+            'spans': list(self.spans)
+        })
+        self.spans.clear()
+
+
+tracer = Tracer()
+
+
+def span(name: str, **attrs):
+    """
+    span：在全局追踪器上记录一个阶段。
+
+    参数:
+        name: 阶段名称。
+        attrs: 附加属性。
+    """
+    return tracer.span(name, **attrs)
+
+
+def traced(name: str):
+    """
+    traced：函数装饰器，将整个函数调用记录为一个阶段。
+
+    参数:
+        name: 阶段名称。
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def percentile(values: list, q: float):
+    """
+    percentile：计算分位数（线性插值）。
+
+    参数:
+        values: 数值列表。
+        q: 分位数，取值 0 到 100。
+
+    返回值：分位数值。
+    """
+    values = sorted(values)
+    if not values:
+        return 0.0
+    rank = (len(values) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def summarize_traces(path: str, command: str = None, last: int = None):
+    """
+    summarize_traces：汇总 JSONL 追踪文件，统计每个阶段的调用次数与 p50/p95 耗时。
+
+    参数:
+        path: 追踪文件路径。
+        command: 仅统计指定子命令的记录。
+        last: 仅统计最近的若干条记录。
+
+    返回值：{阶段名称: {'count', 'p50', 'p95'}} 字典（耗时单位为秒）。
+    """
+    runs = [run for run in iter_jsonl(path) if command is None or run.get('command') == command]
+    if last:
+        runs = runs[-last:]
+
+    durations = {'total': [run['total'] for run in runs]}
+    for run in runs:
+        for record in run['spans']:
+            durations.setdefault(record['name'], []).append(record['duration'])
+
+    return {
+        name: {'count': len(values), 'p50': percentile(values, 50), 'p95': percentile(values, 95)}
+        for name, values in durations.items()
+    }
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+from datetime import datetime, timedelta
+from collections import OrderedDict
+
+from .store import append_jsonl, iter_jsonl, write_jsonl
+from .const import USAGE_LEDGER_LIMIT, USAGE_RETENTION_DAYS
+
+# 本进程中最近构建的提示词：提示词文本 -> {'kind': 类型, 'sections': {段落名称: 字符数}}
+# 同一提示词可能用于多次调用（如候选与修复），因此不在记录时删除，而是只保留最近使用的 PROMPT_LIMIT 个
+PROMPTS = OrderedDict()
+PROMPT_LIMIT = 16
+
+
+def register_prompt(prompt: str, kind: str, sections: dict = None):
+    """
+    register_prompt：登记一个构建好的提示词及其类型和各段落的大小，供用量记录按段落拆分输入 token。
+
+    参数:
+        prompt: 提示词文本。
+        kind: 提示词类型（command / suggestion / description）。
+        sections: 各段落名称到字符数的映射，未覆盖的部分记为 instructions。
+
+    返回值：原提示词文本。
+    """
+    sections = {name: size for name, size in (sections or {}).items() if size}
+    sections['instructions'] = max(len(prompt) - sum(sections.values()), 0)
+    PROMPTS[prompt] = {'kind': kind, 'sections': sections}
+    PROMPTS.move_to_end(prompt)
+    while len(PROMPTS) > PROMPT_LIMIT:
+        PROMPTS.popitem(last=False)
+    return prompt
+
+
+def record_usage(path: str, provider: str, model: str, kind: str, prompt: str, usage: dict, latency: float):
+    """
+    record_usage：向本地用量账本追加一条模型调用记录。
+
+    参数:
+        path: 账本文件路径。
+        provider: 平台名称。
+        model: 模型名称。
+        kind: 调用类型，未登记的提示词使用此值。
+        prompt: 本次调用使用的提示词。
+        usage: {'input', 'output', 'cached'} token 数。
+        latency: 调用耗时（秒）。
+    """
+    info = PROMPTS.get(prompt, {'kind': kind, 'sections': {}})
+    if prompt in PROMPTS:
+        PROMPTS.move_to_end(prompt)
+    append_jsonl(path, {
+        'time': time.time(),
+        'provider': provider,
+        'model': model,
+        'kind': info['kind'],
+        'input': usage.get('input', 0),
+        'output': usage.get('output', 0),
+        'cached': usage.get('cached', 0),
+        'latency': round(latency, 4),
+        'sections': info['sections']
+    })
+    if os.path.getsize(path) > USAGE_LEDGER_LIMIT:
+        compact_usage(path)
+
+
+def usage_day(timestamp: float):
+    """
+    usage_day：返回时间戳所在的本地日期。
+
+    参数:
+        timestamp: 时间戳。
+
+    返回值：YYYY-MM-DD 格式的日期字符串。
+    """
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d')
+
+
+def section_usage(entry: dict):
+    """
+    section_usage：拆分一条账本记录在各提示词段落上的用量。
+    单次调用的输入 token 按各段落的字符占比分摊；按天汇总的记录已保存各段落的 [调用次数, 输入, 缓存] token 数。
+
+    参数:
+        entry: 账本记录。
+
+    返回值：(段落名称, 调用次数, 输入 token, 缓存 token) 生成器。
+    """
+    if 'calls' in entry:
+        for name, (calls, input_tokens, cached_tokens) in entry['sections'].items():
+            yield name, calls, input_tokens, cached_tokens
+        return
+
+    total = sum(entry['sections'].values()) or 1
+    for name, size in entry['sections'].items():
+        share = size / total
+        yield name, 1, round(entry['input'] * share), round(entry['cached'] * share)
+
+
+def compact_usage(path: str, days: int = USAGE_RETENTION_DAYS, limit: int = USAGE_LEDGER_LIMIT):
+    """
+    compact_usage：将账本中超过保留天数的逐次调用记录按天、平台、模型和调用类型汇总为一条记录。
+    若保留期内的记录仍超过大小上限的一半，则从最早的一天起继续汇总，使账本大小有上限。
+
+    参数:
+        path: 账本文件路径。
+        days: 逐次保留调用记录的天数。
+        limit: 账本文件的大小上限（字节）。
+    """
+    entries = list(iter_jsonl(path))
+    cutoff = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+    sizes = {}
+    for entry in entries:
+        if 'calls' not in entry:
+            day = usage_day(entry['time'])
+            sizes[day] = sizes.get(day, 0) + len(json.dumps(entry, separators=(',', ':'), ensure_ascii=False)) + 1
+
+    rolled = {day for day in sizes if day < cutoff}
+    kept = sum(size for day, size in sizes.items() if day not in rolled)
+    for day in sorted(set(sizes) - rolled):
+        if kept <= limit // 2:
+            break
+        rolled.add(day)
+        kept -= sizes[day]
+    if not rolled:
+        return
+
+    totals, recent = {}, []
+    for entry in entries:
+        day = usage_day(entry['time'])
+        if 'calls' not in entry and day not in rolled:
+            recent.append(entry)
+            continue
+
+        key = (day, entry['provider'], entry['model'], entry['kind'])
+        total = totals.setdefault(key, {
+            'time': datetime.strptime(day, '%Y-%m-%d').timestamp(),
+            'provider': entry['provider'],
+            'model': entry['model'],
+            'kind': entry['kind'],
+            'calls': 0, 'input': 0, 'output': 0, 'cached': 0, 'latency': 0.0,  # 汇总记录的 latency 为总耗时
+            'sections': {}
+        })
+        total['calls'] += entry.get('calls', 1)
+        for field in ('input', 'output', 'cached'):
+            total[field] += entry[field]
+        total['latency'] = round(total['latency'] + entry['latency'], 4)
+        for name, calls, input_tokens, cached_tokens in section_usage(entry):
+            section = total['sections'].setdefault(name, [0, 0, 0])
+            section[0] += calls
+            section[1] += input_tokens
+            section[2] += cached_tokens
+
+    write_jsonl(path, sorted(totals.values(), key=lambda total: total['time']) + recent)
+
+
+def summarize_usage(path: str, by: str = 'day', since: float = None):
+    """
+    summarize_usage：按日期、平台、模型、调用类型或提示词段落汇总用量账本，包括已按天汇总的记录。
+    按段落汇总时，每次调用的输入 token 按各段落的字符占比分摊。
+
+    参数:
+        path: 账本文件路径。
+        by: 分组方式，可选 day / provider / model / kind / section。
+        since: 仅统计该时间戳之后的记录。
+
+    返回值：{分组: {'calls', 'input', 'output', 'cached', 'latency'}} 字典，latency 为平均耗时（秒）。
+    """
+    summary = {}
+
+    def add(group, calls, input_tokens, output_tokens, cached_tokens, latency):
+        row = summary.setdefault(group, {'calls': 0, 'input': 0, 'output': 0, 'cached': 0, 'latency': 0.0})
+        row['calls'] += calls
+        row['input'] += input_tokens
+        row['output'] += output_tokens
+        row['cached'] += cached_tokens
+        row['latency'] += latency
+
+    for entry in iter_jsonl(path):
+        if since and entry['time'] < since:
+            continue
+
+        if by == 'section':
+            for name, calls, input_tokens, cached_tokens in section_usage(entry):
+                add(name, calls, input_tokens, 0, cached_tokens, 0.0)
+            continue
+
+        if by == 'day':
+            group = usage_day(entry['time'])
+        else:
+            group = entry.get(by) or 'unknown'
+        add(group, entry.get('calls', 1), entry['input'], entry['output'], entry['cached'], entry['latency'])
+
+    for row in summary.values():
+        row['latency'] = row['latency'] / row['calls'] if row['calls'] else 0.0
+    return summary
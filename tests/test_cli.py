@@ -0,0 +1,39 @@
+import time
+import unittest
+
+import click
+from click.testing import CliRunner
+
+from termax.cli.cli import cli
+from termax.cli.utils import parse_since
+
+
+class TestParseSince(unittest.TestCase):
+
+    def test_relative(self):
+        self.assertAlmostEqual(parse_since('7d'), time.time() - 7 * 86400, delta=5)
+        self.assertAlmostEqual(parse_since(' 30m '), time.time() - 1800, delta=5)
+
+    def test_date(self):
+        self.assertEqual(parse_since('2024-05-01'), time.mktime((2024, 5, 1, 0, 0, 0, 0, 0, -1)))
+
+    def test_invalid(self):
+        with self.assertRaises(click.BadParameter):
+            parse_since('yesterday')
+
+
+class TestSinceOption(unittest.TestCase):
+
+    def test_rag(self):
+        result = CliRunner().invoke(cli, ['rag', '--since', 'yesterday'])
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn("Invalid value for --since: expected YYYY-MM-DD or 7d/12h/30m", result.output)
+
+    def test_stats_usage(self):
+        result = CliRunner().invoke(cli, ['stats', 'usage', '--since', '2024-13-45'])
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn("Invalid value for --since: expected YYYY-MM-DD or 7d/12h/30m", result.output)
+
+
+if __name__ == '__main__':
+    unittest.main()
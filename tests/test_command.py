@@ -0,0 +1,115 @@
+import shutil
+import unittest
+from unittest import mock
+
+from termax.utils import command
+from termax.utils.command import split_segments, split_command, command_executables, validate_command
+
+# 测试中假定安装的程序
+INSTALLED = {'ls', 'cat', 'tee', 'make', 'grep', 'wc', 'sort', 'git'}
+
+
+class TestSplitSegments(unittest.TestCase):
+
+    def test_separators(self):
+        self.assertEqual(split_segments("ls -la | grep py && echo ok || echo fail; date &"), [
+            ('ls -la', '|'), ('grep py', '&&'), ('echo ok', '||'), ('echo fail', ';'), ('date', '&')
+        ])
+        self.assertEqual(split_segments("make 2>&1 |& tee log"), [('make 2>&1', '|&'), ('tee log', '')])
+
+    def test_single(self):
+        self.assertEqual(split_segments("  git status  "), [('git status', '')])
+        self.assertEqual(split_segments(""), [])
+
+    def test_redirections(self):
+        self.assertEqual(split_segments("cmd &> out.log"), [('cmd &> out.log', '')])
+        self.assertEqual(split_segments("cmd 2>&1"), [('cmd 2>&1', '')])
+
+    def test_quotes_and_escapes(self):
+        self.assertEqual(split_segments("echo 'a | b' \"c && d\" e\\;f"), [("echo 'a | b' \"c && d\" e\\;f", '')])
+        self.assertEqual(split_segments("echo \"a \\\" | b\" | wc"), [("echo \"a \\\" | b\"", '|'), ('wc', '')])
+
+    def test_groups(self):
+        self.assertEqual(split_segments("(cd src && make) | tee log"), [('(cd src && make)', '|'), ('tee log', '')])
+        self.assertEqual(split_segments("echo $(ls | wc -l); date"), [('echo $(ls | wc -l)', ';'), ('date', '')])
+        self.assertEqual(split_segments("{ a; b; } && c"), [('{ a; b; }', '&&'), ('c', '')])
+
+    def test_case(self):
+        self.assertEqual(split_segments("case $x in a) echo 1;; b|c) echo 2;; esac | wc -l; date"), [
+            ('case $x in a) echo 1;; b|c) echo 2;; esac', '|'), ('wc -l', ';'), ('date', '')
+        ])
+        self.assertEqual(split_segments("echo $(case $x in a) echo 1;; esac) | wc"), [
+            ('echo $(case $x in a) echo 1;; esac)', '|'), ('wc', '')
+        ])
+        self.assertEqual(split_segments("case $x in (a) b;; esac && c"), [('case $x in (a) b;; esac', '&&'), ('c', '')])
+        # 不在命令开头的 case 不是关键字
+        self.assertEqual(split_segments("echo case | wc"), [('echo case', '|'), ('wc', '')])
+
+
+class TestSplitCommand(unittest.TestCase):
+
+    def test_redirections(self):
+        self.assertEqual(split_command("ls -la 2>&1 | grep foo"), [['ls', '-la'], ['grep', 'foo']])
+        self.assertEqual(split_command("make &> build.log"), [['make']])
+        self.assertEqual(split_command("sort < in.txt > out.txt 2>/dev/null"), [['sort']])
+        self.assertEqual(split_command("cat <<EOF"), [['cat']])
+
+    def test_groups(self):
+        self.assertEqual(split_command("(cd src && ls)"), [['cd', 'src'], ['ls']])
+        self.assertEqual(split_command("{ make; make test; } > log"), [['make'], ['make', 'test']])
+        self.assertEqual(split_command("((i++))"), [])
+        with self.assertRaises(ValueError):
+            split_command("(cd src && ls")
+
+    def test_keywords(self):
+        self.assertEqual(command_executables("if [ -f a ]; then cat a; else touch a; fi"), ['[', 'cat', 'touch'])
+        self.assertEqual(command_executables("if ! grep -q x f; then echo no; fi"), ['grep', 'echo'])
+        self.assertEqual(command_executables("for f in *.py; do wc -l $f; done"), ['wc'])
+        self.assertEqual(command_executables("while read line; do echo $line; done < f.txt"), ['read', 'echo'])
+
+    def test_case(self):
+        self.assertEqual(split_command("case $x in a) echo 1;; (b|c) ls -l;; esac"), [['echo', '1'], ['ls', '-l']])
+
+    def test_quotes(self):
+        self.assertEqual(split_command('git commit -m "a; b > c"'), [['git', 'commit', '-m', 'a; b > c']])
+        self.assertIsNone(command_executables('echo "a'))
+
+
+class TestValidateCommand(unittest.TestCase):
+
+    def setUp(self):
+        patch = mock.patch.object(command, 'executable_exists', lambda name: name in INSTALLED)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.files = {'.': ['src', 'a.txt']}
+
+    def validate(self, text, shell='sh'):
+        return validate_command(text, self.files, shell=shell)
+
+    def test_redirections(self):
+        self.assertEqual(self.validate("make 2>&1 | tee build.log"), [])
+        self.assertEqual(self.validate("make &> build.log"), [])
+        self.assertEqual(self.validate("sort a.txt > out/sorted.txt 2>/dev/null"), [])
+
+    def test_groups(self):
+        self.assertEqual(self.validate("(cd src && make)"), [])
+        self.assertEqual(self.validate("{ make; make test; } > log"), [])
+
+    def test_compound(self):
+        self.assertEqual(self.validate("if [ -f a.txt ]; then cat a.txt; fi"), [])
+        self.assertEqual(self.validate("for f in *.txt; do wc -l $f; done"), [])
+        self.assertEqual(self.validate("case $1 in a) ls;; *) git status;; esac"), [])
+
+    def test_errors(self):
+        self.assertEqual(self.validate("(cd src && mkae) 2>&1"), ["command not found: mkae"])
+        self.assertEqual(self.validate("cat missing/a.txt"), ["no such file or directory: missing/a.txt"])
+        self.assertEqual(len(self.validate("cat 'a.txt")), 1)
+
+    @unittest.skipUnless(shutil.which('bash'), "bash is not installed")
+    def test_bash(self):
+        self.assertEqual(self.validate("make 2>&1 | tee log; if true; then ls; fi", shell='bash'), [])
+        self.assertEqual(len(self.validate("if true; then ls", shell='bash')), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
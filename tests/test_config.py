@@ -0,0 +1,83 @@
+import os
+import unittest
+from unittest import mock
+
+from termax.utils.config import ConfigSnapshot, env_overrides
+
+
+class TestConfigSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.snapshot = ConfigSnapshot({
+            'general': {
+                'platform': 'openai',
+                'empty': '',
+                'none': 'None',
+                'auto_execute': ' yes ',
+                'show_command': 'maybe',
+                'candidates': '3',
+                'temperature': '0.5',
+                'timeout': 'soon'
+            }
+        })
+
+    def test_value(self):
+        self.assertEqual(self.snapshot.value('general', 'platform'), 'openai')
+        self.assertEqual(self.snapshot.value('general', 'missing', 'gemini'), 'gemini')
+        self.assertEqual(self.snapshot.value('openai', 'model', 'gpt-4o'), 'gpt-4o')
+        # 空字符串与 "None" 视为未设置
+        self.assertIsNone(self.snapshot.value('general', 'empty'))
+        self.assertEqual(self.snapshot.value('general', 'none', 'default'), 'default')
+
+    def test_boolean(self):
+        self.assertTrue(self.snapshot.boolean('general', 'auto_execute'))
+        self.assertFalse(self.snapshot.boolean('general', 'missing'))
+        self.assertTrue(self.snapshot.boolean('general', 'empty', True))
+        with self.assertRaises(ValueError):
+            self.snapshot.boolean('general', 'show_command')
+
+    def test_integer_and_number(self):
+        self.assertEqual(self.snapshot.integer('general', 'candidates'), 3)
+        self.assertEqual(self.snapshot.integer('general', 'missing', 1), 1)
+        self.assertEqual(self.snapshot.number('general', 'temperature'), 0.5)
+        with self.assertRaises(ValueError):
+            self.snapshot.integer('general', 'temperature')
+        with self.assertRaises(ValueError):
+            self.snapshot.number('general', 'timeout')
+
+    def test_convert(self):
+        self.assertEqual(self.snapshot.convert('general', 'candidates', lambda value: int(value) * 2), 6)
+        with self.assertRaises(ValueError):
+            self.snapshot.convert('general', 'timeout', int)
+
+    def test_copy(self):
+        copy = self.snapshot.copy()
+        copy['general']['platform'] = 'ollama'
+        self.assertIsInstance(copy, ConfigSnapshot)
+        self.assertEqual(self.snapshot.value('general', 'platform'), 'openai')
+
+
+class TestEnvOverrides(unittest.TestCase):
+
+    def test_overrides(self):
+        environ = {
+            'TERMAX_GENERAL_PLATFORM': 'ollama',
+            'TERMAX_OPENAI_MODEL': 'gpt-4o',
+            'TERMAX_OPENAI_COMPATIBLE_BASE_URL': 'http://localhost:8000/v1',
+            'TERMAX_UNKNOWN_OPTION': 'ignored',
+            'TERMAX_GENERAL_': 'ignored'
+        }
+        with mock.patch.dict(os.environ, environ, clear=True):
+            self.assertEqual(env_overrides(), (
+                ('general', 'platform', 'ollama'),
+                ('openai', 'model', 'gpt-4o'),
+                ('openai-compatible', 'base_url', 'http://localhost:8000/v1')
+            ))
+
+    def test_no_overrides(self):
+        with mock.patch.dict(os.environ, {'HOME': '/tmp'}, clear=True):
+            self.assertEqual(env_overrides(), ())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from termax.utils.explain import parse_numbered, assemble_explanation, normalize_command, ExplanationCache
+
+
+class TestNormalizeCommand(unittest.TestCase):
+
+    def test_whitespace(self):
+        self.assertEqual(normalize_command("  ls   -la|grep  py&&echo ok "), "ls -la | grep py && echo ok")
+
+    def test_quotes(self):
+        # 引号的类型决定是否展开变量，不能被规范化掉
+        self.assertEqual(normalize_command("echo  '$HOME'"), "echo '$HOME'")
+        self.assertEqual(normalize_command('echo  "$HOME"'), 'echo "$HOME"')
+        self.assertNotEqual(normalize_command("echo '$HOME'"), normalize_command('echo "$HOME"'))
+        self.assertEqual(normalize_command("echo 'a   b'   c"), "echo 'a   b' c")
+        self.assertEqual(normalize_command(r'echo  "c  \"  d"   x'), r'echo "c  \"  d" x')
+        # 转义的空格属于参数，其后的空白仍是分隔
+        self.assertEqual(normalize_command(r'touch a\   b'), r'touch a\  b')
+
+
+class TestParseNumbered(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual(parse_numbered("1. list the files\n2) count them", 2), ['list the files', 'count them'])
+
+    def test_out_of_order_and_noise(self):
+        text = "Here you go:\n2. second\n  1.  first  \n3. extra\n1. duplicate"
+        self.assertEqual(parse_numbered(text, 2), ['first', 'second'])
+
+    def test_incomplete(self):
+        self.assertIsNone(parse_numbered("1. only one", 2))
+        self.assertIsNone(parse_numbered("", 1))
+        self.assertIsNone(parse_numbered(None, 1))
+        self.assertIsNone(parse_numbered("1. first\n2.   ", 2))
+
+
+class TestAssembleExplanation(unittest.TestCase):
+
+    def test_assemble(self):
+        segments = [('ls', '|'), ('wc -l', '&')]
+        explanations = {'ls': "lists the files.", 'wc -l': "counts the lines."}
+        self.assertEqual(assemble_explanation(segments, explanations), (
+            "1. `ls`: lists the files.\n"
+            "2. `wc -l` (receives the output of the previous step): counts the lines.\n"
+            "The last step runs in the background."
+        ))
+
+    def test_missing(self):
+        # 没有解释的段只列出原文，不输出 "None"
+        segments = [('ls', '|'), ('wc -l', '')]
+        self.assertEqual(assemble_explanation(segments, {'ls': "lists the files.", 'wc -l': None}), (
+            "1. `ls`: lists the files.\n"
+            "2. `wc -l` (receives the output of the previous step)"
+        ))
+
+
+class TestExplanationCache(unittest.TestCase):
+
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        self.path = os.path.join(self.home, 'explanations.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.home)
+
+    def test_models(self):
+        cache = ExplanationCache(['openai/gpt-4o', 'ollama/llama3'], self.path)
+        # 路由时记在实际回答的平台与模型下
+        cache.model = 'ollama/llama3'
+        cache.put('command', "ls  -la", "lists the files.")
+        cache.save()
+        self.assertEqual(ExplanationCache('ollama/llama3', self.path).get('command', "ls -la"), "lists the files.")
+        self.assertIsNone(ExplanationCache('openai/gpt-4o', self.path).get('command', "ls -la"))
+        self.assertEqual(
+            ExplanationCache(['openai/gpt-4o', 'ollama/llama3'], self.path).get('command', "ls -la"), "lists the files."
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import sys
+import json
+import unittest
+import subprocess
+
+# 快速路径（termax.fast）及 shell 启动时运行的入口不应导入的模块
+EXCLUDED = ['click', 'rich', 'inquirer', 'pyperclip', 'termax.plugin', 'chromadb']
+IMPORTED = "import sys, json, {module}; print(json.dumps([n for n in sys.argv[1:] if n in sys.modules]))"
+
+
+def imported(module: str):
+    """
+    imported：在新的解释器中导入模块，返回 EXCLUDED 中被一并导入的模块。
+    """
+    result = subprocess.run(
+        [sys.executable, '-c', IMPORTED.format(module=module), *EXCLUDED],
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout)
+
+
+class TestFastImports(unittest.TestCase):
+
+    def test_fast(self):
+        self.assertEqual(imported('termax.fast'), [])
+
+    def test_prefetch(self):
+        self.assertEqual(imported('termax.prefetch'), [])
+
+    def test_startup(self):
+        self.assertEqual(imported('termax.startup'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
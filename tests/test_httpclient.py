@@ -0,0 +1,92 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from termax.utils.httpclient import HTTPClient, HTTPError, RateLimitError
+
+# 服务端推送的事件流：注释、空行与非 data 行应被跳过，[DONE] 之后的内容不再读取
+EVENTS = (
+    ": keep-alive\n\n"
+    "event: message\n"
+    "data: {\"index\": 0}\n\n"
+    "data:{\"index\": 1}\n\n"
+    "\n"
+    "data: [DONE]\n\n"
+    "data: {\"index\": 2}\n\n"
+)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.connections.add(self.client_address)
+        if self.path == '/v1/stream':
+            self.send_body(EVENTS.encode('utf-8'), 'text/event-stream')
+        elif self.path == '/v1/limited':
+            self.send_body(json.dumps({'error': {'message': 'slow down'}}).encode('utf-8'), status=429)
+        elif self.path == '/v1/broken':
+            self.send_body(b'internal error', 'text/plain', status=500)
+        else:
+            self.send_body(json.dumps({'path': self.path}).encode('utf-8'))
+
+    def send_body(self, data: bytes, content_type: str = 'application/json', status: int = 200):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class TestHTTPClient(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        cls.server.daemon_threads = True
+        cls.server.connections = set()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        host, port = cls.server.server_address[:2]
+        cls.client = HTTPClient(f"http://{host}:{port}/v1", api_key='key', timeout=5)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client.pool.close()
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_post(self):
+        self.assertEqual(self.client.post('/chat/completions', {}), {'path': '/v1/chat/completions'})
+
+    def test_stream(self):
+        self.assertEqual(list(self.client.stream('/stream', {})), [{'index': 0}, {'index': 1}])
+
+    def test_keep_alive(self):
+        self.server.connections.clear()
+        for _ in range(3):
+            self.client.post('/chat/completions', {})
+            list(self.client.stream('/stream', {}))
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_stream_closed_early(self):
+        stream = self.client.stream('/stream', {})
+        self.assertEqual(next(stream), {'index': 0})
+        stream.close()
+        self.assertEqual(self.client.post('/chat/completions', {}), {'path': '/v1/chat/completions'})
+
+    def test_errors(self):
+        with self.assertRaises(RateLimitError) as context:
+            self.client.post('/limited', {})
+        self.assertEqual((context.exception.status, context.exception.message), (429, 'slow down'))
+        with self.assertRaises(HTTPError) as context:
+            self.client.post('/broken', {})
+        self.assertEqual((context.exception.status, context.exception.message), (500, 'internal error'))
+
+
+if __name__ == '__main__':
+    unittest.main()
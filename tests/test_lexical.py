@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from termax.prompt import lexical
+from termax.prompt.lexical import LexicalIndex, TrigramIndex, tokenize
+
+
+class TestTokenize(unittest.TestCase):
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("git push --force"), ['git', 'push', '--force', 'force'])
+        self.assertEqual(tokenize("python main.py"), ['python', 'main.py', 'main', 'py'])
+        self.assertEqual(tokenize("done."), ['done'])
+
+
+class TestLexicalIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        self.path = os.path.join(self.home, 'lexical.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.home)
+
+    def test_search(self):
+        index = LexicalIndex(None)
+        index.add('1', "git push --force origin main")
+        index.add('2', "git status")
+        index.add('3', "docker ps -a")
+        self.assertEqual([doc_id for doc_id, _ in index.search("force push")], ['1'])
+        self.assertEqual([doc_id for doc_id, _ in index.search("git", n_results=1)][0], '2')
+        self.assertEqual(index.search("kubectl"), [])
+        self.assertEqual(LexicalIndex(None).search("git"), [])
+
+    def test_replace_and_remove(self):
+        index = LexicalIndex(None)
+        index.add('1', "git status")
+        index.add('1', "docker ps")
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.search("git"), [])
+        index.remove('1')
+        index.remove('missing')
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.total_length, 0)
+        self.assertEqual(dict(index.postings), {})
+
+    def test_journal(self):
+        index = LexicalIndex(self.path)
+        self.assertFalse(index.load())
+        index.add('1', "git status")
+        index.save()
+        self.assertTrue(os.path.exists(self.path))
+        self.assertFalse(os.path.exists(index.journal_path))
+
+        # 之后的少量变更追加到日志，快照不变
+        index.add('2', "docker ps")
+        index.remove('1')
+        index.save()
+        self.assertTrue(os.path.exists(index.journal_path))
+
+        loaded = LexicalIndex(self.path)
+        self.assertTrue(loaded.load())
+        self.assertEqual(loaded.documents, {'2': ['docker', 'ps']})
+        self.assertEqual(loaded.journal, 2)
+        self.assertEqual([doc_id for doc_id, _ in loaded.search("docker")], ['2'])
+
+    def test_compaction(self):
+        index = LexicalIndex(self.path)
+        index.add('0', "ls -la")
+        index.save()
+        with mock.patch.object(lexical, 'JOURNAL_MINIMUM', 2):
+            for i in range(1, 4):
+                index.add(str(i), f"echo {i}")
+                index.save()
+        # 日志超过上限后合并为新的快照
+        self.assertFalse(os.path.exists(index.journal_path))
+        self.assertEqual(index.journal, 0)
+        loaded = LexicalIndex(self.path)
+        loaded.load()
+        self.assertEqual(set(loaded.documents), {'0', '1', '2', '3'})
+
+    def test_clear(self):
+        index = LexicalIndex(self.path)
+        index.add('1', "git status")
+        index.save()
+        index.add('2', "docker ps")
+        index.save()
+        index.clear()
+        index.save()
+        self.assertFalse(os.path.exists(index.journal_path))
+        loaded = LexicalIndex(self.path)
+        self.assertTrue(loaded.load())
+        self.assertEqual(len(loaded), 0)
+
+
+class TestTrigramIndex(unittest.TestCase):
+
+    def test_search(self):
+        index = TrigramIndex()
+        index.add('1', "git status")
+        index.add('2', "docker ps")
+        self.assertEqual([doc_id for doc_id, _ in index.search("git status")], ['1'])
+        self.assertEqual(index.search("kubectl get pods"), [])
+
+    def test_scores(self):
+        index = TrigramIndex()
+        index.add('1', "git push --force origin main")
+        # 文档中间的子串包含查询串的全部三元组
+        self.assertEqual(index.search("sh --for"), [('1', 1.0)])
+        self.assertEqual(index.search("ORIGIN"), [('1', 1.0)])
+        # "orgin" 的三元组 org、rgi、gin 中只有 gin 出现在文档中
+        self.assertEqual(index.search("orgin", threshold=0.0), [('1', 1 / 3)])
+        # 短于三个字符的查询串按词首匹配
+        self.assertEqual(index.search("gi"), [('1', 1.0)])
+        self.assertEqual(index.search("it"), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
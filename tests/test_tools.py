@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from termax.utils import tools
+from termax.utils.const import TOOL_HELP_HISTORY, TOOL_HELP_ALL
+
+SCRIPT = "#!/bin/sh\necho 'usage: {name} [-x]'\necho '  -x   do x'\n"
+
+
+class TestRefreshTools(unittest.TestCase):
+
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        self.bin = os.path.join(self.home, 'bin')
+        os.makedirs(self.bin)
+        for name in ('foo', 'bar'):
+            path = os.path.join(self.bin, name)
+            with open(path, 'w') as file:
+                file.write(SCRIPT.format(name=name))
+            os.chmod(path, 0o755)
+        # 没有 man 页面，说明只能来自 --help
+        patches = [
+            mock.patch.object(tools, 'TOOLS_PATH', os.path.join(self.home, 'tools.json')),
+            mock.patch.object(tools, '_tools', (None, {})),
+            mock.patch.object(tools.shutil, 'which', return_value=None)
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.home)
+
+    def docs(self):
+        return {name: tool['doc'] is not None for name, tool in tools.read_tools().items()}
+
+    def test_man_pages_only(self):
+        # 默认不运行任何程序
+        self.assertEqual(tools.refresh_tools({'foo': 1}, path=self.bin), (2, 0))
+        self.assertEqual(self.docs(), {'foo': False, 'bar': False})
+
+    def test_history(self):
+        self.assertEqual(tools.refresh_tools({'foo': 1}, path=self.bin, run_help_for=TOOL_HELP_HISTORY), (2, 0))
+        self.assertEqual(self.docs(), {'foo': True, 'bar': False})
+        self.assertIn('-x: do x', tools.read_tools()['foo']['doc'])
+        self.assertEqual(tools.refresh_tools({'foo': 1}, path=self.bin, run_help_for=TOOL_HELP_HISTORY), (0, 0))
+        # 之后在 shell 中用过的程序再运行 --help
+        usage = {'foo': 1, 'bar': 1}
+        self.assertEqual(tools.refresh_tools(usage, path=self.bin, run_help_for=TOOL_HELP_HISTORY), (1, 0))
+        self.assertEqual(self.docs(), {'foo': True, 'bar': True})
+
+    def test_all(self):
+        self.assertEqual(tools.refresh_tools({}, path=self.bin, run_help_for=TOOL_HELP_ALL), (2, 0))
+        self.assertEqual(self.docs(), {'foo': True, 'bar': True})
+
+
+if __name__ == '__main__':
+    unittest.main()
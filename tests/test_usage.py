@@ -0,0 +1,86 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from termax.utils import usage
+from termax.utils.store import append_jsonl, iter_jsonl
+from termax.utils.usage import compact_usage, summarize_usage, record_usage, register_prompt
+
+
+class TestCompactUsage(unittest.TestCase):
+
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        self.path = os.path.join(self.home, 'usage.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.home)
+
+    def record(self, age: float, provider: str = 'openai', kind: str = 'command'):
+        append_jsonl(self.path, {
+            'time': time.time() - age * 86400,
+            'provider': provider,
+            'model': 'gpt-4o',
+            'kind': kind,
+            'input': 100,
+            'output': 20,
+            'cached': 10,
+            'latency': 0.5,
+            'sections': {'history': 300, 'instructions': 100}
+        })
+
+    def summaries(self):
+        return {by: summarize_usage(self.path, by) for by in ('day', 'provider', 'kind', 'section')}
+
+    def test_retention(self):
+        for age in (40, 40, 40, 35, 1, 0):
+            self.record(age, provider='ollama' if age == 35 else 'openai')
+        before = self.summaries()
+
+        compact_usage(self.path, days=30)
+        entries = list(iter_jsonl(self.path))
+        self.assertEqual([entry.get('calls') for entry in entries], [3, 1, None, None])
+        self.assertEqual(entries[0]['sections']['history'], [3, 225, 24])
+        self.assertEqual(self.summaries(), before)
+
+        # 再次压缩时没有过期的逐次记录，账本保持不变
+        compact_usage(self.path, days=30)
+        self.assertEqual(list(iter_jsonl(self.path)), entries)
+
+    def test_aggregates(self):
+        for age in (40, 2):
+            self.record(age)
+        compact_usage(self.path, days=30)
+        self.record(40)
+        self.record(40, kind='description')
+        before = self.summaries()
+
+        compact_usage(self.path, days=30)
+        entries = list(iter_jsonl(self.path))
+        self.assertEqual(sorted(entry.get('calls', 0) for entry in entries), [0, 1, 2])
+        self.assertEqual(self.summaries(), before)
+
+    def test_limit(self):
+        for age in (3, 2, 1, 0):
+            self.record(age)
+        size = os.path.getsize(self.path)
+
+        # 保留期内的记录超出大小上限时，从最早的一天起汇总
+        compact_usage(self.path, days=30, limit=size // 2)
+        entries = list(iter_jsonl(self.path))
+        self.assertEqual([entry.get('calls') for entry in entries], [1, 1, 1, None])
+        self.assertEqual(summarize_usage(self.path, 'provider')['openai']['calls'], 4)
+
+    def test_record_usage(self):
+        prompt = register_prompt("prompt", 'command')
+        with mock.patch.object(usage, 'USAGE_LEDGER_LIMIT', 1), \
+                mock.patch.object(usage, 'compact_usage') as compact:
+            record_usage(self.path, 'openai', 'gpt-4o', 'command', prompt, {'input': 1}, 0.1)
+        compact.assert_called_once_with(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()